@@ -0,0 +1,56 @@
+#version 330
+
+// a billboard vertex shader for streamed line segments which fade out by age, all segments are drawn in one call
+// segments which have faded out or were never spawned into get clipped
+
+layout(std140) uniform cue_camera_buf {
+    mat4 bt_cam_mat;
+};
+
+layout(std140) uniform sps_line_cam_buf {
+    vec4 line_cam_pos; // xyz, uploaded once per frame by LineRenderer
+};
+
+uniform float beam_time; // on the same clock as spawn_time
+uniform float beam_lifetime;
+uniform float beam_emit_power; // at spawn, fades linearly to zero
+
+layout(location = 0) in vec3 pos;
+layout(location = 1) in vec3 norm; // points *along* the line segment
+layout(location = 2) in vec2 uv; // y selects the billboard side
+layout(location = 3) in float line_width;
+layout(location = 4) in float spawn_time;
+
+out vec3 frag_pos; // world space
+out vec3 frag_norm;
+out vec2 frag_uv;
+out float frag_emit_power;
+
+flat out int frag_ins_id;
+
+void main() {
+    float fade = 1. - (beam_time - spawn_time) / beam_lifetime;
+
+    frag_uv = uv;
+    frag_ins_id = gl_InstanceID;
+
+    if (fade <= 0. || fade > 1.) {
+        gl_Position = vec4(2., 2., 2., 1.); // outside the clip volume
+        frag_pos = vec3(0.);
+        frag_norm = norm;
+        frag_emit_power = 0.;
+        return;
+    }
+
+    // find dir along which to extend the billboard
+    vec3 quad_dir = normalize(cross(line_cam_pos.xyz - pos, norm));
+
+    // extend by line width
+    vec4 w_pos = vec4(pos + quad_dir * line_width * (1. - 2. * uv.y), 1.);
+    gl_Position = bt_cam_mat * w_pos;
+
+    // pass to fragment shader interpolators
+    frag_pos = w_pos.xyz;
+    frag_norm = quad_dir;
+    frag_emit_power = fade * beam_emit_power;
+}
@@ -0,0 +1,45 @@
+#version 330
+
+// a billboard vertex shader for line segments generated from per-instance beam params, the mesh is a shared unit beam
+
+layout(std140) uniform cue_camera_buf {
+    mat4 bt_cam_mat;
+};
+
+layout(std140) uniform sps_line_cam_buf {
+    vec4 line_cam_pos; // xyz, uploaded once per frame by LineRenderer
+};
+
+uniform float line_width[64];
+
+uniform vec3 beam_origin[64];
+uniform vec3 beam_dir[64]; // normalized
+uniform float beam_length[64];
+
+in vec3 pos; // z is the fraction along the beam
+in vec3 norm;
+in vec2 uv;
+
+out vec3 frag_pos; // world space
+out vec3 frag_norm;
+out vec2 frag_uv;
+
+flat out int frag_ins_id;
+
+void main() {
+    vec3 dir = beam_dir[gl_InstanceID];
+    vec3 seg_pos = beam_origin[gl_InstanceID] + dir * (pos.z * beam_length[gl_InstanceID]);
+
+    // find dir along which to extend the billboard
+    vec3 quad_dir = normalize(cross(line_cam_pos.xyz - seg_pos, dir));
+
+    // extend by line width
+    vec4 w_pos = vec4(seg_pos + quad_dir * line_width[gl_InstanceID] * (1. - 2. * uv.y), 1.);
+    gl_Position = bt_cam_mat * w_pos;
+
+    // pass to fragment shader interpolators
+    frag_pos = w_pos.xyz;
+    frag_norm = quad_dir;
+    frag_uv = uv;
+    frag_ins_id = gl_InstanceID;
+}
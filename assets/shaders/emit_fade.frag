@@ -0,0 +1,12 @@
+#version 330
+
+in vec2 frag_uv;
+in vec3 frag_norm;
+in float frag_emit_power;
+out vec4 frag;
+
+uniform sampler2D albedo;
+
+void main() {
+    frag = texture(albedo, frag_uv) * vec4(frag_emit_power, frag_emit_power, frag_emit_power, 1.);
+}
@@ -1,13 +1,20 @@
 #version 330
 
-// a basic mesh vertex shader for point rendering
+// a point particle vertex shader for fire, particles follow a closed-form path (drag + buoyancy) from their spawn state
+// so they are uploaded only once when spawned, slots which are dead or were never spawned into get clipped
 
 layout(std140) uniform cue_camera_buf {
     mat4 bt_cam_mat;
 };
 
-in vec3 pos;
-in float lifetime;
+layout(location = 0) in vec3 spawn_pos;
+layout(location = 1) in vec3 spawn_vel;
+layout(location = 2) in float spawn_time;
+
+uniform float fire_time; // on the same clock as spawn_time
+uniform float fire_lifetime;
+uniform float fire_drag;
+uniform vec3 fire_buoyancy;
 
 out vec3 frag_pos; // world space
 flat out float frag_lifetime;
@@ -15,14 +22,28 @@ flat out int sprite_index;
 flat out int frag_ins_id;
 
 void main() {
-    vec4 w_pos = vec4(pos, 1.);
-    gl_Position = bt_cam_mat * w_pos;
-    gl_PointSize = 300 / gl_Position.z;
+    float age = fire_time - spawn_time;
+    float lifetime = fire_lifetime - age;
 
     frag_lifetime = lifetime;
     sprite_index = int(lifetime);
+    frag_ins_id = gl_InstanceID;
+
+    if (age < 0. || lifetime <= 0.) {
+        gl_Position = vec4(2., 2., 2., 1.); // outside the clip volume
+        gl_PointSize = 0.;
+        frag_pos = vec3(0.);
+        return;
+    }
+
+    // solution of v' = buoyancy - drag * v, v tends to the terminal vel
+    vec3 terminal_vel = fire_buoyancy / fire_drag;
+    float decay = (1. - exp(-fire_drag * age)) / fire_drag;
+
+    vec4 w_pos = vec4(spawn_pos + terminal_vel * age + (spawn_vel - terminal_vel) * decay, 1.);
+    gl_Position = bt_cam_mat * w_pos;
+    gl_PointSize = 300 / gl_Position.z;
 
     // pass to fragment shader interpolators
     frag_pos = w_pos.xyz;
-    frag_ins_id = gl_InstanceID;
 }
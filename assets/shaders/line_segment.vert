@@ -1,17 +1,19 @@
 #version 330
 
-// a minimal billboard vertex shader for line segments
+// a minimal billboard vertex shader for streamed line segments
 
 layout(std140) uniform cue_camera_buf {
     mat4 bt_cam_mat;
 };
 
-uniform vec3 cam_pos[64];
-uniform float line_width[64];
+layout(std140) uniform sps_line_cam_buf {
+    vec4 line_cam_pos; // xyz, uploaded once per frame by LineRenderer
+};
 
-in vec3 pos;
-in vec3 norm; // points *along* the line segment
-in vec2 uv;
+layout(location = 0) in vec3 pos;
+layout(location = 1) in vec3 norm; // points *along* the line segment
+layout(location = 2) in vec2 uv; // y selects the billboard side
+layout(location = 3) in float line_width;
 
 out vec3 frag_pos; // world space
 out vec3 frag_norm;
@@ -21,16 +23,14 @@ flat out int frag_ins_id;
 
 void main() {
     // find dir along which to extend the billboard
-    // vec3 d_proj = ((cam_pos[gl_InstanceID] - pos) * norm) / (norm * norm);
-    vec3 quad_dir = normalize(cross(cam_pos[gl_InstanceID] - pos, norm));
+    vec3 quad_dir = normalize(cross(line_cam_pos.xyz - pos, norm));
 
     // extend by line width
-    vec4 w_pos = vec4(pos + quad_dir * line_width[gl_InstanceID] *  (1. - 2 * (gl_VertexID % 2)), 1.);
+    vec4 w_pos = vec4(pos + quad_dir * line_width * (1. - 2. * uv.y), 1.);
     gl_Position = bt_cam_mat * w_pos;
 
     // pass to fragment shader interpolators
     frag_pos = w_pos.xyz;
-    frag_norm = (vec4(norm, 0.)).xyz;
     frag_norm = quad_dir;
     frag_uv = uv;
     frag_ins_id = gl_InstanceID;
@@ -0,0 +1,54 @@
+from engine.cue.rendering.cue_batch import UniformBindTypes, UniformBind
+from engine.cue.components.cue_transform import Transform
+from engine.cue.rendering.cue_resources import GPUMesh
+from engine.cue.rendering import cue_scene as sc
+
+from components.line_renderer import LineRenderer
+
+import numpy as np
+import OpenGL.GL as gl
+from pygame.math import Vector3 as Vec3
+
+# a line renderer for straight beams (lasers, hitscan traces), the segment is generated in the vertex shader from per-instance uniforms
+# note: all beams share one static unit mesh, so beams with the same shader and texture get drawn in a single instanced batch
+
+class BeamRenderer(LineRenderer):
+    BEAM_VSHADER = "shaders/beam_segment.vert"
+
+    _beam_mesh: GPUMesh | None = None
+
+    @staticmethod
+    def _get_beam_mesh() -> GPUMesh:
+        # created on first use, a gl context is needed for the upload
+
+        if BeamRenderer._beam_mesh is None:
+            vert_buf = np.array([0., 0., 0., 0., 0., 0., 0., 0., 1., 0., 0., 1.], dtype=np.float32)
+            norm_buf = np.array([0., 0., 1., 0., 0., 1., 0., 0., 1., 0., 0., 1.], dtype=np.float32)
+            uv_buf = np.array([0., 0., 0., 1., 1., 0., 1., 1.], dtype=np.float32)
+
+            elem_buf = np.array([0, 1, 2, 2, 1, 3], dtype=np.uint32)
+
+            BeamRenderer._beam_mesh = GPUMesh()
+            BeamRenderer._beam_mesh.write_to(vert_buf, norm_buf, uv_buf, 4, elem_buf, 6, gl.GL_STATIC_DRAW)
+
+        return BeamRenderer._beam_mesh
+
+    def __init__(self, en_data: dict, initial_line_width: float, en_trans: Transform, target_scene: 'sc.RenderScene | None' = None) -> None:
+        en_data = {**en_data, "a_model_vshader": self.BEAM_VSHADER}
+        super().__init__(en_data, self._get_beam_mesh(), initial_line_width, en_trans, target_scene)
+
+    def _add_line_uniforms(self) -> None:
+        program = self.pipeline.shader_program
+
+        self.beam_origin_bind = UniformBind(UniformBindTypes.FLOAT3, gl.glGetUniformLocation(program, "beam_origin"), np.zeros(3, dtype=np.float32))
+        self.beam_dir_bind = UniformBind(UniformBindTypes.FLOAT3, gl.glGetUniformLocation(program, "beam_dir"), np.array([0., 0., 1.], dtype=np.float32))
+        self.beam_length_bind = UniformBind(UniformBindTypes.FLOAT1, gl.glGetUniformLocation(program, "beam_length"), np.float32(0.))
+
+        self.shader_uniform_data.extend((self.beam_origin_bind, self.beam_dir_bind, self.beam_length_bind))
+
+    def set_beam(self, origin: Vec3, beam_dir: Vec3, length: float) -> None:
+        # only the uniform values change, the mesh is never re-uploaded
+
+        self.beam_origin_bind.bind_value = np.array(origin, dtype=np.float32)
+        self.beam_dir_bind.bind_value = np.array(beam_dir, dtype=np.float32)
+        self.beam_length_bind.bind_value = np.float32(length)
@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+
+from engine.cue.cue_state import GameState
+from engine.cue import cue_sequence as seq
+from engine.cue.rendering.cue_batch import UniformBind
+from engine.cue.components.cue_transform import Transform
+
+from components.line_renderer import LineRenderer
+from sps_state import SpsState
+
+from pygame.math import Vector3 as Vec3
+import numpy as np
+
+# all hitscan beam trails of a map (the glock shots) in one fixed-size ring of line segments, drawn in one call
+# segments fade out in shaders/beam_fade.vert by their spawn time, so a shot uploads one segment and is never touched again
+# note: once the ring is full the oldest trail gets overwritten, the system only ticks while some trail is visible
+
+@dataclass(init=False, slots=True)
+class BeamTrailSystem:
+    BEAM_MAX_TRAILS = 64
+    BEAM_LIFETIME = 1.
+    BEAM_EMIT_POWER = 5. # at spawn
+    BEAM_WIDTH = .02
+
+    BEAM_DATA = {
+        "a_model_vshader": "shaders/beam_fade.vert",
+        "a_model_fshader": "shaders/emit_fade.frag",
+        "a_model_albedo": "textures/glock_beam.png",
+        "a_model_transparent": True,
+    }
+
+    def __init__(self) -> None:
+        self.time_base = GameState.current_time
+        self.last_spawn_time = -np.inf
+
+        self.ring_head = 0
+        self.is_ticking = False
+
+        self.beam_trans = None
+        self.beam_renderer = None
+        self.beam_time_bind = None
+
+    def _create_renderer(self) -> None:
+        # created on first use, maps without any shots never touch gl
+
+        self.beam_trans = Transform(Vec3(), Vec3()) # used for non_opaque sorting
+
+        beam_data = {
+            **self.BEAM_DATA,
+            "a_model_uniforms": {
+                "beam_time": 0.,
+                "beam_lifetime": self.BEAM_LIFETIME,
+                "beam_emit_power": self.BEAM_EMIT_POWER,
+            },
+        }
+
+        # one extra spawn_time attrib per segment, never spawned segments are far in the past so clipped as faded out
+        self.beam_renderer = LineRenderer(beam_data, None, self.BEAM_WIDTH, self.beam_trans, None, self.BEAM_MAX_TRAILS, ((4, 1),), np.array([-1e9], dtype=np.float32))
+        self.beam_renderer.set_segment_count(self.BEAM_MAX_TRAILS)
+
+        self.beam_time_bind = self.beam_renderer.model_uniform_binds["beam_time"]
+
+    def despawn(self) -> None:
+        # called with the map reset
+
+        if self.beam_renderer is not None:
+            self.beam_renderer.despawn()
+
+        self.beam_renderer = None
+
+    # == spawning ==
+
+    def spawn(self, origin: Vec3, end: Vec3) -> None:
+        now = GameState.current_time
+
+        if self.beam_renderer is None:
+            self._create_renderer()
+
+        self.beam_renderer.write_segments(
+            self.ring_head,
+            np.array([origin], dtype=np.float32),
+            np.array([end], dtype=np.float32),
+            np.array([[now - self.time_base]], dtype=np.float32), # relative, keeps the float32 precision
+        )
+
+        self.ring_head = (self.ring_head + 1) % self.BEAM_MAX_TRAILS
+        self.last_spawn_time = now
+        self.beam_time_bind.bind_value = np.float32(now - self.time_base)
+
+        self.beam_trans.set_pos(origin + (end - origin) * .5)
+        self.beam_renderer.show()
+
+        if not self.is_ticking:
+            self.is_ticking = True
+            seq.next(self.tick)
+
+    # == fading ==
+
+    def tick(self) -> None:
+        if SpsState.beam_system is not self:
+            self.is_ticking = False
+            return # stale system from a previous map
+
+        now = GameState.current_time
+
+        # all trails have faded out once the newest one has
+
+        if now - self.last_spawn_time >= self.BEAM_LIFETIME:
+            self.beam_renderer.hide()
+            self.is_ticking = False
+            return # restarted on next spawn
+
+        self.beam_time_bind.bind_value = np.float32(now - self.time_base)
+        seq.next(self.tick)
+
+    time_base: float # GameState.current_time the gpu spawn times are relative to
+    last_spawn_time: float
+
+    ring_head: int # next segment to spawn into
+    is_ticking: bool
+
+    beam_trans: Transform | None
+    beam_renderer: LineRenderer | None
+    beam_time_bind: UniformBind | None
@@ -1,9 +1,8 @@
 from dataclasses import dataclass
-import random
 
 from engine.cue.cue_state import GameState
 from engine.cue import cue_sequence as seq
-from engine.cue.rendering.cue_resources import GPUMesh
+from engine.cue.rendering.cue_batch import UniformBind
 from engine.cue.components.cue_transform import Transform
 
 from components.particle_renderer import ParticleRenderer
@@ -13,117 +12,213 @@ from pygame.math import Vector3 as Vec3
 import numpy as np
 from OpenGL import GL as gl
 
+# all fire particles of a map in one system, kept in a growing gpu ring buffer and drawn in one call
+# particles follow a closed-form path evaluated in shaders/flame.vert, so a particle is uploaded once on spawn and never touched again
+# note: FireEmitters are only spawn sources, the system only ticks while some emitter is burning or particles are alive
+
 @dataclass(init=False, slots=True)
-class FireEmitter:
+class FireParticleSystem:
+    FIRE_INITIAL_CAPACITY = 256
+    FIRE_MAX_PARTICLES = 4096 # the ring grows up to this, the oldest particles get overwritten once full
+    FIRE_LIFETIME = 5.
+    FIRE_EMIT_INTERVAL = .02 # per burning emitter
+    FIRE_DRAG = 1.
+    FIRE_BUOYANCY = Vec3(0., 1.2, 0.)
+    FIRE_VEL_JITTER = .5
+
+    FIRE_ATTRIB_LAYOUT = ((0, 3), (1, 3), (2, 1)) # spawn_pos, spawn_vel, spawn_time
+    FIRE_FILL_ROW = np.array([0., 0., 0., 0., 0., 0., -1e9], dtype=np.float32) # never spawned slots are far in the past, so clipped as dead
+
     def __init__(self) -> None:
-        self.fire_p_pos = []
-        self.fire_p_vel = []
-        self.fire_p_spawn_time = []
+        self.time_base = GameState.current_time
+        self.last_emit_time = -np.inf
 
-        self.fire_emit_origin = Vec3()
-        self.fire_emit_cooldown = 0
-        self.emitter_on_fire = False
+        self.ring_head = 0
+        self.p_spawn_time = np.full(self.FIRE_INITIAL_CAPACITY, -np.inf, dtype=np.float64)
+
+        self.burning_emitters = {}
+        self.is_ticking = False
+
+        self.fire_point_trans = None
+        self.fire_point_renderer = None
+        self.fire_time_bind = None
+
+    def _create_renderer(self) -> None:
+        # created on first use, maps without any fire never touch gl
 
-        self.fire_point_mesh = GPUMesh()
         self.fire_point_trans = Transform(Vec3(), Vec3()) # used for non_opaque sorting
-        self.fire_point_lifetime_buf = gl.glGenBuffers(1)
 
         fire_data = {
-            "a_model_mesh": self.fire_point_mesh,
             "a_model_vshader": "shaders/flame.vert",
             "a_model_fshader": "shaders/flame_quad.frag",
             "a_model_transparent": True,
-            "a_model_albedo": "textures/fireSheet.png"
+            "a_model_albedo": "textures/fireSheet.png",
+            "a_model_uniforms": {
+                "fire_time": 0.,
+                "fire_lifetime": self.FIRE_LIFETIME,
+                "fire_drag": self.FIRE_DRAG,
+                "fire_buoyancy": self.FIRE_BUOYANCY,
+            },
         }
-        self.fire_point_renderer = ParticleRenderer(fire_data, self.fire_point_mesh, self.fire_point_trans)
+        self.fire_point_renderer = ParticleRenderer(fire_data, self.FIRE_ATTRIB_LAYOUT, self.fire_point_trans, None, len(self.p_spawn_time), self.FIRE_FILL_ROW)
+        self.fire_time_bind = self.fire_point_renderer.model_uniform_binds["fire_time"]
+
+        # dead slots are clipped by the shader, so the whole ring is drawn and the count only changes on growth
+        self.fire_point_renderer.set_draw_count(len(self.p_spawn_time))
+
         gl.glEnable(gl.GL_PROGRAM_POINT_SIZE)
 
-        seq.next(self._tick)
+    def despawn(self) -> None:
+        # called with the map reset
+
+        if self.fire_point_renderer is not None:
+            self.fire_point_renderer.despawn()
+
+        self.fire_point_renderer = None
+        self.burning_emitters.clear()
+
+    # == spawning ==
+
+    def _grow(self) -> None:
+        old_capacity = len(self.p_spawn_time)
+        new_capacity = min(old_capacity * 2, self.FIRE_MAX_PARTICLES)
+
+        self.p_spawn_time = np.concatenate((self.p_spawn_time, np.full(new_capacity - old_capacity, -np.inf)))
+
+        # continue spawning into the new, empty part of the ring
+        self.ring_head = old_capacity
+
+        if self.fire_point_renderer is not None:
+            self.fire_point_renderer.set_draw_count(new_capacity)
+
+    def emit(self, origins: np.ndarray, base_vels: np.ndarray) -> None:
+        # spawns a particle at each of the (K, 3) origins with the base vel and a random jitter
+
+        now = GameState.current_time
+
+        # grow instead of overwriting particles still alive, while allowed to
+
+        while len(self.p_spawn_time) < self.FIRE_MAX_PARTICLES:
+            target_slots = (self.ring_head + np.arange(len(origins))) % len(self.p_spawn_time)
 
-    def _tick(self) -> None:
-        # spawn new particles if on fire
+            if len(origins) <= len(self.p_spawn_time) and not np.any(self.p_spawn_time[target_slots] > now - self.FIRE_LIFETIME):
+                break
 
-        if self.emitter_on_fire and GameState.current_time - self.fire_emit_cooldown > .02:
-            self.fire_emit_cooldown = GameState.current_time
-            self._new_fire_particle(Vec3())
+            self._grow()
 
-        # update particle system
+        capacity = len(self.p_spawn_time)
+        k = min(len(origins), capacity)
 
-        to_remove = []
-        point_data = []
-        lifetime_data = []
+        if k == 0:
+            return
 
-        avg_pos = Vec3()
+        if self.fire_point_renderer is None:
+            self._create_renderer()
 
-        for i in range(len(self.fire_p_pos)):
-            lf = 5. - (GameState.current_time - self.fire_p_spawn_time[i])
+        rows = np.empty((k, 7), dtype=np.float32)
+        rows[:, 0:3] = origins[-k:]
+        rows[:, 3:6] = base_vels[-k:] + np.random.uniform(-self.FIRE_VEL_JITTER, self.FIRE_VEL_JITTER, (k, 3))
+        rows[:, 6] = now - self.time_base # relative, keeps the float32 precision
 
-            v = self.fire_p_vel[i]
-            p = self.fire_p_pos[i]
+        # upload only the spawned slots, in up to two ranges when wrapping around the ring
 
-            v /= 1. + (1. * GameState.delta_time)
-            v += Vec3(0., 1.2, 0.) * GameState.delta_time
-            p += v * GameState.delta_time
+        first = min(k, capacity - self.ring_head)
 
-            if lf <= 0.:
-                to_remove.append(i)
+        self.fire_point_renderer.write(self.ring_head, rows[:first])
+        self.fire_point_renderer.write(0, rows[first:])
 
-            else:
-                point_data.extend(p)
-                lifetime_data.append(lf)
+        self.p_spawn_time[(self.ring_head + np.arange(k)) % capacity] = now
 
-                avg_pos += p
+        self.ring_head = (self.ring_head + k) % capacity
+        self.last_emit_time = now
+        self.fire_time_bind.bind_value = np.float32(now - self.time_base)
 
-        for offset, i in enumerate(to_remove):
-            self.fire_p_pos.pop(i - offset)
-            self.fire_p_vel.pop(i - offset)
-            self.fire_p_spawn_time.pop(i - offset)
+        self.fire_point_trans.set_pos(Vec3(*rows[:, 0:3].mean(axis=0)))
+        self.fire_point_renderer.show()
 
-        # send as a mesh to the gpu
+        self._start_ticking()
 
-        if lifetime_data:
-            avg_pos /= len(lifetime_data)
-        self.fire_point_trans.set_pos(avg_pos)
+    def _start_ticking(self) -> None:
+        if not self.is_ticking:
+            self.is_ticking = True
+            seq.next(self.tick)
 
-        vert_buf = np.array(point_data, dtype=np.float32)
-        lifetime_buf = np.array(lifetime_data, dtype=np.float32)
-        self.fire_point_mesh.write_to(vert_buf, vertex_count=len(lifetime_data), gl_usage=gl.GL_STREAM_DRAW)
+    def set_burning(self, emitter: 'FireEmitter', is_burning: bool) -> None:
+        if is_burning:
+            self.burning_emitters[id(emitter)] = emitter
+            self._start_ticking()
+        else:
+            self.burning_emitters.pop(id(emitter), None)
 
-        # hack a "out of format" lifetime buffer into the mesh vao
-        gl.glBindVertexArray(self.fire_point_mesh.mesh_vao)
+    # == simulation ==
 
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.fire_point_lifetime_buf)
-        gl.glBufferData(gl.GL_ARRAY_BUFFER, lifetime_buf, gl.GL_STREAM_DRAW)
+    def tick(self) -> None:
+        # only emits and advances the time uniform, all particle motion is done by the vertex shader
 
-        gl.glVertexAttribPointer(1, 1, gl.GL_FLOAT, False, 4, None)
-        gl.glEnableVertexAttribArray(1)
+        if SpsState.fire_system is not self:
+            self.is_ticking = False
+            return # stale system from a previous map
 
-        gl.glBindVertexArray(0)
+        now = GameState.current_time
 
-        # refresh renderer with new data
-        self.fire_point_renderer.refresh_show()
-        seq.next(self._tick)
+        # spawn from burning emitters
 
-    def _new_fire_particle(self, initial_vel: Vec3) -> None:
-        self.fire_p_pos.append(Vec3(self.fire_emit_origin))
-        self.fire_p_vel.append(initial_vel + Vec3(random.uniform(-.5, .5), random.uniform(-.5, .5), random.uniform(-.5, .5)))
-        self.fire_p_spawn_time.append(GameState.current_time)
+        if self.burning_emitters:
+            due = [e for e in self.burning_emitters.values() if now - e.fire_emit_cooldown > self.FIRE_EMIT_INTERVAL]
+
+            if due:
+                for e in due:
+                    e.fire_emit_cooldown = now
+
+                origins = np.array([tuple(e.fire_emit_origin) for e in due], dtype=np.float32)
+                self.emit(origins, np.zeros_like(origins))
+
+        # all particles are dead once the newest one is
+
+        if now - self.last_emit_time >= self.FIRE_LIFETIME:
+            if self.fire_point_renderer is not None:
+                self.fire_point_renderer.hide()
+
+            if not self.burning_emitters:
+                self.is_ticking = False
+                return # restarted on next emit or set_on_fire
+
+        elif self.fire_time_bind is not None:
+            self.fire_time_bind.bind_value = np.float32(now - self.time_base)
+
+        seq.next(self.tick)
+
+    time_base: float # GameState.current_time the gpu spawn times are relative to
+    last_emit_time: float
+
+    ring_head: int # next slot to spawn into
+    p_spawn_time: np.ndarray # cpu copy of the ring spawn times, for growing instead of overwriting alive particles
+
+    burning_emitters: dict[int, 'FireEmitter'] # id(emitter) -> emitter
+    is_ticking: bool
+
+    fire_point_trans: Transform | None
+    fire_point_renderer: ParticleRenderer | None
+    fire_time_bind: UniformBind | None
+
+@dataclass(init=False, slots=True)
+class FireEmitter:
+    # a spawn source for SpsState.fire_system, costs nothing while not on fire
+
+    def __init__(self) -> None:
+        self.fire_emit_origin = Vec3()
+        self.fire_emit_cooldown = 0
+        self.emitter_on_fire = False
 
     def set_on_fire(self, is_on_fire: bool) -> None:
+        if is_on_fire != self.emitter_on_fire:
+            SpsState.fire_system.set_burning(self, is_on_fire)
+
         self.emitter_on_fire = is_on_fire
 
     def set_origin(self, origin: Vec3) -> None:
         self.fire_emit_origin = origin
 
-    fire_p_pos: list[Vec3]
-    fire_p_vel: list[Vec3]
-    fire_p_spawn_time: list[float]
-
     fire_emit_origin: Vec3
     fire_emit_cooldown: float
     emitter_on_fire: bool
-
-    fire_point_mesh: GPUMesh
-    fire_point_trans: Transform
-    fire_point_lifetime_buf: np.uint32
-    fire_point_renderer: ParticleRenderer
\ No newline at end of file
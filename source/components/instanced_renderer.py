@@ -0,0 +1,149 @@
+import os
+
+from engine.cue.rendering import cue_scene as sc
+from engine.cue import cue_utils as utils
+
+from engine.cue.rendering.cue_batch import DrawInstance, UniformBindTypes, UniformBind
+from engine.cue.cue_state import GameState
+from engine.cue.components.cue_transform import Transform
+from engine.cue.components.cue_model import ModelRenderer
+from engine.cue.rendering.cue_resources import GPUMesh
+
+import numpy as np
+import OpenGL.GL as gl
+from pygame.math import Vector3 as Vec3, Vector2 as Vec2
+
+# a model renderer for mass-spawned meshes (projectiles, drones) sharing their gpu data, a drop-in for the ModelRenderer
+# all renderers with the same model data share one InstanceBatch, a single copy of the mesh with one pipeline, texture set and
+# uniform list, so spawning one never uploads a mesh or looks up uniforms
+# note: each renderer still appends its own draw instance, grouping them into fewer draws is left to the engine batching
+# note: opted into by setting "a_model_instanced": true in the entity / prefab data, see create_model_renderer
+
+class InstanceBatch:
+    def __init__(self, en_data: dict) -> None:
+        # one copy of the model, shared by all the draw instances in the batch
+
+        with np.load(os.path.join(GameState.asset_manager.asset_dir, en_data["a_model_mesh"])) as model:
+            vert_data, norm_data, uv_data, elem_data = model["vert_data"], model["norm_data"], model["uv_data"], model["elem_data"]
+
+        self.mesh = GPUMesh()
+        self.mesh.write_to(vert_data, norm_data, uv_data, len(vert_data) // 3, elem_data, len(elem_data), gl.GL_STATIC_DRAW)
+
+        # load assets from preload or disk
+
+        self.pipeline = GameState.asset_manager.load_shader(en_data["a_model_vshader"], en_data["a_model_fshader"])
+
+        self.model_textures = tuple()
+        if "a_model_albedo" in en_data:
+            self.model_textures = (GameState.asset_manager.load_texture(en_data["a_model_albedo"]),)
+
+        self.shader_uniform_data = []
+
+        if "a_model_uniforms" in en_data:
+            for n, v in en_data["a_model_uniforms"].items():
+                loc = gl.glGetUniformLocation(self.pipeline.shader_program, n)
+
+                if loc == -1:
+                    utils.warn(f"[InstancedRenderer] failed to get uniform \"{n}\"")
+
+                if isinstance(v, float):
+                    t = UniformBindTypes.FLOAT1
+                    v = np.float32(v)
+                elif isinstance(v, int):
+                    t = UniformBindTypes.SINT1
+                    v = np.int32(v)
+                elif isinstance(v, Vec2):
+                    t = UniformBindTypes.FLOAT2
+                    v = np.array(v, dtype=np.float32)
+                elif isinstance(v, Vec3):
+                    t = UniformBindTypes.FLOAT3
+                    v = np.array(v, dtype=np.float32)
+                else:
+                    utils.error(f"[InstancedRenderer] value \"{v}\" cannot be used for a gl uniform")
+                    continue
+
+                self.shader_uniform_data.append(UniformBind(t, loc, v))
+
+        self.model_opaque = not en_data.get("a_model_transparent", False)
+
+    def make_draw_instance(self, en_trans: Transform) -> DrawInstance:
+        return DrawInstance(self.mesh, self.pipeline, self.model_textures, self.model_opaque, self.shader_uniform_data, en_trans)
+
+    mesh: GPUMesh
+    shader_uniform_data: list[UniformBind] # shared by all members, the values are the same for the whole batch
+    model_opaque: bool
+
+class InstancedRenderer:
+    # one batch per model data, the batches hold no scene state so renderers of all scenes share them
+    batches: dict[tuple, InstanceBatch] = {}
+
+    @staticmethod
+    def _batch_key(en_data: dict) -> tuple:
+        return (
+            en_data["a_model_mesh"], en_data["a_model_vshader"], en_data["a_model_fshader"], en_data.get("a_model_albedo", None),
+            en_data.get("a_model_transparent", False), repr(en_data.get("a_model_uniforms", {})),
+        )
+
+    def __init__(self, en_data: dict, en_trans: Transform, target_scene: 'sc.RenderScene | None' = None) -> None:
+        if target_scene is None:
+            target_scene = GameState.active_scene
+
+        batch_key = self._batch_key(en_data)
+        batch = InstancedRenderer.batches.get(batch_key, None)
+
+        if batch is None:
+            batch = InstanceBatch(en_data)
+            InstancedRenderer.batches[batch_key] = batch
+
+        self.batch = batch
+        self.scene = target_scene
+        self.model_transform = en_trans
+        self.draw_ins = batch.make_draw_instance(en_trans)
+
+        # insert model into the render_scene
+
+        self.is_visible = False
+        self.show()
+
+    def __del__(self) -> None:
+        self.despawn()
+
+    @staticmethod
+    def clear_batches() -> None:
+        # called with the map reset, once the renderers of the map are gone this drops the last references to the batch meshes
+        InstancedRenderer.batches.clear()
+
+    def despawn(self) -> None:
+        self.hide()
+        self.draw_ins = None
+
+    # start rendering this model if hidden
+    def show(self) -> None:
+        if self.draw_ins is None:
+            return # despawned
+
+        if not self.is_visible:
+            self.scene.append(self.draw_ins)
+            self.is_visible = True
+
+    # stop rendering this model without deleting it (yet)
+    def hide(self) -> None:
+        if self.draw_ins is None:
+            return # despawned
+
+        if self.is_visible:
+            self.scene.remove(self.draw_ins)
+            self.is_visible = False
+
+    batch: InstanceBatch
+    draw_ins: DrawInstance | None
+    model_transform: Transform
+    is_visible: bool
+
+def create_model_renderer(en_data: dict, en_trans: Transform) -> 'ModelRenderer | InstancedRenderer':
+    # picks the renderer based on the "a_model_instanced" opt-in in en_data
+
+    if en_data.get("a_model_instanced", False):
+        return InstancedRenderer(en_data, en_trans)
+
+    return ModelRenderer(en_data, en_trans)
@@ -6,29 +6,97 @@ from engine.cue.cue_state import GameState
 from engine.cue.components.cue_transform import Transform
 from engine.cue.rendering.cue_resources import GPUMesh
 
+from components.vertex_stream import VertexStream
+
 import numpy as np
 import OpenGL.GL as gl 
 from pygame.math import Vector3 as Vec3, Vector2 as Vec2
 
 # a simple billboard line renderer component, based of the ModelRenderer
+# draws either a prebuilt line mesh, or (with line_mesh None) its own persistent vertex stream of segments,
+# which are written in place with write_segments (see VertexStream)
+# note: the camera pos is uploaded once per frame into a uniform buffer shared by all line shaders (sps_line_cam_buf), so
+# lines have no per-frame work, the line width is a vertex attrib of streamed segments and a per-instance uniform (set once)
+# for prebuilt meshes
 
 class LineRenderer:
-    def __init__(self, en_data: dict, line_mesh: GPUMesh, initial_line_width: float, en_trans: Transform, target_scene: 'sc.RenderScene | None' = None) -> None:
+    LINE_CAM_BINDING = 8 # uniform buffer binding point of sps_line_cam_buf, clear of the engine cue_camera_buf
+    _cam_ubo: int | None = None
+
+    LINE_ATTRIB_LAYOUT = ((0, 3), (1, 3), (2, 2), (3, 1)) # pos, norm, uv, line width
+    LINE_VERT_FLOATS = 9
+    LINE_SEGMENT_VERTS = 6 # two non-indexed triangles per segment quad
+
+    @staticmethod
+    def _bind_cam_buf(shader_program: int) -> None:
+        # creates the shared camera buffer on first use and points the shaders block at it
+
+        if LineRenderer._cam_ubo is None:
+            LineRenderer._cam_ubo = gl.glGenBuffers(1)
+
+            gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, LineRenderer._cam_ubo)
+            gl.glBufferData(gl.GL_UNIFORM_BUFFER, 16, None, gl.GL_DYNAMIC_DRAW)
+            gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, 0)
+
+            gl.glBindBufferBase(gl.GL_UNIFORM_BUFFER, LineRenderer.LINE_CAM_BINDING, LineRenderer._cam_ubo)
+            seq.next(LineRenderer._tick_cam_buf)
+
+        block = gl.glGetUniformBlockIndex(shader_program, "sps_line_cam_buf")
+
+        if block != gl.GL_INVALID_INDEX:
+            gl.glUniformBlockBinding(shader_program, block, LineRenderer.LINE_CAM_BINDING)
+
+    @staticmethod
+    def _tick_cam_buf() -> None:
+        # one upload per frame for all lines
+
+        cam_pos = GameState.active_camera.cam_pos
+
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, LineRenderer._cam_ubo)
+        gl.glBufferSubData(gl.GL_UNIFORM_BUFFER, 0, np.array([cam_pos.x, cam_pos.y, cam_pos.z, 1.], dtype=np.float32))
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, 0)
+
+        seq.next(LineRenderer._tick_cam_buf)
+
+    def __init__(self, en_data: dict, line_mesh: GPUMesh | None, initial_line_width: float, en_trans: Transform, target_scene: 'sc.RenderScene | None' = None, initial_segments: int = 16, segment_attribs: tuple[tuple[int, int], ...] = (), segment_fill: np.ndarray | None = None) -> None:
+        # segment_attribs are extra (shader location, float count) attribs after the line ones, constant along a segment
+        # segment_fill is their value in never written segments
+
+        if line_mesh is None:
+            fill_row = np.zeros(LineRenderer.LINE_VERT_FLOATS + sum(n for _, n in segment_attribs), dtype=np.float32)
+
+            if segment_fill is not None:
+                fill_row[LineRenderer.LINE_VERT_FLOATS:] = segment_fill
+
+            self.mesh = GPUMesh()
+            self.stream = VertexStream(self.mesh, LineRenderer.LINE_ATTRIB_LAYOUT + segment_attribs, initial_segments * LineRenderer.LINE_SEGMENT_VERTS, fill_row)
+        else:
+            self.mesh = line_mesh
+            self.stream = None # a prebuilt mesh, drawn as is
+
         # load assets from preload or disk
         
-        self.mesh = line_mesh
         self.pipeline = GameState.asset_manager.load_shader(en_data["a_model_vshader"], en_data["a_model_fshader"])
 
         self.model_textures = tuple()
         if "a_model_albedo" in en_data:
             self.model_textures = (GameState.asset_manager.load_texture(en_data["a_model_albedo"]),)
 
+        LineRenderer._bind_cam_buf(self.pipeline.shader_program)
+
         self.shader_uniform_data = []
+        self.model_uniform_binds = {} # a_model_uniforms name -> bind, for updating values later
         self.line_width = initial_line_width
 
-        # add line uniforms
-        self.shader_uniform_data.append(UniformBind(UniformBindTypes.FLOAT3, gl.glGetUniformLocation(self.pipeline.shader_program, "cam_pos"), np.array([0., 0., 0.], dtype=np.float32)))
-        self.shader_uniform_data.append(UniformBind(UniformBindTypes.FLOAT1, gl.glGetUniformLocation(self.pipeline.shader_program, "line_width"), np.float32(initial_line_width)))
+        # add line uniforms, streamed segments carry their own width
+
+        self.line_width_bind = None
+
+        if self.stream is None:
+            self.line_width_bind = UniformBind(UniformBindTypes.FLOAT1, gl.glGetUniformLocation(self.pipeline.shader_program, "line_width"), np.float32(initial_line_width))
+            self.shader_uniform_data.append(self.line_width_bind)
+
+        self._add_line_uniforms()
 
         if "a_model_uniforms" in en_data:
             for n, v in en_data["a_model_uniforms"].items():
@@ -53,7 +121,8 @@ class LineRenderer:
                     utils.error(f"[ModelRenderer] value \"{v}\" cannot be used for a gl uniform")
                     continue
 
-                self.shader_uniform_data.append(UniformBind(t, loc, v))
+                self.model_uniform_binds[n] = UniformBind(t, loc, v)
+                self.shader_uniform_data.append(self.model_uniform_binds[n])
 
         self.model_opaque = True
         if en_data.get("a_model_transparent", False):
@@ -71,11 +140,12 @@ class LineRenderer:
         self.is_visible = False
         self.show()
 
-        seq.next(self._tick)
-
     def __del__(self) -> None:
         self.despawn()
 
+    def _add_line_uniforms(self) -> None:
+        pass # for subclasses with extra per-instance line uniforms, added before any user uniforms
+
     @staticmethod
     def _setup_batch() -> None:
         gl.glBlendFunc(gl.GL_ONE, gl.GL_ONE)
@@ -84,19 +154,57 @@ class LineRenderer:
     def _restore_gl_state() -> None:
         gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
 
-    def _tick(self) -> None:
-        if self.draw_ins is None:
-            return # despawned
+    def set_line_width(self, line_width: float) -> None:
+        # for streams only applies to segments written after this
+        
+        self.line_width = line_width
+
+        if self.line_width_bind is not None:
+            self.line_width_bind.bind_value = np.float32(line_width)
+
+    # == segment stream ==
 
-        self.draw_ins.uniform_data[0].bind_value = np.array(GameState.active_camera.cam_pos, dtype=np.float32)
-        self.draw_ins.uniform_data[1].bind_value = np.float32(self.line_width)
+    def write_segments(self, first: int, starts: np.ndarray, ends: np.ndarray, segment_values: np.ndarray | None = None, line_widths: np.ndarray | None = None) -> None:
+        # writes (K, 3) segments starting at segment first, growing the stream if needed
+        # segment_values are the (K, n) values of the extra segment_attribs, line_widths default to the current line_width
 
-        seq.next(self._tick)
+        k = len(starts)
+
+        if k == 0:
+            return
+
+        starts = np.asarray(starts, dtype=np.float32)
+        ends = np.asarray(ends, dtype=np.float32)
+
+        dirs = ends - starts
+        dirs /= np.maximum(np.linalg.norm(dirs, axis=1, keepdims=True), 1e-6)
+
+        # quad corners in the same order as the indexed line meshes, uv.y selects the billboard side
+        corner_ends = np.array([0, 0, 1, 1, 0, 1])
+        corner_uvs = np.array([[0., 0.], [0., 1.], [1., 0.], [1., 0.], [0., 1.], [1., 1.]], dtype=np.float32)
+
+        rows = np.empty((k, LineRenderer.LINE_SEGMENT_VERTS, self.stream.row_floats), dtype=np.float32)
+        rows[:, :, 0:3] = np.where(corner_ends[None, :, None] == 0, starts[:, None, :], ends[:, None, :])
+        rows[:, :, 3:6] = dirs[:, None, :]
+        rows[:, :, 6:8] = corner_uvs[None, :, :]
+        rows[:, :, 8] = self.line_width if line_widths is None else np.asarray(line_widths, dtype=np.float32)[:, None]
+
+        if self.stream.row_floats > LineRenderer.LINE_VERT_FLOATS:
+            rows[:, :, LineRenderer.LINE_VERT_FLOATS:] = np.asarray(segment_values, dtype=np.float32).reshape(k, 1, -1)
+
+        self.stream.write(first * LineRenderer.LINE_SEGMENT_VERTS, rows.reshape(-1, self.stream.row_floats))
+
+    def set_segment_count(self, count: int) -> None:
+        self.stream.set_draw_count(count * LineRenderer.LINE_SEGMENT_VERTS)
 
     def despawn(self) -> None:
         self.hide() 
         self.draw_ins = None
 
+        if self.stream is not None:
+            self.stream.delete()
+            self.mesh = None # the last reference, the mesh frees its gl objects
+
     # start rendering this model if hidden
     def show(self) -> None:
         if self.draw_ins is None:
@@ -6,17 +6,25 @@ from engine.cue.cue_state import GameState
 from engine.cue.components.cue_transform import Transform
 from engine.cue.rendering.cue_resources import GPUMesh
 
+from components.vertex_stream import VertexStream
+
 import numpy as np
 import OpenGL.GL as gl 
 from pygame.math import Vector3 as Vec3, Vector2 as Vec2
 
-# a simple crude point mesh particle renderer helper
+# a simple point mesh particle renderer helper
+# owns a persistent vertex stream with the particle attribs (see VertexStream), particles are written in place and
+# only the draw count changes, so the draw instance is built once and stays in the scene
 
 class ParticleRenderer:
-    def __init__(self, en_data: dict, point_mesh: GPUMesh, en_trans: Transform | None, target_scene: 'sc.RenderScene | None' = None) -> None:
+    def __init__(self, en_data: dict, attrib_layout: tuple[tuple[int, int], ...], en_trans: Transform | None, target_scene: 'sc.RenderScene | None' = None, initial_capacity: int = 256, fill_row: np.ndarray | None = None) -> None:
+        # attrib_layout and fill_row are as in VertexStream
+
+        self.mesh = GPUMesh()
+        self.stream = VertexStream(self.mesh, attrib_layout, initial_capacity, fill_row)
+
         # load assets from preload or disk
         
-        self.mesh = point_mesh
         self.pipeline = GameState.asset_manager.load_shader(en_data["a_model_vshader"], en_data["a_model_fshader"])
 
         self.model_textures = tuple()
@@ -24,6 +32,7 @@ class ParticleRenderer:
             self.model_textures = (GameState.asset_manager.load_texture(en_data["a_model_albedo"]),)
 
         self.shader_uniform_data = []
+        self.model_uniform_binds = {} # a_model_uniforms name -> bind, for updating values later
 
         if "a_model_uniforms" in en_data:
             for n, v in en_data["a_model_uniforms"].items():
@@ -48,7 +57,8 @@ class ParticleRenderer:
                     utils.error(f"[ModelRenderer] value \"{v}\" cannot be used for a gl uniform")
                     continue
 
-                self.shader_uniform_data.append(UniformBind(t, loc, v))
+                self.model_uniform_binds[n] = UniformBind(t, loc, v)
+                self.shader_uniform_data.append(self.model_uniform_binds[n])
 
         self.model_opaque = True
         if en_data.get("a_model_transparent", False):
@@ -79,14 +89,23 @@ class ParticleRenderer:
         gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
         gl.glDepthMask(gl.GL_TRUE)
 
-    def refresh_show(self) -> None:
-        self.hide()
-        self.draw_ins = DrawInstance(self.mesh, self.pipeline, self.model_textures, self.model_opaque, self.shader_uniform_data, self.model_transform, ParticleRenderer._setup_particle_batch, ParticleRenderer._restore_gl_state, gl.GL_POINTS)
-        self.show()
+    # == particle data ==
+
+    def write(self, first: int, rows: np.ndarray) -> None:
+        # writes (K, floats per particle) rows starting at particle first, growing the buffer if needed
+        self.stream.write(first, rows)
+
+    def reserve(self, capacity: int) -> None:
+        self.stream.reserve(capacity)
+
+    def set_draw_count(self, count: int) -> None:
+        self.stream.set_draw_count(count)
 
     def despawn(self) -> None:
         self.hide()
         self.draw_ins = None
+        self.stream.delete()
+        self.mesh = None # the last reference, the mesh frees its gl objects
 
     # start rendering this model if hidden
     def show(self) -> None:
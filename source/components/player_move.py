@@ -2,10 +2,12 @@ from dataclasses import dataclass
 import math
 
 from sps_state import SpsState
+from sps_phys import LocalCollSnapshot, LocalHit
+from sps_triggers import TRIGGER_ACTOR_PLAYER
 from engine.cue.cue_state import GameState
 from engine.cue.components.cue_transform import Transform
 from engine.cue.rendering.cue_camera import Camera
-from engine.cue.phys.cue_phys_types import PhysRay, EPSILON
+from engine.cue.phys.cue_phys_types import EPSILON
 
 import engine.cue.cue_sequence as seq
 
@@ -43,6 +45,7 @@ class PlayerMovement:
 
     PLAYER_SIZE = Vec3(.45, .95, .45)
     CAMERA_OFFSET = Vec3(0, .8, 0)
+    LOCAL_COLL_MARGIN = .1 # extra space gathered around the players swept bounds each tick
 
     def __init__(self, player_trans: Transform, player_cam: Camera, initial_view_rot: Vec2 = Vec2(0, 0), dummy_player: bool = False) -> None:
         self.dummy_player = dummy_player
@@ -67,6 +70,10 @@ class PlayerMovement:
         self.view_overlay_rot = Vec3()
         self.movement_disabled = False
 
+        self.local_colls = None
+        self.stand_contact_key = None
+        self.stand_contact = None
+
         seq.next(PlayerMovement.tick, self)
 
     def tick(self) -> None:
@@ -75,7 +82,7 @@ class PlayerMovement:
 
         # call the specific player controller for the current state
 
-        prev_pos = self.p_pos
+        prev_pos = Vec3(self.p_pos) # copy, the controllers move p_pos in place
 
         if self.p_state == 0: # on ground / landed
             self.tick_landed()
@@ -83,19 +90,15 @@ class PlayerMovement:
         elif self.p_state == 1: # in air / in-flight
             self.tick_in_flight()
 
-        # check for trigger collisions and fire trigger code
+        # sweep the player through the trigger grid, which fires the trigger code
 
         if SpsState.p_health != 0:
             frame_diff = self.p_pos - prev_pos
-            if frame_diff.length_squared() == 0.:
-                frame_diff = Vec3(0., EPSILON, 0.)
-
-            player_box = PhysRay.make(prev_pos + Vec3(0., PlayerMovement.PLAYER_SIZE.y / 2, 0.), frame_diff.normalize(), PlayerMovement.PLAYER_SIZE)
-            trigger_hits = GameState.trigger_scene.all_hits(player_box, frame_diff.length())
+            half_size = PlayerMovement.PLAYER_SIZE / 2
 
-            for hit in trigger_hits:
-                # get trigger handle and callback to it
-                hit.usr.on_triggered()
+            SpsState.trigger_grid.update_actor(self, TRIGGER_ACTOR_PLAYER, (prev_pos.x, prev_pos.y + half_size.y, prev_pos.z), (frame_diff.x, frame_diff.y, frame_diff.z), (half_size.x, half_size.y, half_size.z))
+        else:
+            SpsState.trigger_grid.remove_actor(self, TRIGGER_ACTOR_PLAYER)
 
         # update controlled transform
 
@@ -146,17 +149,44 @@ class PlayerMovement:
     def _land_accel_func(self, d: Vec3, vel: Vec3, maxs: float, accel: float, dt: float) -> Vec3:
         return d * ((maxs - vel.length() * .0) / maxs * accel) * dt
 
+    def _gather_local_colls(self, query_min: np.ndarray, query_max: np.ndarray) -> None:
+        margin = PlayerMovement.LOCAL_COLL_MARGIN
+        self.local_colls = SpsState.static_colls.gather_local(query_min - margin, query_max + margin)
+
+    def _sweep(self, origin: Vec3, ray_dir: Vec3, size: Vec3, tmax: float) -> LocalHit | None:
+        # sweeps a box of size against the static colliders gathered this tick, regathers if the sweep leaves them (eg. after a few step ups)
+
+        origin = np.array((origin.x, origin.y, origin.z), dtype=np.float64)
+        ray_dir = np.array((ray_dir.x, ray_dir.y, ray_dir.z), dtype=np.float64)
+        half_ext = np.array((size.x / 2, size.y / 2, size.z / 2), dtype=np.float64)
+
+        end = origin + ray_dir * tmax
+        query_min = np.minimum(origin, end) - half_ext
+        query_max = np.maximum(origin, end) + half_ext
+
+        if self.local_colls is None or not self.local_colls.covers(query_min, query_max):
+            self._gather_local_colls(query_min, query_max)
+
+        return self.local_colls.first_hit(origin, ray_dir, half_ext, tmax)
+
     def _check_collisions_and_apply_velocity(self, dt: float) -> bool:
         new_vel: Vec3 = self.p_vel
         new_pos: Vec3 = self.p_pos
 
         max_step = PlayerMovement.MAX_STEP_DISTANCE if self.p_state == 0 else 0. # enable step only if already on ground (prevents little teleports when sliding up agains an edge)
 
+        # all sweeps of this tick run against a snapshot of the colliders near the player, gathered lazily
+        self.local_colls = None
+
         if new_vel.length_squared() != 0.:
             tmax = new_vel.length() * dt
 
-            player_box: PhysRay = PhysRay.make(new_pos + Vec3(0., PlayerMovement.PLAYER_SIZE.y / 2, 0.), new_vel.normalize(), PlayerMovement.PLAYER_SIZE)
-            scene_hit = GameState.collider_scene.first_hit(player_box, tmax)
+            # gather for the whole tick at once, slides never travel further than tmax and steps only add max_step up
+            center = np.array((new_pos.x, new_pos.y + PlayerMovement.PLAYER_SIZE.y / 2, new_pos.z), dtype=np.float64)
+            reach = np.array((PlayerMovement.PLAYER_SIZE.x / 2, PlayerMovement.PLAYER_SIZE.y / 2, PlayerMovement.PLAYER_SIZE.z / 2), dtype=np.float64) + tmax + max_step + EPSILON
+            self._gather_local_colls(center - reach, center + reach)
+
+            scene_hit = self._sweep(new_pos + Vec3(0., PlayerMovement.PLAYER_SIZE.y / 2, 0.), new_vel.normalize(), PlayerMovement.PLAYER_SIZE, tmax)
 
             show_debug = self.show_player_debug
 
@@ -171,16 +201,14 @@ class PlayerMovement:
                 step_pos = Vec3(new_pos) + new_vel * dt * frac_traveled
                 step_pos += -scene_hit.norm * EPSILON # nudge the step test pos slightly into the coll
 
-                player_stand_box: PhysRay = PhysRay.make(step_pos + Vec3(0., max_step - EPSILON, 0.), Vec3(0., -1., 0.), PlayerMovement.PLAYER_SIZE.elementwise() * Vec3(1., 0., 1.))
-                stand_hit = GameState.collider_scene.first_hit(player_stand_box, max_step)
+                stand_hit = self._sweep(step_pos + Vec3(0., max_step - EPSILON, 0.), Vec3(0., -1., 0.), PlayerMovement.PLAYER_SIZE.elementwise() * Vec3(1., 0., 1.), max_step)
 
                 if stand_hit is not None and stand_hit.tout >= 0.:
                     # collision is not above the max step distance, check for obstruction above step
 
                     step_pos.y = stand_hit.pos[1] + EPSILON
 
-                    player_stand_box: PhysRay = PhysRay.make(step_pos + Vec3(0., PlayerMovement.PLAYER_SIZE.y / 2, 0.), Vec3(0., 1., 0.), PlayerMovement.PLAYER_SIZE)
-                    stand_check_hit = GameState.collider_scene.first_hit(player_stand_box, EPSILON)
+                    stand_check_hit = self._sweep(step_pos + Vec3(0., PlayerMovement.PLAYER_SIZE.y / 2, 0.), Vec3(0., 1., 0.), PlayerMovement.PLAYER_SIZE, EPSILON)
                     
                     if show_debug:
                         pos = step_pos + Vec3(0., PlayerMovement.PLAYER_SIZE.y / 2, 0.)
@@ -197,8 +225,7 @@ class PlayerMovement:
                         dt *= 1. - frac_traveled
 
                         # recalc and continue checking for collisions after step
-                        player_box: PhysRay = PhysRay.make(new_pos + Vec3(0., PlayerMovement.PLAYER_SIZE.y / 2, 0.), new_vel.normalize(), PlayerMovement.PLAYER_SIZE)
-                        scene_hit = GameState.collider_scene.first_hit(player_box, tmax)
+                        scene_hit = self._sweep(new_pos + Vec3(0., PlayerMovement.PLAYER_SIZE.y / 2, 0.), new_vel.normalize(), PlayerMovement.PLAYER_SIZE, tmax)
 
                         continue
 
@@ -226,17 +253,21 @@ class PlayerMovement:
                 # recalc scene hits
                 tmax = new_vel.length() * dt
                 if tmax != 0.:
-                    player_box: PhysRay = PhysRay.make(new_pos + Vec3(0., PlayerMovement.PLAYER_SIZE.y / 2, 0.), new_vel.normalize(), PlayerMovement.PLAYER_SIZE)
-                    scene_hit = GameState.collider_scene.first_hit(player_box, tmax)
+                    scene_hit = self._sweep(new_pos + Vec3(0., PlayerMovement.PLAYER_SIZE.y / 2, 0.), new_vel.normalize(), PlayerMovement.PLAYER_SIZE, tmax)
                 else:
                     break
 
             new_pos += new_vel * dt
 
-        # perform stand check
+        # perform stand check, the colliders are static so if the player hasn't moved the last contact still holds
+
+        stand_key = (new_pos.x, new_pos.y, new_pos.z, max_step, id(SpsState.static_colls))
+
+        if stand_key == self.stand_contact_key:
+            stand_hit = self.stand_contact
+        else:
+            stand_hit = self._sweep(new_pos + Vec3(0., max_step - EPSILON, 0.), Vec3(0., -1., 0.), PlayerMovement.PLAYER_SIZE.elementwise() * Vec3(1., 0., 1.), max_step + EPSILON)
 
-        player_stand_box: PhysRay = PhysRay.make(new_pos + Vec3(0., max_step - EPSILON, 0.), Vec3(0., -1., 0.), PlayerMovement.PLAYER_SIZE.elementwise() * Vec3(1., 0., 1.))
-        stand_hit = GameState.collider_scene.first_hit(player_stand_box, max_step + EPSILON)
         standing_on_ground = stand_hit is not None
 
         if standing_on_ground:
@@ -247,6 +278,9 @@ class PlayerMovement:
         self.p_vel = new_vel
         self.p_pos = new_pos
 
+        self.stand_contact_key = (new_pos.x, new_pos.y, new_pos.z, max_step, id(SpsState.static_colls))
+        self.stand_contact = stand_hit
+
         return standing_on_ground
 
     def tick_landed(self) -> None:
@@ -398,6 +432,11 @@ class PlayerMovement:
     movement_disabled: bool
     dummy_player: bool
 
+    # per-tick collision state
+    local_colls: LocalCollSnapshot | None # static colliders near the player, gathered once per tick
+    stand_contact_key: tuple | None # (pos x, y, z, max step, static snapshot id) of the last stand check
+    stand_contact: LocalHit | None
+
     # debug
     show_player_info: bool
     show_player_debug: bool
\ No newline at end of file
@@ -0,0 +1,116 @@
+from engine.cue.rendering.cue_resources import GPUMesh
+
+import numpy as np
+import OpenGL.GL as gl
+import ctypes
+
+# a persistent interleaved vertex buffer attached to a GPUMesh vao, for renderers which update their vertices in place
+# the buffer grows geometrically and is written in sub ranges, the draw instance using the mesh never has to be rebuilt
+# note: the engine mesh only learns its draw count through write_to, so set_draw_count writes a shared one vertex
+# placeholder with the new count and reattaches the stream, the placeholder is never read by the draw
+# note: the stream only owns its own vbo, the vao and placeholder buffers stay owned (and freed) by the engine mesh
+
+class VertexStream:
+    PLACEHOLDER_POS = np.zeros(3, dtype=np.float32)
+
+    def __init__(self, mesh: GPUMesh, attrib_layout: tuple[tuple[int, int], ...], initial_capacity: int, fill_row: np.ndarray | None = None) -> None:
+        # attrib_layout is a (shader location, float count) pair per attribute, in their interleaved order
+        # fill_row is the initial value of never written rows (eg. a spawn time far in the past for particles)
+
+        self.mesh = mesh
+        self.attrib_layout = attrib_layout
+        self.row_floats = sum(n for _, n in attrib_layout)
+        self.fill_row = np.zeros(self.row_floats, dtype=np.float32) if fill_row is None else np.asarray(fill_row, dtype=np.float32)
+
+        self.vbo = None
+        self.capacity = 0
+        self.draw_count = -1
+
+        self.reserve(initial_capacity)
+        self.set_draw_count(0)
+
+    def _attach(self) -> None:
+        stride = self.row_floats * 4
+        offset = 0
+
+        gl.glBindVertexArray(self.mesh.mesh_vao)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+
+        for loc, n in self.attrib_layout:
+            gl.glVertexAttribPointer(loc, n, gl.GL_FLOAT, False, stride, ctypes.c_void_p(offset))
+            gl.glEnableVertexAttribArray(loc)
+
+            offset += n * 4
+
+        gl.glBindVertexArray(0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def reserve(self, capacity: int) -> None:
+        # grows to at least capacity rows (at least doubling), keeping the written rows
+
+        if capacity <= self.capacity:
+            return
+
+        new_capacity = max(capacity, self.capacity * 2)
+        stride = self.row_floats * 4
+
+        new_vbo = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, new_vbo)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, np.tile(self.fill_row, (new_capacity, 1)), gl.GL_DYNAMIC_DRAW)
+
+        if self.vbo is not None:
+            gl.glBindBuffer(gl.GL_COPY_READ_BUFFER, self.vbo)
+            gl.glCopyBufferSubData(gl.GL_COPY_READ_BUFFER, gl.GL_ARRAY_BUFFER, 0, 0, self.capacity * stride)
+            gl.glBindBuffer(gl.GL_COPY_READ_BUFFER, 0)
+
+            gl.glDeleteBuffers(1, [self.vbo])
+
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+        self.vbo = new_vbo
+        self.capacity = new_capacity
+
+        self._attach()
+
+    def write(self, first: int, rows: np.ndarray) -> None:
+        # uploads (K, row_floats) rows starting at row first, growing if needed
+
+        if len(rows) == 0:
+            return
+
+        self.reserve(first + len(rows))
+
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        gl.glBufferSubData(gl.GL_ARRAY_BUFFER, first * self.row_floats * 4, np.ascontiguousarray(rows, dtype=np.float32))
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def set_draw_count(self, count: int) -> None:
+        if count == self.draw_count:
+            return
+
+        self.reserve(count)
+
+        self.mesh.write_to(VertexStream.PLACEHOLDER_POS, vertex_count=count, gl_usage=gl.GL_STATIC_DRAW)
+
+        self._attach() # write_to repoints the position attrib
+
+        self.draw_count = count
+
+    def delete(self) -> None:
+        # frees the stream vbo and lets go of the mesh, the mesh releases its own gl objects
+
+        if self.vbo is None:
+            return # already deleted
+
+        gl.glDeleteBuffers(1, [self.vbo])
+        self.vbo = None
+        self.mesh = None
+
+    mesh: GPUMesh | None # None once deleted
+    attrib_layout: tuple[tuple[int, int], ...]
+    row_floats: int
+    fill_row: np.ndarray
+
+    vbo: np.uint32 | None
+    capacity: int # in rows
+    draw_count: int
@@ -2,6 +2,7 @@ from engine.cue.cue_state import GameState
 from engine.cue.cue_map import reset_state
 import engine.cue.cue_utils as utils
 from sps_state import SpsState
+import prefabs
 
 from pygame.math import Vector3 as Vec3, Vector2 as Vec2
 import random
@@ -94,6 +95,34 @@ def ai_debug_cmd(args: list[str]):
 
 utils.add_dev_command("ai_debug", ai_debug_cmd)
 
+def ai_budget_cmd(args: list[str]):
+    if len(args) != 1:
+        utils.error("[dev utils] unknown args, use 'ai_budget [budget_ms]' to set the per-frame ai update budget")
+        return
+
+    try:
+        budget = float(args[0])
+    except:
+        utils.error("[dev utils] unknown ai_budget value")
+        return
+
+    utils.info(f"[dev utils] setting ai update budget to {budget} ms")
+    SpsState.dev_ai_budget_ms = budget
+
+utils.add_dev_command("ai_budget", ai_budget_cmd)
+
+# == prefab cold loads ==
+
+def prefab_cold_loads_cmd(args: list[str]):
+    if not prefabs.cold_loads:
+        utils.info("[dev utils] no cold prefab loads during gameplay")
+        return
+
+    for map_path, prefab_path in prefabs.cold_loads:
+        utils.info(f"[dev utils] cold prefab load of \"{prefab_path}\" in \"{map_path}\"")
+
+utils.add_dev_command("prefab_cold_loads", prefab_cold_loads_cmd)
+
 # == nodmg cmd ==
 
 def nodmg_cmd(args: list[str]):
@@ -11,16 +11,17 @@ from engine.cue.rendering import cue_gizmos as gizmo
 from engine.cue.entities.bt_static_mesh import BtStaticMesh
 from engine.cue.components.cue_transform import Transform
 from engine.cue.components.cue_model import ModelRenderer
-from engine.cue.rendering.cue_resources import GPUMesh
 from engine.cue.phys.cue_phys_types import PhysAABB, PhysRay, EPSILON
 
-from components.line_renderer import LineRenderer
+from components.beam_renderer import BeamRenderer
+from components.instanced_renderer import InstancedRenderer, create_model_renderer
 from components.fire_emitter import FireEmitter
 from sps_state import SpsState
+from sps_hitbox_scene import HITBOX_LAYER_AI
+from sps_pvs import ShooterPvs
 import prefabs
 
 from pygame.math import Vector3 as Vec3
-from OpenGL import GL as gl
 import numpy as np
 
 # a semi-generic entity for most ai controlled enemies or npcs
@@ -32,7 +33,6 @@ class SpsHitboxAi:
         "enemy_drone": 1,
     }
     AI_ARGO_DECAY = 12.
-    AI_UPDATE_RATE = 5 # in updates per second
 
     # turret
 
@@ -46,10 +46,10 @@ class SpsHitboxAi:
     TURRET_SCAN_COOLDOWN = 2.2
     TURRET_SCAN_SPEED_FACTOR = .8
 
+    TURRET_LASER_RECAST_TOLERANCE = .9995 # recast the laser once the view dir drifts past this dot from the last cast dir
+
     # drone
 
-    DRONE_NAVIG_SPEED = 8.
-    DRONE_NAVIG_ACCEL = 12.
     DRONE_NAVIG_MAX_SPEED = 2.5
 
     DRONE_NAVIG_TARGET_MARGIN = .2
@@ -57,32 +57,55 @@ class SpsHitboxAi:
     DRONE_NAVIG_MAX_ATTEMPTS = 4 
     DRONE_NAVIG_MAX_STUCK_TIME = 1.5
 
-    DRONE_NAVIG_PLAYER_AVOIDANCE = 15. # how much to avoid flying into the player
     DRONE_NAVIG_MAX_DIST_FROM_TARGET = 15.
 
     def __init__(self, en_data: dict) -> None:
-        self.hitbox_health = en_data["hitbox_health"]
+        # renderers and emitters, kept alive while pooled
+
         self.ai_type = self.AI_TYPE_TABLE[en_data["ai_type"]]
 
         self.ai_trans = Transform(en_data["t_pos"], en_data["t_rot"], en_data["t_scale"])
-        self.ai_model = ModelRenderer(en_data, self.ai_trans)
+        self.ai_model = create_model_renderer(en_data, self.ai_trans)
+        self.ai_fire_emitter = FireEmitter()
+
+        if self.ai_type == 0:
+            laser_data = {
+                "a_model_fshader": "shaders/emit_surf.frag",
+                "a_model_albedo": "textures/laser.png",
+                "a_model_transparent": True,
+                "a_model_uniforms": {
+                    "emit_power": 8.
+                }
+            }
+
+            # note: using ai transform which may be far from the laser mesh itself, this may cause wrong draw ordering and transparency artifacts but good enough
+            # note: all turret lasers share the beam mesh and shaders, so they get drawn as one instanced batch
+            self.tr_laser_renderer = BeamRenderer(laser_data, .008, self.ai_trans)
+
+        self.ai_is_ticking = False
+        self.prefab_pool = None
+
+        self._spawn_state(en_data)
+
+    def _spawn_state(self, en_data: dict) -> None:
+        # everything reset on each spawn, including reuse from a prefab pool
+
+        self.hitbox_health = en_data["hitbox_health"]
 
         self.ai_fire_offset = np.array([*en_data["ai_fire_offset"], 1.], dtype=np.float32)
         self.ai_fire_pos = Vec3(*(self.ai_trans._trans_matrix @ self.ai_fire_offset)[0:3]) # initial, updated in tick
         self.ai_hitbox_size = self.ai_trans._scale.elementwise() * en_data["hitbox_scale"]
         self.ai_hitbox = PhysAABB.make(self.ai_trans._pos, self.ai_hitbox_size, self)
-        SpsState.hitbox_scene.add_coll(self.ai_hitbox)
+        SpsState.hitbox_scene.add_coll(self.ai_hitbox, HITBOX_LAYER_AI)
 
         self.ai_agro_level = 0.
         self.ai_target_last_seen_pos = Vec3()
         self.ai_target_last_seen_time = 0.
-        self.ai_next_projectile_id = 0
         self.ai_overlay_rot = en_data["t_rot"]
         self.ai_last_update = GameState.current_time
 
         self.ai_fire_end_time = 0.
         self.ai_fire_damage_cooldown = 0.
-        self.ai_fire_emitter = FireEmitter()
 
         SpsState.active_enemy_count += 1
 
@@ -94,34 +117,25 @@ class SpsHitboxAi:
 
             self.tr_fire_colldown = 0
 
-            self.tr_prefire_pause = GameState.current_time
-            self.tr_laser_length = 0.
+            # the turret only yaws around its pos, register the whole ring the fire pos sweeps for the pvs
+            fire_delta = self.ai_fire_pos - self.ai_trans._pos
+            fire_radius = math.hypot(fire_delta.x, fire_delta.z)
 
-            self.tr_laser_mesh = GPUMesh()
-            self._tr_gen_laser_mesh()
+            pvs_eyes = [self.ai_trans._pos] + ShooterPvs.ring_eye_points(self.ai_trans._pos, fire_radius, fire_delta.y)
+            self.tr_pvs_id = SpsState.shooter_pvs.add_shooter(pvs_eyes)
 
-            laser_data = {
-                "a_model_vshader": "shaders/line_segment.vert",
-                "a_model_fshader": "shaders/emit_surf.frag",
-                "a_model_albedo": "textures/laser.png",
-                "a_model_transparent": True,
-                "a_model_uniforms": {
-                    "emit_power": 8.
-                }
-            }
-
-            # note: using ai transform which may be far from the laser mesh itself, this may cause wrong draw ordering and transparency artifacts but good enough
-            self.tr_laser_renderer = LineRenderer(laser_data, self.tr_laser_mesh, .008, self.ai_trans)
+            self.tr_prefire_pause = GameState.current_time
+            self.tr_laser_length = 0.
+            self.tr_laser_cast_dir = Vec3() # forces a cast on first tick
 
-            # temporally space out ai updates over many frames, so only a few updates per frame happen
-            seq.after(random.uniform(0., .5), self.update_ai_enemy_turret)
+            self.tr_laser_renderer.set_beam(self.ai_fire_pos, self.tr_view_dir, self.tr_laser_length)
         
         elif self.ai_type == 1:
-            self.dr_vel = Vec3()
-
             self.dr_nav_nodes_to_travel = []
+            self.dr_nav_node_id = -1
             self.dr_nav_target_pos = en_data["t_pos"]
             self.dr_nav_target_is_player = False
+            self.dr_nav_on_flow = False
             self.dr_nav_margin_cooldown = GameState.current_time
 
             self.dr_burst_cooldown = 0.
@@ -131,18 +145,42 @@ class SpsHitboxAi:
             self.dr_last_non_stuck_time = GameState.current_time
             self.dr_re_navig = False
 
-            SpsState.active_drone_count += 1
+            self.dr_trigger_actor = en_data.get("ai_trigger_actor", False)
 
-            seq.after(random.uniform(0., .5), self.update_ai_enemy_drone)
+            SpsState.active_drone_count += 1
+            self.dr_slot = SpsState.drone_system.add_drone(self)
         
         self.local_name = en_data["bt_en_name"]
 
-        seq.next(self.tick)
+        # perception and navigation updates are spread out over frames by the scheduler
+        SpsState.ai_scheduler.add_ai(self)
+
+        # note: a tick may still be queued when despawned and reused in the same frame
+        if not self.ai_is_ticking:
+            self.ai_is_ticking = True
+            seq.next(self.tick)
+
+    def set_suspended(self, is_suspended: bool) -> None:
+        # called by the ai scheduler, a suspended ai has no ticks and its drone is not simulated
+
+        self.ai_suspended = is_suspended
+
+        if self.ai_type == 1:
+            SpsState.drone_system.set_drone_suspended(self, is_suspended)
+
+        if not is_suspended and not self.ai_is_ticking and self.local_name is not None:
+            self.ai_is_ticking = True
+            seq.next(self.tick)
 
     def tick(self) -> None:
         if self.local_name is None:
+            self.ai_is_ticking = False
             return # despawned
 
+        if self.ai_suspended:
+            self.ai_is_ticking = False
+            return # in a sub-zone out of the players reach, restarted by set_suspended
+
         self.ai_fire_pos = Vec3(*(self.ai_trans._trans_matrix @ self.ai_fire_offset)[0:3])
 
         if self.ai_fire_end_time < GameState.current_time:
@@ -189,7 +227,7 @@ class SpsHitboxAi:
 
     def on_force(self, active_force: Vec3) -> None:
         if self.ai_type == 1:
-            self.dr_vel += active_force * GameState.delta_time
+            SpsState.drone_system.dr_vel[self.dr_slot] += np.array(active_force * GameState.delta_time, dtype=np.float32)
 
     def set_fire(self, fire_lifetime: float) -> None:
         if self.local_name is None:
@@ -200,25 +238,22 @@ class SpsHitboxAi:
 
     # == ai impls ==
 
-    def _tr_gen_laser_mesh(self) -> None:
-        laser_end_pos = (self.ai_fire_pos + (self.tr_view_dir.elementwise() * self.tr_laser_length))
+    def update_ai(self) -> None:
+        # called by SpsState.ai_scheduler when due
 
-        vert_buf = np.array([*self.ai_fire_pos, *self.ai_fire_pos, *laser_end_pos, *laser_end_pos], dtype=np.float32)
-        norm_buf = np.array([*self.tr_view_dir, *self.tr_view_dir, *self.tr_view_dir, *self.tr_view_dir], dtype=np.float32)
-        uv_buf = np.array([0., 0., 0., 1., 1., 0., 1., 1.], dtype=np.float32)
-
-        # vert_buf = np.array([0., .5, 0., 0., .5, 0., 1., .5, 0., 1., .5, 0.], dtype=np.float32)
-        elem_buf = np.array([0, 1, 2, 2, 1, 3], dtype=np.uint32)
+        if self.ai_type == 0:
+            self.update_ai_enemy_turret()
 
-        self.tr_laser_mesh.write_to(vert_buf, norm_buf, uv_buf, 4, elem_buf, 6, gl.GL_STREAM_DRAW)
+        elif self.ai_type == 1:
+            self.update_ai_enemy_drone()
 
     def update_ai_enemy_turret(self) -> None:
         if self.local_name is None:
             return # despawned
 
-        # check for player visibility
+        # check for player visibility, the pvs rules out most of the map without a raycast
         
-        if SpsState.p_health != 0 and not SpsState.cheat_ai_invis:
+        if SpsState.p_health != 0 and not SpsState.cheat_ai_invis and SpsState.shooter_pvs.maybe_visible(self.tr_pvs_id, SpsState.p_active_controller.p_pos):
 
             target_dir = (SpsState.p_active_controller.p_pos - self.ai_fire_pos + Vec3(0., SpsState.p_active_controller.PLAYER_SIZE.y / 2, 0.))
             target_dist = target_dir.length()
@@ -226,13 +261,9 @@ class SpsHitboxAi:
             if target_dist == 0.:
                 return # both target and origin are at the same place, possible crash, just give up
 
+            is_visible = not SpsState.static_colls.occluded(self.ai_fire_pos, self.ai_fire_pos + target_dir)
             target_dir.normalize_ip()
 
-            vis_ray = PhysRay.make(self.ai_fire_pos, target_dir)
-            vis_hit = GameState.collider_scene.first_hit(vis_ray, target_dist)
-
-            is_visible = vis_hit is None
-
             if is_visible:
                 self.tr_view_target_dir = target_dir
         else:
@@ -247,7 +278,6 @@ class SpsHitboxAi:
             self.ai_agro_level = max(0., self.ai_agro_level - self.AI_ARGO_DECAY * (GameState.current_time - self.ai_last_update))
 
         self.ai_last_update = GameState.current_time
-        seq.after(1 / self.AI_UPDATE_RATE, self.update_ai_enemy_turret)
 
     def tick_enemy_turret(self) -> None:
         # debug gizmos
@@ -305,14 +335,16 @@ class SpsHitboxAi:
             self.tr_state = 0
             self.tr_prefire_pause = GameState.current_time
 
-        # regen laser with latest dir
+        # update laser with latest dir, the costly hit scan is only redone when aiming at the player or once the dir drifted enough
 
-        # costly per frame hit scan, but it's a sacrifice i'm willing to make...
-        laser_ray = PhysRay.make(self.ai_fire_pos, self.tr_view_dir)
-        laser_hit = GameState.collider_scene.first_hit(laser_ray)
-        self.tr_laser_length = laser_hit.tmin if laser_hit is not None else 1000.
+        if self.tr_state >= 2 or self.tr_view_dir.dot(self.tr_laser_cast_dir) < self.TURRET_LASER_RECAST_TOLERANCE:
+            laser_ray = PhysRay.make(self.ai_fire_pos, self.tr_view_dir)
+            laser_hit = GameState.collider_scene.first_hit(laser_ray)
 
-        self._tr_gen_laser_mesh()
+            self.tr_laser_length = laser_hit.tmin if laser_hit is not None else 1000.
+            self.tr_laser_cast_dir = Vec3(self.tr_view_dir)
+
+        self.tr_laser_renderer.set_beam(self.ai_fire_pos, self.tr_view_dir, self.tr_laser_length)
 
         # rotate model by dir
 
@@ -334,17 +366,15 @@ class SpsHitboxAi:
             ):
 
             # load bullet prefab
-            proj_name = f"__{self.local_name}_proj_{self.ai_next_projectile_id}"
-            proj_prefab = prefabs.load_prefab(proj_name, "prefabs/turret_bullet.json")
+            proj_data = prefabs.load_prefab(self.local_name, "prefabs/turret_bullet.json")[0][2]
 
             # setup initial dynamic entity data
-            proj_prefab[0][2]["t_pos"] = self.ai_fire_pos
-            proj_prefab[0][2]["projectile_dir"] = Vec3(self.tr_view_dir)
+            proj_data["t_pos"] = self.ai_fire_pos
+            proj_data["projectile_dir"] = Vec3(self.tr_view_dir)
 
-            prefabs.spawn_prefab(proj_prefab)
+            SpsState.projectile_system.fire(proj_data)
 
             self.tr_fire_colldown = time.perf_counter()
-            self.ai_next_projectile_id += 1
 
     def _dr_navigate(self, target_pos: Vec3, is_player: bool) -> None:
         rand_scalar = 1.
@@ -358,61 +388,72 @@ class SpsHitboxAi:
 
             if nav_target_pos != current_pos:
                 # note: it's better if we check if target is reachable but the cost of multiple hit scans is not worth the micro-stutters, rely on stuck detection
-                vis_ray = PhysRay.make(current_pos, (nav_target_pos - current_pos).normalize(), self.ai_hitbox_size)
-                vis_hit = GameState.collider_scene.first_hit(vis_ray, (nav_target_pos - current_pos).length())
-                
-                if vis_hit is not None or (is_player and (nav_target_pos - target_pos).length_squared() < 2. ** 2):
+                if SpsState.static_colls.occluded(current_pos, nav_target_pos, self.ai_hitbox_size / 2) or (is_player and (nav_target_pos - target_pos).length_squared() < 2. ** 2):
                     # rand_scalar /= 1.6
                     continue # nav_target_pos not reachable or too close, retry
 
             self.dr_nav_target_pos = nav_target_pos
             self.dr_nav_target_is_player = is_player
+            self.dr_nav_on_flow = False
+
+            SpsState.drone_system.dr_nav_target[self.dr_slot] = nav_target_pos
             return
 
-    def _dr_check_collisions_and_apply_velocity(self) -> None:
-        # tbh this comes derectly from PlayerMovement, only modified to for the SpsHitboxAi class
+    def _dr_navigate_to_player(self) -> None:
+        # take one of the attack slots around the player, shared between all drones so they don't pile up
 
-        dt = GameState.delta_time
-        pos = Vec3(self.ai_trans._pos)
-        vel = self.dr_vel
+        slot_pos = SpsState.drone_system.claim_attack_slot(self)
 
-        if vel.length_squared() != 0.:
-            tmax = vel.length() * dt
+        if slot_pos is None:
+            self._dr_navigate(SpsState.p_active_controller.p_pos, True) # all slots taken or blocked, fall back to random sampling
+            return
 
-            player_box: PhysRay = PhysRay.make(pos, vel.normalize(), self.ai_hitbox_size)
-            scene_hit = GameState.collider_scene.first_hit(player_box, tmax)
+        self.dr_nav_target_pos = slot_pos
+        self.dr_nav_target_is_player = True
+        self.dr_nav_on_flow = False
 
-            for i in range(32):
-                if scene_hit is None:
-                    break
+        SpsState.drone_system.dr_nav_target[self.dr_slot] = slot_pos
 
-                frac_traveled = scene_hit.tmin / tmax
+    def _dr_navigate_flow(self, target_pos: Vec3) -> None:
+        # follow the shared flow field (flooded from the players cell) towards the player, a table walk with no raycasts
 
-                pos += vel * dt * frac_traveled
-                vel = vel - vel.project(scene_hit.norm)
-                dt *= 1. - frac_traveled
+        waypoint = SpsState.flow_field.waypoint(self.ai_trans._pos)
 
-                # add a tiny nudge away from the collider to fully escape the hit 
-                pos += scene_hit.norm * EPSILON
+        if waypoint is None:
+            self._dr_navigate(target_pos, False) # close to the player (or no field), search around target_pos as before
+            return
 
-                if scene_hit.tout < 0.:
-                    # we're stuck inside a collider (?)
-                    # vel = Vec3()
-                    # print("stuck", scene_hit.tout)
-                    break
+        self.dr_nav_target_pos = waypoint
+        self.dr_nav_target_is_player = False
+        self.dr_nav_on_flow = True
 
-                # recalc scene hits
-                tmax = vel.length() * dt
-                if tmax != 0.:
-                    player_box: PhysRay = PhysRay.make(pos, vel.normalize(), self.ai_hitbox_size)
-                    scene_hit = GameState.collider_scene.first_hit(player_box, tmax)
-                else:
-                    break
+        SpsState.drone_system.dr_nav_target[self.dr_slot] = waypoint
 
-            pos += vel * dt
+    def _dr_leave_nav_graph(self) -> None:
+        self.dr_nav_node_id = -1
+        self.dr_nav_nodes_to_travel.clear()
 
-        self.dr_vel = vel
-        self.ai_trans.set_pos(pos)
+    def _dr_patrol_next_node(self) -> None:
+        nav_graph = SpsState.nav_graph
+
+        if self.dr_nav_node_id == -1:
+            # not on the nav graph (just spawned or was chasing), enter it at the closest visible node
+            next_node = nav_graph.nearest_visible_node(self.ai_trans._pos, self.DRONE_NAVIG_MAX_ATTEMPTS)
+
+        else:
+            if not self.dr_nav_nodes_to_travel:
+                self.dr_nav_nodes_to_travel = nav_graph.random_patrol_path(self.dr_nav_node_id)
+
+            next_node = self.dr_nav_nodes_to_travel.pop(0) if self.dr_nav_nodes_to_travel else -1
+
+        if next_node != -1:
+            self.dr_nav_node_id = next_node
+            self._dr_navigate(nav_graph.node_pos[next_node], False)
+
+    def _dr_apply_sim(self, pos: Vec3, yaw: float) -> None:
+        # write back the drone state after a DroneSystem step
+
+        self.ai_trans.set_pos_rot(pos, Vec3(0., yaw, 0.) + self.ai_overlay_rot)
 
         self.ai_hitbox.update(pos, self.ai_hitbox_size)
         SpsState.hitbox_scene.update_coll(self.ai_hitbox)
@@ -430,12 +471,7 @@ class SpsHitboxAi:
             if target_dist == 0.:
                 return # both target and origin are at the same place, possible crash, just give up
 
-            target_dir.normalize_ip()
-
-            vis_ray = PhysRay.make(self.ai_fire_pos, target_dir)
-            vis_hit = GameState.collider_scene.first_hit(vis_ray, target_dist)
-
-            is_visible = vis_hit is None
+            is_visible = not SpsState.static_colls.occluded(self.ai_fire_pos, self.ai_fire_pos + target_dir)
         else:
             is_visible = False
 
@@ -447,11 +483,14 @@ class SpsHitboxAi:
         else:
             self.ai_agro_level = max(0., self.ai_agro_level - self.AI_ARGO_DECAY * (GameState.current_time - self.ai_last_update))
 
+        SpsState.drone_system.dr_face_player[self.dr_slot] = self.ai_agro_level == 100.
+
         # check if target pos is still valid / usefull
 
         if is_visible and not self.dr_nav_target_is_player:
             # override target dir to player if seen
-            self._dr_navigate(SpsState.p_active_controller.p_pos, True)
+            self._dr_navigate_to_player()
+            self._dr_leave_nav_graph()
 
         elif self.ai_agro_level > 0. and (self.ai_target_last_seen_pos - self.dr_nav_target_pos).length_squared() > self.DRONE_NAVIG_MAX_DIST_FROM_TARGET ** 2:
             # target pos if too far from target already, renavig
@@ -459,52 +498,38 @@ class SpsHitboxAi:
 
         # set travel target pos
 
-        if (self.dr_nav_target_pos - self.ai_trans._pos).length_squared() < self.DRONE_NAVIG_TARGET_MARGIN ** 2 or self.dr_re_navig: # retarget when arrived at target
-            if GameState.current_time - self.dr_nav_margin_cooldown > self.DRONE_NAVIG_NEXT_TARGET_COOLDOWN: # retarget only after some time near the target
-                # TODO: visible target pos when no-approaching (as by ai_manager) 
+        # retarget when arrived at target, flow field waypoints are moved on every update
+        following_flow = self.dr_nav_on_flow and self.ai_agro_level > 0.
 
+        if (self.dr_nav_target_pos - self.ai_trans._pos).length_squared() < self.DRONE_NAVIG_TARGET_MARGIN ** 2 or self.dr_re_navig or following_flow:
+            if GameState.current_time - self.dr_nav_margin_cooldown > self.DRONE_NAVIG_NEXT_TARGET_COOLDOWN: # retarget only after some time near the target
                 if is_visible:
                     # override target_pos even when mid navigation if players visible
-                    self._dr_navigate(SpsState.p_active_controller.p_pos, True)
+                    self._dr_navigate_to_player()
+                    self._dr_leave_nav_graph()
 
                 elif self.ai_agro_level > 0.:
-                    self._dr_navigate(self.ai_target_last_seen_pos, False)
+                    self._dr_navigate_flow(self.ai_target_last_seen_pos)
+                    self._dr_leave_nav_graph()
 
                 else:
-                    nodes_by_dist = sorted(SpsState.active_nav_nodes, key=lambda node: (node.node_pos - self.ai_trans._pos).length_squared())
-
-                    if nodes_by_dist:
-                        nodes_to_test = nodes_by_dist[:min(self.DRONE_NAVIG_MAX_ATTEMPTS, len(nodes_by_dist) - 1)]
-                        random.shuffle(nodes_to_test)
-
-                        target_node = None
-                        for node in nodes_to_test:
-                            # patrol with nav nodes
+                    # patrol with nav nodes
 
-                            node_pos_diff = node.node_pos - self.ai_trans._pos
+                    if self.dr_re_navig:
+                        self._dr_leave_nav_graph() # got stuck on the way, find a new way in
 
-                            node_dist = node_pos_diff.length()
-                            if node_dist < self.DRONE_NAVIG_TARGET_MARGIN:
-                                continue # already on this nav node
+                    self._dr_patrol_next_node()
 
-                            vis_ray = PhysRay.make(self.ai_trans._pos, node_pos_diff.normalize())
-                            vis_hit = GameState.collider_scene.first_hit(vis_ray, node_dist)
-
-                            if vis_hit is None:
-                                target_node = node
-                                break
-
-                        if target_node is not None:
-                            self._dr_navigate(target_node.node_pos, False)
-
-            idling_at_target = True
+            idling_at_target = not following_flow # still on the way, keep the stuck detection going
         else:
             self.dr_nav_margin_cooldown = GameState.current_time
             idling_at_target = False
 
         # stuck detection
 
-        if self.dr_vel.length_squared() > .05 or idling_at_target:
+        dr_vel = SpsState.drone_system.dr_vel[self.dr_slot]
+
+        if dr_vel.dot(dr_vel) > .05 or idling_at_target:
             self.dr_last_non_stuck_time = GameState.current_time
             self.dr_re_navig = False
 
@@ -512,39 +537,9 @@ class SpsHitboxAi:
             self.dr_re_navig = True
 
         self.ai_last_update = GameState.current_time
-        seq.after(1 / self.AI_UPDATE_RATE, self.update_ai_enemy_drone)
 
     def tick_enemy_drone(self) -> None:
-        # tick travel update
-
-        target_diff = self.dr_nav_target_pos - self.ai_trans._pos
-
-        try: nav_target_vel: Vec3 = target_diff.normalize() * min(self.DRONE_NAVIG_SPEED, math.exp(target_diff.length()) - .6)
-        except: nav_target_vel = Vec3()
-
-        # try to avoid flying into the players face
-        player_diff = (self.ai_trans._pos - SpsState.p_active_controller.p_pos)
-        player_repulsion = player_diff.normalize() * max(2. - player_diff.length(), 0.) * self.DRONE_NAVIG_PLAYER_AVOIDANCE
-
-        try: nav_accel: Vec3 = ((nav_target_vel - self.dr_vel) * self.DRONE_NAVIG_ACCEL).clamp_magnitude(self.DRONE_NAVIG_SPEED) + player_repulsion
-        except: nav_accel = Vec3()
-
-        self.dr_vel += (nav_accel * GameState.delta_time)
-        self._dr_check_collisions_and_apply_velocity()
-
-        # rotate model by dir
-
-        if self.ai_agro_level == 100.:
-            target_diff = SpsState.p_active_controller.p_pos - self.ai_trans._pos
-
-            try: forward_dir_flat = Vec3(target_diff.x, 0., target_diff.z).normalize()
-            except: forward_dir_flat = Vec3(0., 0., 0.)
-
-        else:
-            try: forward_dir_flat = Vec3(self.dr_vel.x, 0., self.dr_vel.z).normalize()
-            except: forward_dir_flat = Vec3(0., 0., 0.)
-        
-        self.ai_trans.set_rot(Vec3(0., math.degrees(math.atan2(forward_dir_flat.z, forward_dir_flat.x)), 0.) + self.ai_overlay_rot)
+        # note: movement and rotation is integrated for all drones at once in DroneSystem
 
         # fire bursts
 
@@ -559,17 +554,15 @@ class SpsHitboxAi:
             target_dir = (SpsState.p_active_controller.p_pos - self.ai_fire_pos + Vec3(0., SpsState.p_active_controller.PLAYER_SIZE.y / 2, 0.)).normalize()
 
             # load bullet prefab
-            proj_name = f"__{self.local_name}_proj_{self.ai_next_projectile_id}"
-            proj_prefab = prefabs.load_prefab(proj_name, "prefabs/drone_bullet.json")
+            proj_data = prefabs.load_prefab(self.local_name, "prefabs/drone_bullet.json")[0][2]
 
             # setup initial dynamic entity data
-            proj_prefab[0][2]["t_pos"] = self.ai_fire_pos
-            proj_prefab[0][2]["projectile_dir"] = target_dir
+            proj_data["t_pos"] = self.ai_fire_pos
+            proj_data["projectile_dir"] = target_dir
 
-            prefabs.spawn_prefab(proj_prefab)
+            SpsState.projectile_system.fire(proj_data)
 
             self.tr_fire_colldown = time.perf_counter()
-            self.ai_next_projectile_id += 1
 
         # debug gizmos
 
@@ -581,8 +574,19 @@ class SpsHitboxAi:
             gizmo.draw_line(self.dr_nav_target_pos + Vec3(.0, .1, .0), self.dr_nav_target_pos - Vec3(.0, .1, .0), line_col, line_col)
             gizmo.draw_line(self.dr_nav_target_pos + Vec3(.0, .0, .1), self.dr_nav_target_pos - Vec3(.0, .0, .1), line_col, line_col)
 
+            nav_accel = Vec3(*SpsState.drone_system.dr_accel[self.dr_slot])
+            dr_vel = Vec3(*SpsState.drone_system.dr_vel[self.dr_slot])
+
             gizmo.draw_line(self.ai_trans._pos, self.ai_trans._pos + nav_accel, Vec3(1., 0., 0.), Vec3(1., 0., 0.))
-            gizmo.draw_line(self.ai_trans._pos, self.ai_trans._pos + self.dr_vel, Vec3(1., 0., 1.), Vec3(1., 0., 1.))
+            gizmo.draw_line(self.ai_trans._pos, self.ai_trans._pos + dr_vel, Vec3(1., 0., 1.), Vec3(1., 0., 1.))
+
+            path_col = Vec3(.08, .35, .8)
+            path_pos = self.dr_nav_target_pos
+
+            for node_id in self.dr_nav_nodes_to_travel:
+                node_pos = SpsState.nav_graph.node_pos[node_id]
+                gizmo.draw_line(path_pos, node_pos, path_col, path_col)
+                path_pos = node_pos
 
             if self.ai_agro_level > 0.:
                 gizmo.draw_box(self.ai_target_last_seen_pos - Vec3(.2, .2, .2), self.ai_target_last_seen_pos + Vec3(.2, .2, .2), Vec3(.35, 1., 1.))
@@ -591,21 +595,50 @@ class SpsHitboxAi:
 
     @staticmethod
     def spawn(en_data: dict) -> 'SpsHitboxAi':
-        return SpsHitboxAi(en_data)
+        return prefabs.pooled_instance(SpsHitboxAi, en_data)
 
-    def despawn(self) -> None:
-        self.local_name = None
+    def pool_reset(self, en_data: dict) -> None:
+        # reused from a prefab pool, only the dynamic fields of en_data are picked up again
+
+        self.ai_trans.set_pos_rot(en_data["t_pos"], en_data["t_rot"])
+        self.ai_model.show()
 
+        if self.ai_type == 0:
+            self.tr_laser_renderer.show()
+
+        self._spawn_state(en_data)
+
+    def pool_destroy(self) -> None:
         if self.ai_type == 0:
             self.tr_laser_renderer.despawn()
-        elif self.ai_type == 1:
-            SpsState.active_drone_count -= 1
 
         self.ai_model.despawn()
 
+    def despawn(self) -> None:
+        self.local_name = None
+
+        if self.ai_type == 1:
+            SpsState.active_drone_count -= 1
+            SpsState.drone_system.remove_drone(self)
+
+        SpsState.ai_scheduler.remove_ai(self)
+
         SpsState.active_enemy_count -= 1
         SpsState.hitbox_scene.remove_coll(self.ai_hitbox)
 
+        self.ai_fire_emitter.set_on_fire(False)
+
+        if prefabs.release_instance(self):
+            # kept hidden for the next spawn of the same prefab
+            self.ai_model.hide()
+
+            if self.ai_type == 0:
+                self.tr_laser_renderer.hide()
+
+            return
+
+        self.pool_destroy()
+
     @staticmethod
     def dev_tick(s: dict | None, dev_state: en.DevTickState, en_data: dict) -> dict:
         # validate entity data
@@ -655,7 +688,7 @@ class SpsHitboxAi:
     ai_type: int
 
     ai_trans: Transform
-    ai_model: ModelRenderer
+    ai_model: ModelRenderer | InstancedRenderer
 
     ai_hitbox_size: Vec3
     ai_hitbox: PhysAABB
@@ -667,6 +700,9 @@ class SpsHitboxAi:
     ai_target_last_seen_pos: Vec3
     ai_target_last_seen_time: float
     ai_last_update: float
+    ai_next_update: float # set by the ai scheduler
+    ai_suspended: bool # set by the ai scheduler, no ai updates or ticks while True
+    ai_zone: str | None # phys sub-zone id, set by the ai scheduler
 
     ai_fire_end_time: float
     ai_fire_damage_cooldown: float
@@ -680,22 +716,24 @@ class SpsHitboxAi:
 
     tr_prefire_pause: float
     tr_laser_length: float
+    tr_laser_cast_dir: Vec3
     tr_fire_colldown: float
-    ai_next_projectile_id: int
 
     tr_scan_cooldown: float
     tr_initial_view_dir: Vec3
+    tr_pvs_id: int
 
-    tr_laser_renderer: LineRenderer
-    tr_laser_mesh: GPUMesh
+    tr_laser_renderer: BeamRenderer
 
     # drone vars
 
-    dr_vel: Vec3
+    dr_slot: int # handle into SpsState.drone_system arrays (pos, vel, nav target)
 
     dr_nav_target_pos: Vec3 # current nav target
     dr_nav_target_is_player: bool
+    dr_nav_on_flow: bool # following SpsState.flow_field waypoints
     dr_nav_nodes_to_travel: list[int] # nav nodes in a queue to nav to the desired pos
+    dr_nav_node_id: int # last nav node targeted while patrolling, -1 when off the nav graph
     dr_nav_margin_cooldown: float
 
     dr_fire_cooldown: float
@@ -704,7 +742,10 @@ class SpsHitboxAi:
 
     dr_re_navig: bool
     dr_last_non_stuck_time: float
+    dr_trigger_actor: bool # swept through SpsState.trigger_grid by the drone system
 
+    ai_is_ticking: bool # a tick is queued, see _spawn_state
+    prefab_pool: 'prefabs.PrefabPool | None'
     local_name: str | None
 
 def gen_def_data() -> dict:
@@ -717,12 +758,15 @@ def gen_def_data() -> dict:
         "ai_idle_dir": Vec3(0.0, 0.0, 1.0),
         "hitbox_scale": Vec3(1.0, 1.0, 1.0),
         "hitbox_health": 120,
+        "ai_trigger_actor": False, # drones only, fire trigger events
         "a_model_mesh": "models/icosph.npz",
         "a_model_vshader": "shaders/base_cam.vert",
         "a_model_fshader": "shaders/unlit.frag",
         "a_model_albedo": "textures/def_white.png",
         "a_model_transparent": False,
         "a_model_uniforms": {},
+        "a_model_instanced": False,
     }
 
-en.create_entity_type("sps_hitbox_ai", SpsHitboxAi.spawn, SpsHitboxAi.despawn, SpsHitboxAi.dev_tick, gen_def_data)
\ No newline at end of file
+en.create_entity_type("sps_hitbox_ai", SpsHitboxAi.spawn, SpsHitboxAi.despawn, SpsHitboxAi.dev_tick, gen_def_data)
+prefabs.declare_entity_prefabs("sps_hitbox_ai", ("prefabs/turret_debris.json", "prefabs/turret_bullet.json", "prefabs/drone_bullet.json"))
\ No newline at end of file
@@ -1,9 +1,7 @@
-import time
-
 from dataclasses import dataclass
 from engine.cue.entities import cue_entity_types as en
-from engine.cue.cue_state import GameState
 from sps_state import SpsState
+from sps_triggers import TRIGGER_ACTOR_PLAYER
 import sps_player as player
 
 from engine.cue.components.cue_transform import Transform
@@ -19,22 +17,22 @@ from engine.cue.entities.cue_entity_utils import handle_transform_edit_mode
 @dataclass(init=False, slots=True)
 class SpsHurtTrigger:
     def __init__(self, en_data: dict) -> None:
-        self.aabb = PhysAABB.make(en_data["t_pos"], en_data["t_scale"], self)
-        GameState.trigger_scene.add_coll(self.aabb)
-        
         self.hurt_damage = int(en_data["hurt_damage"])
         self.hurt_interval = en_data["hurt_interval"]
 
-        self.last_damage_time = 0
+        # the grid rate-limits on_stay to the hurt interval
+        self.aabb = PhysAABB.make(en_data["t_pos"], en_data["t_scale"], self)
+        SpsState.trigger_grid.add_trigger(self.aabb, self, TRIGGER_ACTOR_PLAYER, self.hurt_interval)
 
-    def on_triggered(self) -> None:
+    def on_enter(self, actor: object, actor_layer: int) -> None:
         if self.hurt_interval == 0.:
             player.p_kill()
             return
 
-        if time.perf_counter() - self.last_damage_time > self.hurt_interval:
-            player.p_take_damage(self.hurt_damage)
-            self.last_damage_time = time.perf_counter()
+        player.p_take_damage(self.hurt_damage)
+
+    def on_stay(self, actor: object, actor_layer: int) -> None:
+        self.on_enter(actor, actor_layer)
 
     # == entity hooks ==
 
@@ -43,7 +41,7 @@ class SpsHurtTrigger:
         return SpsHurtTrigger(en_data)
 
     def despawn(self) -> None:
-        GameState.trigger_scene.remove_coll(self.aabb)
+        SpsState.trigger_grid.remove_trigger(self.aabb)
 
     @staticmethod
     def dev_tick(s: dict | None, dev_state: en.DevTickState, en_data: dict) -> dict:
@@ -80,8 +78,6 @@ class SpsHurtTrigger:
     hurt_damage: int
     hurt_interval: float
 
-    last_damage_time: float
-
 def gen_def_data() -> dict:
     return {
         "t_pos": None,
@@ -21,6 +21,7 @@ class SpsNavNode:
     def __init__(self, en_data: dict) -> None:
         self.node_pos = en_data["t_pos"]
         SpsState.active_nav_nodes.append(self)
+        SpsState.nav_node_index.insert(self.node_pos)
 
     # == entity hooks ==
 
@@ -29,7 +30,7 @@ class SpsNavNode:
         return SpsNavNode(en_data)
 
     def despawn(self) -> None:
-        GameState.trigger_scene.remove_coll(self.aabb)
+        pass # nav nodes are static, the node index and nav graph are rebuilt on map reset
 
     @staticmethod
     def dev_tick(s: dict | None, dev_state: en.DevTickState, en_data: dict) -> dict:
@@ -10,6 +10,7 @@ from engine.cue.entities.cue_entity_utils import handle_transform_edit_mode
 
 from sps_state import SpsState
 from components.player_move import PlayerMovement
+import prefabs
 
 from pygame.math import Vector3 as Vec3, Vector2 as Vec2
 
@@ -59,4 +60,5 @@ def gen_def_data():
         "spawn_rot": Vec2(),
     }
 
-en.create_entity_type("sps_player_spawn", SpsPlayerSpawn.spawn, None, SpsPlayerSpawn.dev_tick, gen_def_data)
\ No newline at end of file
+en.create_entity_type("sps_player_spawn", SpsPlayerSpawn.spawn, None, SpsPlayerSpawn.dev_tick, gen_def_data)
+prefabs.declare_entity_prefabs("sps_player_spawn", ("prefabs/view_models/glock_19.json", "prefabs/view_models/flamethrower.json", "prefabs/view_models/gravgun.json"))
\ No newline at end of file
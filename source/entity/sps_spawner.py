@@ -5,7 +5,7 @@ from engine.cue.cue_state import GameState
 
 from engine.cue.components.cue_transform import Transform
 from engine.cue.components.cue_model import ModelRenderer
-from engine.cue.phys.cue_phys_types import PhysAABB, PhysRay
+from engine.cue.phys.cue_phys_types import PhysAABB
 
 from pygame.math import Vector3 as Vec3, Vector2 as Vec2
 from engine.cue.entities.cue_entity_utils import handle_transform_edit_mode
@@ -14,6 +14,7 @@ from engine.cue.entities.bt_static_mesh import BtStaticMesh
 from engine.cue.rendering import cue_gizmos as gizmo
 
 from sps_state import SpsState
+from sps_hitbox_scene import HITBOX_LAYER_SPAWNER
 from components.fire_emitter import FireEmitter
 import prefabs
 
@@ -21,13 +22,15 @@ import numpy as np
 
 @dataclass(init=False, slots=True)
 class SpsSpawner:
+    SPAWNER_MAX_DRONES = 30 # global cap on active drones, shared by all spawners
+
     def __init__(self, en_data: dict) -> None:
         self.drone_spawn_cooldown = 0.
         self.next_drone_id = 0
 
         self.hitbox_health = en_data["hitbox_health"]
         self.hitbox = PhysAABB.make(en_data["t_pos"], en_data["t_scale"].elementwise() * en_data["hitbox_scale"], self)
-        SpsState.hitbox_scene.add_coll(self.hitbox)
+        SpsState.hitbox_scene.add_coll(self.hitbox, HITBOX_LAYER_SPAWNER)
 
         self.fire_end_time = 0.
         self.fire_emitter = FireEmitter()
@@ -37,6 +40,7 @@ class SpsSpawner:
         self.mesh_renderer = ModelRenderer(en_data, self.mesh_trans)
 
         self.drone_spawn_pos = Vec3(*(self.mesh_trans._trans_matrix @ np.array([*en_data["spawn_pos"], 1.], dtype=np.float32))[0:3])
+        self.pvs_id = SpsState.shooter_pvs.add_shooter([self.drone_spawn_pos])
         self.local_name = en_data["bt_en_name"]
 
         SpsState.active_enemy_count += 1
@@ -50,14 +54,16 @@ class SpsSpawner:
         if self.fire_end_time < GameState.current_time:
             self.fire_emitter.set_on_fire(False)
 
-        if GameState.current_time - self.drone_spawn_cooldown > 1.5 and SpsState.active_drone_count < 15 and SpsState.p_health != 0:
+        if GameState.current_time - self.drone_spawn_cooldown > 1.5 and SpsState.active_drone_count < self.SPAWNER_MAX_DRONES and SpsState.p_health != 0:
             # test if player is visible to spawner
 
             player_diff = SpsState.p_active_controller.p_pos - self.drone_spawn_pos
 
-            if player_diff.length_squared() != 0.:
-                test_ray = PhysRay.make(self.drone_spawn_pos, player_diff.normalize())
-                is_visible = GameState.collider_scene.first_hit(test_ray, player_diff.length()) is None
+            if not SpsState.shooter_pvs.maybe_visible(self.pvs_id, SpsState.p_active_controller.p_pos):
+                is_visible = False # ruled out by the pvs, skip the raycast
+
+            elif player_diff.length_squared() != 0.:
+                is_visible = not SpsState.static_colls.occluded(self.drone_spawn_pos, self.drone_spawn_pos + player_diff)
             else:
                 is_visible = True
 
@@ -114,6 +120,7 @@ class SpsSpawner:
         SpsState.active_enemy_count -= 1
 
         self.mesh_renderer.despawn()
+        self.fire_emitter.set_on_fire(False)
         SpsState.hitbox_scene.remove_coll(self.hitbox)
 
     @staticmethod
@@ -154,6 +161,7 @@ class SpsSpawner:
     drone_spawn_cooldown: float
     drone_spawn_pos: Vec3
     next_drone_id: int
+    pvs_id: int
 
     hitbox: PhysAABB
     hitbox_health: int
@@ -181,4 +189,5 @@ def gen_def_data():
         "a_model_uniforms": {},
     }
 
-en.create_entity_type("sps_spawner", SpsSpawner.spawn, SpsSpawner.despawn, SpsSpawner.dev_tick, gen_def_data)
\ No newline at end of file
+en.create_entity_type("sps_spawner", SpsSpawner.spawn, SpsSpawner.despawn, SpsSpawner.dev_tick, gen_def_data)
+prefabs.declare_entity_prefabs("sps_spawner", ("prefabs/drone.json", "prefabs/spawner_debris.json"))
\ No newline at end of file
@@ -55,6 +55,7 @@ import entity.sps_hitbox_ai
 import entity.sps_nav_node
 
 from sps_state import SpsState
+from sps_hitbox_scene import HitboxScene
 import dev_utils
 import sps_manager
 import sps_player
@@ -74,7 +75,7 @@ GameState.trigger_scene = PhysScene()
 
 # == Init game state ==
 
-SpsState.hitbox_scene = PhysScene()
+SpsState.hitbox_scene = HitboxScene()
 cue_map.load_map(BOOTUP_MAP)
 
 from sps_post_pass import BloomPostPass, TonemapPostPass
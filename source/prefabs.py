@@ -1,37 +1,255 @@
 import os, json, copy
 
+from dataclasses import dataclass
 from engine.cue.cue_map import load_en_param_types
 from engine.cue.cue_state import GameState
+from engine.cue.components.cue_transform import Transform
+from engine.cue import cue_utils as utils
+
+from components.instanced_renderer import create_model_renderer
+
+from pygame.math import Vector3 as Vec3, Vector2 as Vec2
 
 # a tiny entity prefab api engine extesion which is not part of the engine due to lack of polish
 
-prefab_cache: dict[str, dict] = {}
+# == instance pooling ==
+# opt-in per prefab file with a "[pool]" entry: {"max_size": int, "prewarm": int}
+# pooled entity types return pooled_instance() from their spawn hook, implement pool_reset(en_data) and pool_destroy(),
+# and only hide themselves in despawn when release_instance() keeps them
+
+@dataclass(init=False, slots=True)
+class PrefabPool:
+    def __init__(self, max_size: int, prewarm_count: int) -> None:
+        self.max_size = max_size
+        self.prewarm_count = prewarm_count
+
+        self.free_instances = []
+        self.is_active = True
+
+    max_size: int
+    prewarm_count: int
+
+    free_instances: list # despawned, hidden entities ready for reuse
+    is_active: bool # False once cleared with the map, late releases are then destroyed
+
+prefab_pools: dict[tuple[str, str], PrefabPool] = {} # (path, entity name template) -> pool
+
+_spawning_pool: PrefabPool | None = None
+
+def _get_pool(path: str, en_name_template: str, pool_config: dict | None) -> PrefabPool | None:
+    if pool_config is None:
+        return None
+
+    pool = prefab_pools.get((path, en_name_template), None)
+
+    if pool is None:
+        pool = PrefabPool(pool_config["max_size"], pool_config.get("prewarm", 0))
+        prefab_pools[(path, en_name_template)] = pool
+
+    return pool
+
+def pooled_instance(en_class: type, en_data: dict) -> object:
+    # for entity spawn hooks, reuses a pooled instance when spawned through a pooled prefab
+
+    pool = _spawning_pool
+
+    if pool is not None and pool.free_instances:
+        instance = pool.free_instances.pop()
+        instance.pool_reset(en_data)
+    else:
+        instance = en_class(en_data)
+
+    instance.prefab_pool = pool
+    return instance
+
+def release_instance(instance: object) -> bool:
+    # for entity despawn hooks, True if the pool keeps the instance (which should then only hide itself)
+
+    pool = instance.prefab_pool
+
+    if pool is None or not pool.is_active or len(pool.free_instances) >= pool.max_size:
+        return False
+
+    pool.free_instances.append(instance)
+    return True
+
+def prewarm_pools(paths: set[str]) -> None:
+    for path in paths:
+        prefab = load_prefab(f"__prewarm_{os.path.basename(path)}", path)
+
+        if not prefab or prefab[0][3] is None:
+            continue # not a pooled prefab
+
+        prewarm_count = prefab[0][3].prewarm_count - len(prefab[0][3].free_instances)
+
+        # all instances are spawned first, so they don't get reused between each other
+        spawned = []
+
+        for i in range(prewarm_count):
+            instance_prefab = load_prefab(f"__prewarm_{os.path.basename(path)}_{i}", path)
+
+            for en_name, en_type, en_data, pool in instance_prefab:
+                if en_data.get("t_pos", None) is None:
+                    en_data["t_pos"] = Vec3()
+
+                if en_data.get("t_rot", None) is None:
+                    en_data["t_rot"] = Vec3()
+
+            spawn_prefab(instance_prefab)
+            spawned.extend(en_name for en_name, _, _, _ in instance_prefab)
+
+        for en_name in spawned:
+            GameState.entity_storage.despawn(en_name)
+
+def clear_pools() -> None:
+    # pooled instances belong to the current map, called on map reset
+
+    for pool in prefab_pools.values():
+        pool.is_active = False
+
+        for instance in pool.free_instances:
+            instance.pool_destroy()
+
+        pool.free_instances.clear()
+
+    prefab_pools.clear()
+
+# == map preloading ==
+# entity types declare the prefabs they may spawn, on map load all prefabs reachable from the maps type list
+# get compiled, their model assets loaded and their pools prewarmed, so nothing is read from disk mid-fight
+
+entity_type_prefabs: dict[str, tuple[str, ...]] = {}
+
+is_map_loading = True
+cold_loads: list[tuple[str, str]] = [] # (map, prefab path) compiled outside of map loading
+
+def declare_entity_prefabs(en_type: str, paths: tuple[str, ...]) -> None:
+    entity_type_prefabs[en_type] = paths
+
+def begin_map_load() -> None:
+    global is_map_loading
+    is_map_loading = True
+
+def _warm_assets(template: 'PrefabTemplate') -> None:
+    # a throwaway renderer loads the mesh, shaders and texture into the asset manager (and builds the instancing batch)
+
+    for _, _, _, en_data, _ in template.en_templates:
+        if not all(isinstance(en_data.get(k, None), str) for k in ("a_model_mesh", "a_model_vshader", "a_model_fshader")):
+            continue
+
+        renderer = create_model_renderer(en_data, Transform(Vec3(), Vec3()))
+        renderer.despawn()
+
+def preload_map_prefabs(map_path: str) -> None:
+    global is_map_loading
+
+    try:
+        with open(map_path, 'r') as f:
+            type_list = json.load(f)["cmf_header"]["type_list"]
+
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        utils.warn(f"[prefabs] failed to read the type list of \"{map_path}\" ({e}), skipping prefab preload")
+        type_list = []
+
+    # walk entity types -> prefabs -> entity types in those prefabs
+
+    to_visit = list(type_list)
+    visited_types = set()
+    reachable_paths = set()
+
+    while to_visit:
+        en_type = to_visit.pop()
+
+        if en_type in visited_types:
+            continue
+
+        visited_types.add(en_type)
+
+        for path in entity_type_prefabs.get(en_type, ()):
+            if path in reachable_paths:
+                continue
+
+            reachable_paths.add(path)
+
+            template = _get_template(path)
+            _warm_assets(template)
+
+            to_visit.extend(en_type for _, _, en_type, _, _ in template.en_templates)
+
+    prewarm_pools(reachable_paths)
+    is_map_loading = False
+
+# == prefab api ==
+# prefab files are compiled once into templates with all params already deserialized,
+# instancing then only copies the mutable params and patches in the instance name
+
+PREFAB_MUTABLE_TYPES = (Vec3, Vec2, list, dict)
+
+@dataclass(init=False, slots=True)
+class PrefabTemplate:
+    def __init__(self, path: str, file_data: dict) -> None:
+        self.path = path
+        self.pool_config = file_data.get("[pool]", None)
+        self.en_templates = []
+
+        for en_name, (en_type, en_data) in file_data.items():
+            if en_name == "[pool]":
+                continue
+
+            typed_data = load_en_param_types(en_data)
+            mutable_keys = tuple(k for k, v in typed_data.items() if isinstance(v, PREFAB_MUTABLE_TYPES))
+
+            self.en_templates.append((en_name, en_name.partition("[prefab_name]"), en_type, typed_data, mutable_keys))
+
+    def instantiate(self, prefab_name: str) -> list:
+        lp = []
+
+        for en_name, (name_head, has_name, name_tail), en_type, typed_data, mutable_keys in self.en_templates:
+            en_data = dict(typed_data)
+
+            for k in mutable_keys:
+                en_data[k] = copy.copy(typed_data[k])
+
+            instance_name = name_head + prefab_name + name_tail if has_name else en_name
+            lp.append((instance_name, en_type, en_data, _get_pool(self.path, en_name, self.pool_config)))
+
+        return lp
+
+    path: str
+    pool_config: dict | None
+    en_templates: list[tuple[str, tuple[str, str, str], str, dict, tuple[str, ...]]] # (name template, split name template, type, typed data, mutable keys)
+
+prefab_cache: dict[str, PrefabTemplate] = {}
+
+def _get_template(path: str) -> PrefabTemplate:
+    # compile and cache
+
+    template = prefab_cache.get(path, None)
+
+    if template is None:
+        if not is_map_loading:
+            cold_loads.append((GameState.current_map, path))
 
-def load_prefab(prefab_name: str, path: str) -> list:
-    # load and cache
-    
-    p = prefab_cache.get(path, None)
-    
-    if p is None:
         with open(os.path.join(GameState.asset_manager.asset_dir, path), 'r') as f:
-            p = json.load(f)
-        prefab_cache[path] = p
-    
-    # copy and deserialize
+            template = PrefabTemplate(path, json.load(f))
+        prefab_cache[path] = template
 
-    lp = []
+    return template
 
-    for en_name, data in p.items():
-        en_type, en_data = data
-        en_name = en_name.replace("[prefab_name]", prefab_name)
-        
-        lp.append((en_name, en_type, load_en_param_types(en_data)))
-    
-    return lp
+def load_prefab(prefab_name: str, path: str) -> list:
+    return _get_template(path).instantiate(prefab_name)
 
 def spawn_prefab(prefab: list) -> None:
-    for en_name, en_type, en_data in prefab:
-        GameState.entity_storage.spawn(en_type, en_name, load_en_param_types(en_data))
+    global _spawning_pool
+
+    # note: en_data is already deserialized by load_prefab
+    for en_name, en_type, en_data, pool in prefab:
+        _spawning_pool = pool
+
+        try:
+            GameState.entity_storage.spawn(en_type, en_name, en_data)
+        finally:
+            _spawning_pool = None
 
 def spawn_prefab_from_file(prefab_name: str, path: str) -> None:
-    spawn_prefab(load_prefab(prefab_name, path))
\ No newline at end of file
+    spawn_prefab(load_prefab(prefab_name, path))
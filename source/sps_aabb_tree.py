@@ -0,0 +1,306 @@
+from dataclasses import dataclass
+from typing import Callable
+
+# a dynamic aabb tree for moving boxes, leaves store fattened bounds so small moves don't touch the tree at all
+# every node also stores the or-ed layer bits of all leaves below it, so masked queries skip whole subtrees
+# note: boxes are plain [min_x, min_y, min_z, max_x, max_y, max_z] lists, kept in python floats for the scalar traversal
+
+INF = float('inf')
+
+def _union(a: list[float], b: list[float]) -> list[float]:
+    return [min(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3]), max(a[4], b[4]), max(a[5], b[5])]
+
+def _area(a: list[float]) -> float:
+    x, y, z = a[3] - a[0], a[4] - a[1], a[5] - a[2]
+    return x * y + y * z + z * x
+
+def _contains(outer: list[float], inner: list[float]) -> bool:
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] <= inner[2] and outer[3] >= inner[3] and outer[4] >= inner[4] and outer[5] >= inner[5]
+
+def ray_box_entry(box: list[float], origin: tuple[float, float, float], inv_dir: tuple[float, float, float], pad: tuple[float, float, float], tmax: float) -> float:
+    # slab test of a ray against box grown by pad, returns the entry param in [0, tmax] (0 if starting inside) or -1 on a miss
+    # note: axes the ray runs parallel to (inv_dir of inf) only check the origin is within the slab
+
+    t_near = 0.
+    t_far = tmax
+
+    for axis in range(3):
+        o = origin[axis]
+        lo = box[axis] - pad[axis]
+        hi = box[axis + 3] + pad[axis]
+
+        if inv_dir[axis] == INF:
+            if o < lo or o > hi:
+                return -1.
+        else:
+            t1 = (lo - o) * inv_dir[axis]
+            t2 = (hi - o) * inv_dir[axis]
+
+            if t1 > t2:
+                t1, t2 = t2, t1
+
+            if t1 > t_near:
+                t_near = t1
+            if t2 < t_far:
+                t_far = t2
+
+            if t_near > t_far:
+                return -1.
+
+    return t_near
+
+@dataclass(init=False, slots=True)
+class AabbTree:
+    TREE_FAT_MARGIN = .3 # leaves are reinserted only once their box moves this far out of the fattened bounds
+
+    def __init__(self) -> None:
+        self.node_box = []
+        self.node_parent = []
+        self.node_left = []
+        self.node_right = []
+        self.node_mask = []
+        self.node_usr = []
+
+        self.free_nodes = []
+        self.root = -1
+
+    # == nodes ==
+
+    def _alloc_node(self, box: list[float], mask: int, usr: object) -> int:
+        if self.free_nodes:
+            node = self.free_nodes.pop()
+
+            self.node_box[node] = box
+            self.node_parent[node] = -1
+            self.node_left[node] = -1
+            self.node_right[node] = -1
+            self.node_mask[node] = mask
+            self.node_usr[node] = usr
+
+            return node
+
+        self.node_box.append(box)
+        self.node_parent.append(-1)
+        self.node_left.append(-1)
+        self.node_right.append(-1)
+        self.node_mask.append(mask)
+        self.node_usr.append(usr)
+
+        return len(self.node_box) - 1
+
+    def _free_node(self, node: int) -> None:
+        self.node_usr[node] = None
+        self.free_nodes.append(node)
+
+    def _refit(self, node: int) -> None:
+        # walk up from node, recomputing bounds and layer masks
+
+        while node != -1:
+            left = self.node_left[node]
+            right = self.node_right[node]
+
+            self.node_box[node] = _union(self.node_box[left], self.node_box[right])
+            self.node_mask[node] = self.node_mask[left] | self.node_mask[right]
+
+            node = self.node_parent[node]
+
+    def _insert_leaf(self, leaf: int) -> None:
+        if self.root == -1:
+            self.root = leaf
+            return
+
+        # descend to the sibling with the cheapest surface area growth
+
+        leaf_box = self.node_box[leaf]
+        node = self.root
+
+        while self.node_left[node] != -1:
+            left = self.node_left[node]
+            right = self.node_right[node]
+
+            combined_area = _area(_union(self.node_box[node], leaf_box))
+
+            # cost of pairing with this node vs. pushing the leaf further down
+            cost_here = 2. * combined_area
+            inherited = 2. * (combined_area - _area(self.node_box[node]))
+
+            cost_left = _area(_union(self.node_box[left], leaf_box)) + inherited
+            cost_right = _area(_union(self.node_box[right], leaf_box)) + inherited
+
+            if self.node_left[left] != -1:
+                cost_left -= _area(self.node_box[left])
+
+            if self.node_left[right] != -1:
+                cost_right -= _area(self.node_box[right])
+
+            if cost_here < cost_left and cost_here < cost_right:
+                break
+
+            node = left if cost_left < cost_right else right
+
+        # replace the sibling with a new parent of both
+
+        sibling = node
+        old_parent = self.node_parent[sibling]
+        new_parent = self._alloc_node(_union(self.node_box[sibling], leaf_box), self.node_mask[sibling] | self.node_mask[leaf], None)
+
+        self.node_parent[new_parent] = old_parent
+        self.node_left[new_parent] = sibling
+        self.node_right[new_parent] = leaf
+        self.node_parent[sibling] = new_parent
+        self.node_parent[leaf] = new_parent
+
+        if old_parent == -1:
+            self.root = new_parent
+        else:
+            if self.node_left[old_parent] == sibling:
+                self.node_left[old_parent] = new_parent
+            else:
+                self.node_right[old_parent] = new_parent
+
+            self._refit(old_parent)
+
+    def _remove_leaf(self, leaf: int) -> None:
+        if leaf == self.root:
+            self.root = -1
+            return
+
+        parent = self.node_parent[leaf]
+        grand_parent = self.node_parent[parent]
+        sibling = self.node_right[parent] if self.node_left[parent] == leaf else self.node_left[parent]
+
+        # the sibling takes the place of the parent
+
+        if grand_parent == -1:
+            self.root = sibling
+            self.node_parent[sibling] = -1
+        else:
+            if self.node_left[grand_parent] == parent:
+                self.node_left[grand_parent] = sibling
+            else:
+                self.node_right[grand_parent] = sibling
+
+            self.node_parent[sibling] = grand_parent
+            self._refit(grand_parent)
+
+        self._free_node(parent)
+
+    # == proxies ==
+
+    def add_proxy(self, box: list[float], mask: int, usr: object) -> int:
+        m = self.TREE_FAT_MARGIN
+        leaf = self._alloc_node([box[0] - m, box[1] - m, box[2] - m, box[3] + m, box[4] + m, box[5] + m], mask, usr)
+
+        self._insert_leaf(leaf)
+        return leaf
+
+    def move_proxy(self, leaf: int, box: list[float]) -> bool:
+        # returns True if the leaf had to be reinserted
+
+        if _contains(self.node_box[leaf], box):
+            return False
+
+        m = self.TREE_FAT_MARGIN
+
+        self._remove_leaf(leaf)
+        self.node_box[leaf] = [box[0] - m, box[1] - m, box[2] - m, box[3] + m, box[4] + m, box[5] + m]
+        self._insert_leaf(leaf)
+
+        return True
+
+    def remove_proxy(self, leaf: int) -> None:
+        self._remove_leaf(leaf)
+        self._free_node(leaf)
+
+    # == queries ==
+
+    def query_ray(self, origin: tuple[float, float, float], inv_dir: tuple[float, float, float], tmax: float, pad: tuple[float, float, float], mask: int) -> list[object]:
+        # usr objects of the leaves whose fat bounds (grown by pad) the ray hits within [0, tmax], a ray dir component of 0 has an inv_dir of inf
+
+        found = []
+
+        if self.root == -1:
+            return found
+
+        stack = [self.root]
+
+        while stack:
+            node = stack.pop()
+
+            if not self.node_mask[node] & mask:
+                continue
+
+            if ray_box_entry(self.node_box[node], origin, inv_dir, pad, tmax) < 0.:
+                continue
+
+            if self.node_left[node] == -1:
+                found.append(self.node_usr[node])
+            else:
+                stack.append(self.node_left[node])
+                stack.append(self.node_right[node])
+
+        return found
+
+    def any_ray(self, origin: tuple[float, float, float], inv_dir: tuple[float, float, float], tmax: float, pad: tuple[float, float, float], mask: int, leaf_test: Callable[[object], bool]) -> bool:
+        # same walk as query_ray but stops at the first leaf leaf_test(usr) accepts, for any-hit queries with an exact test of the leaves
+
+        if self.root == -1:
+            return False
+
+        stack = [self.root]
+
+        while stack:
+            node = stack.pop()
+
+            if not self.node_mask[node] & mask:
+                continue
+
+            if ray_box_entry(self.node_box[node], origin, inv_dir, pad, tmax) < 0.:
+                continue
+
+            if self.node_left[node] == -1:
+                if leaf_test(self.node_usr[node]):
+                    return True
+            else:
+                stack.append(self.node_left[node])
+                stack.append(self.node_right[node])
+
+        return False
+
+    def query_box(self, box: list[float], mask: int) -> list[object]:
+        # usr objects of the leaves whose fat bounds overlap box
+
+        found = []
+
+        if self.root == -1:
+            return found
+
+        stack = [self.root]
+
+        while stack:
+            node = stack.pop()
+            b = self.node_box[node]
+
+            if not self.node_mask[node] & mask:
+                continue
+
+            if b[0] > box[3] or b[1] > box[4] or b[2] > box[5] or b[3] < box[0] or b[4] < box[1] or b[5] < box[2]:
+                continue
+
+            if self.node_left[node] == -1:
+                found.append(self.node_usr[node])
+            else:
+                stack.append(self.node_left[node])
+                stack.append(self.node_right[node])
+
+        return found
+
+    node_box: list[list[float]] # fattened for leaves
+    node_parent: list[int]
+    node_left: list[int] # -1 for leaves
+    node_right: list[int]
+    node_mask: list[int] # layer bits of the leaf, or of all leaves below
+    node_usr: list[object | None] # leaf payload
+
+    free_nodes: list[int]
+    root: int
@@ -0,0 +1,198 @@
+import time
+
+from dataclasses import dataclass
+from engine.cue import cue_sequence as seq
+from engine.cue.cue_state import GameState
+
+from sps_state import SpsState
+
+from pygame.math import Vector3 as Vec3
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from engine.cue.phys.cue_phys_scene import PhysScene
+    from entity.sps_hitbox_ai import SpsHitboxAi
+
+# a central scheduler for ai perception and navigation updates, with a per-frame time budget (SpsState.dev_ai_budget_ms)
+# due ais are updated by priority (agro, distance to the player, sharing a phys sub-zone with the player) until the budget runs out
+# note: idle ais in sub-zones not touching the players sub-zone are fully suspended, their per-frame ticks stop and
+# suspended drones are left out of the drone simulation until resumed
+
+@dataclass(init=False, slots=True)
+class AiScheduler:
+    AI_MIN_UPDATE_INTERVAL = 1 / 5 # for ais with a priority of 1. and more
+    AI_MAX_UPDATE_INTERVAL = 1.
+
+    AI_PRIORITY_DIST_SCALE = 15. # distance at which the distance priority falls to .5
+    AI_ZONE_LINK_MARGIN = 2. # sub-zones closer than this are considered connected
+
+    def __init__(self) -> None:
+        self.ais = []
+
+        self.zone_bounds = {}
+        self.zone_links = {}
+
+        self.is_ticking = False
+
+        self.stat_suspended = 0
+        self.stat_due = 0
+        self.stat_updated = 0
+        self.stat_deferred = 0
+        self.stat_update_ms = 0.
+
+    def add_ai(self, ai: 'SpsHitboxAi') -> None:
+        # spread out the initial updates over a few frames
+        ai.ai_next_update = GameState.current_time + (len(self.ais) % 8) * .05
+        ai.ai_suspended = False
+        ai.ai_zone = self.zone_of(ai.ai_trans._pos)
+
+        self.ais.append(ai)
+
+        if not self.is_ticking:
+            self.is_ticking = True
+            seq.next(self.tick)
+
+    def remove_ai(self, ai: 'SpsHitboxAi') -> None:
+        try:
+            self.ais.remove(ai)
+        except ValueError:
+            pass # not owned by this scheduler (eg. scheduler was already reset with the map)
+
+    # == sub-zones ==
+
+    def bake_zones(self, coll_scene: 'PhysScene') -> None:
+        # collect all sub-zone bounds and link the ones touching each other, done on map load
+
+        self.zone_bounds = {}
+        self._gather_zones(coll_scene)
+
+        margin = Vec3(self.AI_ZONE_LINK_MARGIN)
+
+        for zone_id, (a_min, a_max) in self.zone_bounds.items():
+            links = set()
+
+            for other_id, (b_min, b_max) in self.zone_bounds.items():
+                a_lo = a_min - margin
+                a_hi = a_max + margin
+
+                if a_lo.x <= b_max.x and a_hi.x >= b_min.x and a_lo.y <= b_max.y and a_hi.y >= b_min.y and a_lo.z <= b_max.z and a_hi.z >= b_min.z:
+                    links.add(other_id)
+
+            self.zone_links[zone_id] = links
+
+        for ai in self.ais:
+            ai.ai_zone = self.zone_of(ai.ai_trans._pos)
+
+    def _gather_zones(self, scene: 'PhysScene') -> None:
+        if scene.sub_aabb is not None:
+            self.zone_bounds[scene.sub_id] = (Vec3(*scene.sub_aabb.points[0]), Vec3(*scene.sub_aabb.points[1]))
+
+        for sub in scene.child_subscenes.values():
+            self._gather_zones(sub)
+
+    def zone_of(self, pos: Vec3) -> str | None:
+        # the smallest sub-zone containing pos, None if outside of all of them
+
+        best_id = None
+        best_volume = float('inf')
+
+        for zone_id, (z_min, z_max) in self.zone_bounds.items():
+            if z_min.x <= pos.x <= z_max.x and z_min.y <= pos.y <= z_max.y and z_min.z <= pos.z <= z_max.z:
+                size = z_max - z_min
+                volume = size.x * size.y * size.z
+
+                if volume < best_volume:
+                    best_id = zone_id
+                    best_volume = volume
+
+        return best_id
+
+    # == scheduling ==
+
+    def _ai_priority(self, ai: 'SpsHitboxAi', player_pos: Vec3, player_zone: str | None) -> float:
+        priority = ai.ai_agro_level / 100.
+        priority += self.AI_PRIORITY_DIST_SCALE / (self.AI_PRIORITY_DIST_SCALE + ai.ai_trans._pos.distance_to(player_pos))
+
+        if ai.ai_zone is not None and ai.ai_zone == player_zone:
+            priority += 1.
+
+        return priority
+
+    def tick(self) -> None:
+        if SpsState.ai_scheduler is not self:
+            return # stale scheduler from a previous map
+
+        if not self.ais:
+            self.is_ticking = False
+            return # restarted on next add_ai
+
+        now = GameState.current_time
+        player_pos = SpsState.p_active_controller.p_pos
+        player_zone = self.zone_of(player_pos)
+        player_links = self.zone_links.get(player_zone, None)
+
+        # all ais share one flow field towards the player, flooded on the first waypoint query of this tick
+        SpsState.flow_field.set_goal(player_pos)
+
+        # find the due ais, suspending the unreachable ones
+
+        due = []
+        self.stat_suspended = 0
+
+        for ai in self.ais:
+            # burning ais keep ticking, the fire burns out in their tick
+            is_suspended = ai.ai_agro_level == 0. and not ai.ai_fire_emitter.emitter_on_fire and ai.ai_zone is not None and player_links is not None and ai.ai_zone not in player_links
+
+            if is_suspended != ai.ai_suspended:
+                ai.set_suspended(is_suspended)
+
+            if is_suspended:
+                self.stat_suspended += 1
+                continue
+
+            if now >= ai.ai_next_update:
+                priority = self._ai_priority(ai, player_pos, player_zone)
+
+                # overdue ais slowly rise in priority, so none of them starve when over budget
+                due.append((priority + (now - ai.ai_next_update), priority, ai))
+
+        due.sort(key=lambda d: d[0], reverse=True)
+
+        # run as many updates as fit into the budget, the rest stay due for the next frame
+
+        budget = SpsState.dev_ai_budget_ms / 1000.
+        start_time = time.perf_counter()
+        updated = 0
+
+        for _, priority, ai in due:
+            if updated > 0 and time.perf_counter() - start_time > budget:
+                break
+
+            ai.update_ai()
+            ai.ai_zone = self.zone_of(ai.ai_trans._pos) # drones move, refresh on each update
+            ai.ai_next_update = now + self.AI_MIN_UPDATE_INTERVAL / max(min(priority, 1.), self.AI_MIN_UPDATE_INTERVAL / self.AI_MAX_UPDATE_INTERVAL)
+
+            updated += 1
+
+        self.stat_due = len(due)
+        self.stat_updated = updated
+        self.stat_deferred = len(due) - updated
+        self.stat_update_ms = (time.perf_counter() - start_time) * 1000.
+
+        seq.next(self.tick)
+
+    ais: list['SpsHitboxAi']
+
+    zone_bounds: dict[str, tuple[Vec3, Vec3]] # sub_id -> (min, max)
+    zone_links: dict[str, set[str]] # sub_id -> touching sub_ids (including itself)
+
+    is_ticking: bool
+
+    # perf overlay counters, for the last frame
+
+    stat_suspended: int
+    stat_due: int
+    stat_updated: int
+    stat_deferred: int
+    stat_update_ms: float
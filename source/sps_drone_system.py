@@ -0,0 +1,353 @@
+from dataclasses import dataclass
+from engine.cue import cue_sequence as seq
+from engine.cue.cue_state import GameState
+
+from sps_state import SpsState
+from sps_triggers import TRIGGER_ACTOR_DRONE
+
+from pygame.math import Vector3 as Vec3
+import numpy as np
+import math
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from entity.sps_hitbox_ai import SpsHitboxAi
+
+# a shared structure-of-arrays simulation for all active drones, steering for every drone is integrated in one vectorized step per frame
+# note: drone entities only keep a slot index (dr_slot) into the arrays, slots are kept packed and move on removal
+# active drones are packed first, drones suspended by the ai scheduler are kept after them and not simulated at all
+# also hands out attack slots, a ring of reachable positions around the player shared by all chasing drones
+
+@dataclass(init=False, slots=True)
+class DroneSystem:
+    DRONE_NAVIG_SPEED = 8.
+    DRONE_NAVIG_ACCEL = 12.
+    DRONE_NAVIG_PLAYER_AVOIDANCE = 15. # how much to avoid flying into the player
+
+    DRONE_SEPARATION_RADIUS = 1.2 # also the spatial hash cell size
+    DRONE_SEPARATION_FORCE = 10. # how much to avoid flying into other drones
+
+    INITIAL_CAPACITY = 16
+    NEIGHBOUR_CELL_OFFSETS = np.array([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)], dtype=np.int64)
+
+    ATTACK_SLOT_COUNT = 12
+    ATTACK_SLOT_RADIUS = 3.5
+    ATTACK_SLOT_HEIGHTS = (1.2, 2.2) # alternated around the ring
+
+    DRONE_BUFFERS = ("dr_pos", "dr_vel", "dr_accel", "dr_nav_target", "dr_hitbox_size", "dr_face_player", "dr_trigger_actor")
+
+    def __init__(self) -> None:
+        self.drone_count = 0
+        self.active_count = 0
+        self.drones = []
+
+        self.dr_pos = np.zeros((self.INITIAL_CAPACITY, 3), dtype=np.float64)
+        self.dr_vel = np.zeros((self.INITIAL_CAPACITY, 3), dtype=np.float64)
+        self.dr_accel = np.zeros((self.INITIAL_CAPACITY, 3), dtype=np.float64)
+        self.dr_nav_target = np.zeros((self.INITIAL_CAPACITY, 3), dtype=np.float64)
+        self.dr_hitbox_size = np.zeros((self.INITIAL_CAPACITY, 3), dtype=np.float64)
+        self.dr_face_player = np.zeros(self.INITIAL_CAPACITY, dtype=np.bool_)
+        self.dr_trigger_actor = np.zeros(self.INITIAL_CAPACITY, dtype=np.bool_)
+
+        self.is_ticking = False
+
+        angles = np.arange(self.ATTACK_SLOT_COUNT) * (2. * math.pi / self.ATTACK_SLOT_COUNT)
+        heights = np.resize(np.array(self.ATTACK_SLOT_HEIGHTS, dtype=np.float64), self.ATTACK_SLOT_COUNT)
+
+        self.attack_slot_offsets = np.stack((np.cos(angles) * self.ATTACK_SLOT_RADIUS, heights, np.sin(angles) * self.ATTACK_SLOT_RADIUS), axis=1)
+        self.attack_slot_pos = np.zeros((self.ATTACK_SLOT_COUNT, 3), dtype=np.float64)
+        self.attack_slot_valid = np.zeros(self.ATTACK_SLOT_COUNT, dtype=np.bool_)
+        self.attack_slot_owners = [None] * self.ATTACK_SLOT_COUNT
+        self.attack_slot_time = -1.
+
+    # == drone slots ==
+
+    def _grow(self) -> None:
+        new_cap = len(self.dr_pos) * 2
+
+        for name in self.DRONE_BUFFERS:
+            old_buf = getattr(self, name)
+            new_buf = np.zeros((new_cap, *old_buf.shape[1:]), dtype=old_buf.dtype)
+            new_buf[:len(old_buf)] = old_buf
+
+            setattr(self, name, new_buf)
+
+    def _swap_slots(self, a: int, b: int) -> None:
+        if a == b:
+            return
+
+        for name in self.DRONE_BUFFERS:
+            buf = getattr(self, name)
+            buf[[a, b]] = buf[[b, a]]
+
+        self.drones[a], self.drones[b] = self.drones[b], self.drones[a]
+        self.drones[a].dr_slot = a
+        self.drones[b].dr_slot = b
+
+    def _start_ticking(self) -> None:
+        if not self.is_ticking:
+            self.is_ticking = True
+            seq.next(self.tick)
+
+    def add_drone(self, drone: 'SpsHitboxAi') -> int:
+        if self.drone_count == len(self.dr_pos):
+            self._grow()
+
+        slot = self.drone_count
+
+        self.dr_pos[slot] = drone.ai_trans._pos
+        self.dr_vel[slot] = 0.
+        self.dr_accel[slot] = 0.
+        self.dr_nav_target[slot] = drone.dr_nav_target_pos
+        self.dr_hitbox_size[slot] = drone.ai_hitbox_size
+        self.dr_face_player[slot] = False
+        self.dr_trigger_actor[slot] = drone.dr_trigger_actor
+
+        self.drones.append(drone)
+        drone.dr_slot = slot
+        self.drone_count += 1
+
+        # new drones are active, move in front of the suspended ones
+        self._swap_slots(slot, self.active_count)
+        self.active_count += 1
+
+        self._start_ticking()
+        return drone.dr_slot
+
+    def remove_drone(self, drone: 'SpsHitboxAi') -> None:
+        slot = drone.dr_slot
+
+        if slot >= self.drone_count or self.drones[slot] is not drone:
+            return # not owned by this system (eg. system was already reset with the map)
+
+        if self.dr_trigger_actor[slot]:
+            SpsState.trigger_grid.remove_actor(drone, TRIGGER_ACTOR_DRONE)
+
+        # move the drone to the end of the active range and then to the very end, keeping both ranges packed
+
+        if slot < self.active_count:
+            self._swap_slots(slot, self.active_count - 1)
+            self.active_count -= 1
+            slot = self.active_count
+
+        self._swap_slots(slot, self.drone_count - 1)
+
+        self.drones.pop()
+        self.drone_count -= 1
+
+    def set_drone_suspended(self, drone: 'SpsHitboxAi', is_suspended: bool) -> None:
+        # suspended drones keep their slot state, but are moved out of the simulated range until resumed
+
+        slot = drone.dr_slot
+
+        if slot >= self.drone_count or self.drones[slot] is not drone:
+            return # not owned by this system
+
+        if is_suspended and slot < self.active_count:
+            self._swap_slots(slot, self.active_count - 1)
+            self.active_count -= 1
+
+            self.dr_vel[self.active_count] = 0. # resumes from rest
+
+        elif not is_suspended and slot >= self.active_count:
+            self._swap_slots(slot, self.active_count)
+            self.active_count += 1
+
+            self._start_ticking()
+
+    # == attack slots ==
+
+    def _refresh_attack_slots(self) -> None:
+        # recomputed at most once per frame, all slots are checked in a single batch of box sweeps from the player
+
+        if self.attack_slot_time == GameState.current_time:
+            return
+
+        self.attack_slot_time = GameState.current_time
+
+        player = SpsState.p_active_controller
+        player_pos = np.array(player.p_pos, dtype=np.float64)
+        player_center = player_pos + np.array([0., player.PLAYER_SIZE.y / 2, 0.])
+
+        self.attack_slot_pos = player_pos + self.attack_slot_offsets
+
+        half_ext = self.dr_hitbox_size[:self.drone_count].max(axis=0) / 2. if self.drone_count != 0 else None
+        self.attack_slot_valid = ~SpsState.static_colls.segments_occluded(player_center, self.attack_slot_pos, half_ext)
+
+    def claim_attack_slot(self, drone: 'SpsHitboxAi') -> Vec3 | None:
+        # assigns the closest free reachable slot to drone (releasing its previous one), None if all are taken or blocked
+        # note: slots are released lazily, once their owner despawns or stops targeting the player
+
+        self._refresh_attack_slots()
+
+        drone_pos = self.dr_pos[drone.dr_slot]
+
+        best_slot = -1
+        best_dist_sq = float('inf')
+
+        for i, owner in enumerate(self.attack_slot_owners):
+            if owner is drone or (owner is not None and (owner.local_name is None or not owner.dr_nav_target_is_player)):
+                self.attack_slot_owners[i] = owner = None
+
+            if owner is not None or not self.attack_slot_valid[i]:
+                continue
+
+            slot_diff = self.attack_slot_pos[i] - drone_pos
+            dist_sq = slot_diff.dot(slot_diff)
+
+            if dist_sq < best_dist_sq:
+                best_slot = i
+                best_dist_sq = dist_sq
+
+        if best_slot == -1:
+            return None
+
+        self.attack_slot_owners[best_slot] = drone
+        return Vec3(*self.attack_slot_pos[best_slot])
+
+    # == simulation ==
+
+    @staticmethod
+    def _cell_keys(cells: np.ndarray) -> np.ndarray:
+        # packs (N, 3) int cell coords into a single int64 key, 21 bits per axis
+        cells = cells + (1 << 20)
+        return (cells[:, 0] << 42) | (cells[:, 1] << 21) | cells[:, 2]
+
+    @staticmethod
+    def _neighbour_pairs(pos: np.ndarray, cell_size: float) -> tuple[np.ndarray, np.ndarray]:
+        # a uniform spatial hash rebuilt from scratch, returns (a, b) index arrays of all drone pairs in touching cells
+        # note: each pair is returned in both orders, pairs closer than cell_size are never missed (further ones may be
+        # returned too, up to ~2 * sqrt(3) * cell_size apart, callers filter by distance)
+
+        n = len(pos)
+        cells = np.floor(pos / cell_size).astype(np.int64)
+
+        order = np.argsort(DroneSystem._cell_keys(cells), kind="stable")
+        sorted_keys = DroneSystem._cell_keys(cells[order])
+
+        # look up all 27 touching cells of every drone at once
+        n_keys = DroneSystem._cell_keys((cells[:, np.newaxis, :] + DroneSystem.NEIGHBOUR_CELL_OFFSETS).reshape(-1, 3))
+
+        lo = np.searchsorted(sorted_keys, n_keys, "left")
+        counts = np.searchsorted(sorted_keys, n_keys, "right") - lo
+        total = counts.sum()
+
+        # expand each lookup into one entry per drone in that cell
+        starts = np.cumsum(counts) - counts
+        pair_a = np.repeat(np.arange(n).repeat(len(DroneSystem.NEIGHBOUR_CELL_OFFSETS)), counts)
+        pair_b = order[np.repeat(lo, counts) + np.arange(total) - np.repeat(starts, counts)]
+
+        not_self = pair_a != pair_b
+        return pair_a[not_self], pair_b[not_self]
+
+    def _separation_accel(self, pos: np.ndarray) -> np.ndarray:
+        sep_accel = np.zeros_like(pos)
+
+        if len(pos) < 2:
+            return sep_accel
+
+        a, b = self._neighbour_pairs(pos, self.DRONE_SEPARATION_RADIUS)
+
+        pair_diff = pos[a] - pos[b]
+        pair_dist = np.linalg.norm(pair_diff, axis=1, keepdims=True)
+
+        # note: drones exactly on top of each other are left alone, there is no dir to push them apart in
+        is_near = (pair_dist[:, 0] < self.DRONE_SEPARATION_RADIUS) & (pair_dist[:, 0] > 0.)
+        pair_push = pair_diff[is_near] / pair_dist[is_near] * (self.DRONE_SEPARATION_RADIUS - pair_dist[is_near]) * self.DRONE_SEPARATION_FORCE
+
+        np.add.at(sep_accel, a[is_near], pair_push)
+        return sep_accel
+
+    @np.errstate(all='ignore')
+    def tick(self) -> None:
+        if SpsState.drone_system is not self:
+            return # stale system from a previous map
+
+        n = self.active_count
+
+        if n == 0:
+            self.is_ticking = False
+            return # restarted on next add_drone or resume
+
+        dt = GameState.delta_time
+
+        pos = self.dr_pos[:n]
+        vel = self.dr_vel[:n]
+        accel = self.dr_accel[:n]
+
+        player_pos = np.array(SpsState.p_active_controller.p_pos, dtype=np.float64)
+
+        # tick travel update
+
+        target_diff = self.dr_nav_target[:n] - pos
+        target_dist = np.linalg.norm(target_diff, axis=1, keepdims=True)
+
+        target_speed = np.minimum(self.DRONE_NAVIG_SPEED, np.exp(target_dist) - .6)
+        nav_target_vel = np.where(target_dist != 0., target_diff / target_dist * target_speed, 0.)
+
+        # try to avoid flying into the players face
+        player_diff = pos - player_pos
+        player_dist = np.linalg.norm(player_diff, axis=1, keepdims=True)
+
+        player_repulsion = np.where(player_dist != 0., player_diff / player_dist * np.maximum(2. - player_dist, 0.) * self.DRONE_NAVIG_PLAYER_AVOIDANCE, 0.)
+
+        # clamp steering accel magnitude
+        np.multiply(nav_target_vel - vel, self.DRONE_NAVIG_ACCEL, out=accel)
+        accel_len = np.linalg.norm(accel, axis=1, keepdims=True)
+
+        accel *= np.where(accel_len > self.DRONE_NAVIG_SPEED, self.DRONE_NAVIG_SPEED / accel_len, 1.)
+        accel += player_repulsion
+
+        # and into each other
+        accel += self._separation_accel(pos)
+
+        vel += accel * dt
+
+        # resolve collisions for all drones in one batch and write back
+
+        trigger_slots = np.nonzero(self.dr_trigger_actor[:n])[0]
+        trigger_prev_pos = pos[trigger_slots]
+
+        pos[:], vel[:] = SpsState.static_colls.sweep_movers(pos, vel, self.dr_hitbox_size[:n] / 2., dt)
+
+        # rotate models by dir, either towards the player or along the travel dir
+
+        face_dir = np.where(self.dr_face_player[:n, np.newaxis], player_pos - pos, vel)
+        face_yaw = np.degrees(np.arctan2(face_dir[:, 2], face_dir[:, 0]))
+
+        for i, drone in enumerate(self.drones[:n]):
+            drone._dr_apply_sim(Vec3(*pos[i]), float(face_yaw[i]))
+
+        # sweep opted-in drones through the triggers last, trigger code may despawn drones (so skip the ones already gone)
+
+        if len(trigger_slots) != 0:
+            trigger_drones = [self.drones[i] for i in trigger_slots]
+            trigger_disp = (pos[trigger_slots] - trigger_prev_pos).tolist()
+            trigger_half_ext = (self.dr_hitbox_size[trigger_slots] / 2.).tolist()
+
+            for drone, start, disp, half_ext in zip(trigger_drones, trigger_prev_pos.tolist(), trigger_disp, trigger_half_ext):
+                if drone.local_name is not None:
+                    SpsState.trigger_grid.update_actor(drone, TRIGGER_ACTOR_DRONE, start, disp, half_ext)
+
+        seq.next(self.tick)
+
+    drone_count: int
+    active_count: int # simulated drones, in slots [0, active_count)
+    drones: list['SpsHitboxAi'] # drone entity in each packed slot
+
+    dr_pos: np.ndarray
+    dr_vel: np.ndarray
+    dr_accel: np.ndarray # last steering accel, kept for debug gizmos
+    dr_nav_target: np.ndarray
+    dr_hitbox_size: np.ndarray
+    dr_face_player: np.ndarray
+    dr_trigger_actor: np.ndarray
+
+    is_ticking: bool
+
+    attack_slot_offsets: np.ndarray # (ATTACK_SLOT_COUNT, 3) ring offsets from the player pos
+    attack_slot_pos: np.ndarray
+    attack_slot_valid: np.ndarray
+    attack_slot_owners: list['SpsHitboxAi | None']
+    attack_slot_time: float # GameState.current_time of the last refresh
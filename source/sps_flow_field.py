@@ -0,0 +1,232 @@
+import os, hashlib
+
+from dataclasses import dataclass
+from engine.cue import cue_utils as utils
+
+from pygame.math import Vector3 as Vec3
+import numpy as np
+import math
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sps_phys import StaticCollSnapshot
+
+# a voxel grid of the free (flyable) space between the static colliders, baked on map load and cached next to the map file
+# one distance field is flooded over it from the players cell per ai scheduler tick (when needed), all ais then follow its
+# gradient towards the player with no raycasts
+
+@dataclass(init=False, slots=True)
+class FlowField:
+    FLOW_VOXEL_SIZE = 1.
+    FLOW_MAX_VOXELS = 1 << 19 # voxel size is grown for huge maps
+    FLOW_CACHE_VERSION = 1
+
+    FLOW_MAX_STEPS = 48 # the flood stops this many voxels from the goal, further away ais fall back to their own navigation
+    FLOW_WAYPOINT_STEPS = 4 # how far down the gradient to place waypoints
+
+    # face neighbour offsets for gradient descent, the same 6-connectivity as the flood so steps never cut a blocked edge or corner
+    NEIGHBOUR_OFFSETS = [(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)]
+
+    def __init__(self) -> None:
+        self.voxel_free = None
+        self.grid_min = np.zeros(3, dtype=np.float64)
+        self.voxel_size = self.FLOW_VOXEL_SIZE
+
+        self.flood_steps = np.zeros(0, dtype=np.int64)
+
+        self.goal_voxel = None
+        self.field = None
+        self.field_voxel = None
+
+    # == bake ==
+
+    def bake(self, static_colls: 'StaticCollSnapshot', map_path: str | None) -> None:
+        if len(static_colls.coll_min) == 0:
+            return # nothing to voxelize, all queries return None
+
+        # the cache is only valid for the exact same colliders
+        bake_key = hashlib.sha1(np.ascontiguousarray(static_colls.coll_min).tobytes() + np.ascontiguousarray(static_colls.coll_max).tobytes() + str((self.FLOW_CACHE_VERSION, self.FLOW_VOXEL_SIZE, self.FLOW_MAX_VOXELS)).encode()).hexdigest()
+        cache_path = os.path.splitext(map_path)[0] + ".flow.npz" if map_path else None
+
+        if cache_path is not None and os.path.isfile(cache_path):
+            try:
+                with np.load(cache_path) as cache:
+                    if str(cache["bake_key"]) == bake_key:
+                        self._set_grid(cache["voxel_free"], cache["grid_min"], float(cache["voxel_size"]))
+                        return
+            except Exception as e:
+                utils.warn(f"[flow field] failed to load cache \"{cache_path}\" ({e}), rebaking")
+
+        self._voxelize(static_colls)
+
+        if cache_path is not None:
+            try:
+                np.savez_compressed(cache_path, bake_key=bake_key, voxel_free=self.voxel_free, grid_min=self.grid_min, voxel_size=self.voxel_size)
+            except OSError as e:
+                utils.warn(f"[flow field] failed to write cache \"{cache_path}\" ({e})")
+
+    def _voxelize(self, static_colls: 'StaticCollSnapshot') -> None:
+        # a voxel is free when no collider overlaps any of it, conservative for thin walls
+
+        grid_min = static_colls.coll_min.min(axis=0)
+        grid_size = static_colls.coll_max.max(axis=0) - grid_min
+
+        voxel_size = self.FLOW_VOXEL_SIZE
+        dims = np.maximum(np.ceil(grid_size / voxel_size), 1).astype(np.int64)
+
+        while np.prod(dims) > self.FLOW_MAX_VOXELS:
+            voxel_size *= 1.5
+            dims = np.maximum(np.ceil(grid_size / voxel_size), 1).astype(np.int64)
+
+        # padded by a blocked layer, so the flood never has to bounds check
+        voxel_free = np.zeros(dims + 2, dtype=np.bool_)
+        voxel_free[1:-1, 1:-1, 1:-1] = True
+
+        lo = np.floor((static_colls.coll_min - grid_min) / voxel_size).astype(np.int64) + 1
+        hi = np.ceil((static_colls.coll_max - grid_min) / voxel_size).astype(np.int64) + 1
+
+        for (lx, ly, lz), (hx, hy, hz) in zip(lo, hi):
+            voxel_free[lx:max(hx, lx + 1), ly:max(hy, ly + 1), lz:max(hz, lz + 1)] = False
+
+        self._set_grid(voxel_free, grid_min - voxel_size, voxel_size)
+
+    def _set_grid(self, voxel_free: np.ndarray, grid_min: np.ndarray, voxel_size: float) -> None:
+        self.voxel_free = voxel_free
+        self.grid_min = np.asarray(grid_min, dtype=np.float64)
+        self.voxel_size = voxel_size
+
+        x_stride, y_stride, z_stride = (s // voxel_free.itemsize for s in voxel_free.strides)
+        self.flood_steps = np.array([x_stride, -x_stride, y_stride, -y_stride, z_stride, -z_stride], dtype=np.int64)
+
+        self.field = None
+        self.field_voxel = None
+
+    # == queries ==
+
+    def _voxel_of(self, pos: Vec3) -> tuple[int, int, int] | None:
+        x = math.floor((pos.x - self.grid_min[0]) / self.voxel_size)
+        y = math.floor((pos.y - self.grid_min[1]) / self.voxel_size)
+        z = math.floor((pos.z - self.grid_min[2]) / self.voxel_size)
+
+        dims = self.voxel_free.shape
+
+        # note: the padding layer is never returned, so all neighbours of a voxel are always in the grid
+        if not (1 <= x < dims[0] - 1 and 1 <= y < dims[1] - 1 and 1 <= z < dims[2] - 1):
+            return None
+
+        return (x, y, z)
+
+    def _flood(self, goal_voxel: tuple[int, int, int]) -> np.ndarray:
+        # a vectorized bfs over the free voxels, one wavefront per step, returns a grid of steps to goal (-1 if not reached)
+
+        free_flat = self.voxel_free.ravel()
+        steps = np.full(free_flat.shape, -1, dtype=np.int32)
+
+        start = np.ravel_multi_index(goal_voxel, self.voxel_free.shape)
+        steps[start] = 0
+
+        front = np.array([start], dtype=np.int64)
+
+        for d in range(1, self.FLOW_MAX_STEPS + 1):
+            n = (front[:, np.newaxis] + self.flood_steps).ravel()
+            n = np.unique(n[free_flat[n] & (steps[n] < 0)])
+
+            if len(n) == 0:
+                break
+
+            steps[n] = d
+            front = n
+
+        return steps.reshape(self.voxel_free.shape)
+
+    def set_goal(self, goal: Vec3) -> None:
+        # called by the ai scheduler with the player pos on each tick, the field is only reflooded once an ai needs it
+
+        if self.voxel_free is None:
+            return
+
+        goal_voxel = self._voxel_of(goal)
+
+        # goals are often on the floor, whose voxels may be blocked by it
+        if goal_voxel is not None:
+            for i in range(2):
+                if self.voxel_free[goal_voxel] or goal_voxel[1] + 1 >= self.voxel_free.shape[1] - 1:
+                    break
+
+                goal_voxel = (goal_voxel[0], goal_voxel[1] + 1, goal_voxel[2])
+
+            if not self.voxel_free[goal_voxel]:
+                goal_voxel = None
+
+        self.goal_voxel = goal_voxel
+
+    def _goal_field(self) -> np.ndarray | None:
+        # the field of the current goal, flooded at most once per goal voxel so once per scheduler tick at most
+
+        if self.goal_voxel is None:
+            return None
+
+        if self.field_voxel != self.goal_voxel:
+            self.field = self._flood(self.goal_voxel)
+            self.field_voxel = self.goal_voxel
+
+        return self.field
+
+    def waypoint(self, pos: Vec3) -> Vec3 | None:
+        # the next waypoint from pos towards the goal following the distance field
+        # returns None if not baked, pos is outside of the grid, no path is known or pos is already close to the goal
+
+        if self.voxel_free is None:
+            return None
+
+        current = self._voxel_of(pos)
+
+        if current is None:
+            return None
+
+        field = self._goal_field()
+
+        if field is None:
+            return None
+
+        if field[current] < 0:
+            # pos may be in a voxel touching a wall, try to get back onto the field from a neighbour
+            for dx, dy, dz in self.NEIGHBOUR_OFFSETS:
+                n = (current[0] + dx, current[1] + dy, current[2] + dz)
+
+                if field[n] >= 0:
+                    current = n
+                    break
+            else:
+                return None
+
+        for i in range(self.FLOW_WAYPOINT_STEPS):
+            if field[current] == 0:
+                return None
+
+            # descend to the neighbour closest to the goal
+            best = current
+
+            for dx, dy, dz in self.NEIGHBOUR_OFFSETS:
+                n = (current[0] + dx, current[1] + dy, current[2] + dz)
+
+                if 0 <= field[n] < field[best]:
+                    best = n
+
+            current = best
+
+        if field[current] == 0:
+            return None
+
+        return Vec3(*(self.grid_min + (np.array(current) + .5) * self.voxel_size))
+
+    voxel_free: np.ndarray | None # (X, Y, Z) bool grid, padded by a blocked layer, None when not baked
+    grid_min: np.ndarray
+    voxel_size: float
+
+    flood_steps: np.ndarray # flat index offsets to the 6 face neighbours
+
+    goal_voxel: tuple[int, int, int] | None # the players voxel of the last scheduler tick, None when outside of the grid or blocked
+    field: np.ndarray | None # steps to goal grid, flooded from field_voxel
+    field_voxel: tuple[int, int, int] | None
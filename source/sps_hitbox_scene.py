@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+
+from sps_aabb_tree import AabbTree, ray_box_entry, INF
+
+from pygame.math import Vector3 as Vec3
+import numpy as np
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from engine.cue.phys.cue_phys_types import PhysAABB
+
+# the scene of all damageable hitboxes, split into collision layers
+# boxes are registered with a single layer bit, queries take a mask of the layers to test, so eg. enemy shots never look at other enemies
+# note: kept in a dynamic aabb tree with fattened leaves, as most of the boxes move every frame (the engine PhysScene is built for static colliders)
+
+HITBOX_LAYER_PLAYER = 1 << 0
+HITBOX_LAYER_AI = 1 << 1
+HITBOX_LAYER_SPAWNER = 1 << 2
+
+HITBOX_MASK_ENEMIES = HITBOX_LAYER_AI | HITBOX_LAYER_SPAWNER
+HITBOX_MASK_ALL = HITBOX_LAYER_PLAYER | HITBOX_MASK_ENEMIES
+
+@dataclass(init=False, slots=True)
+class HitboxHit:
+    def __init__(self, tmin: float, pos: np.ndarray, aabb: 'PhysAABB') -> None:
+        self.tmin = tmin
+        self.pos = pos
+        self.aabb = aabb
+        self.usr = aabb.usr
+
+    tmin: float # distance along the ray dir
+    pos: np.ndarray
+    aabb: 'PhysAABB'
+    usr: object
+
+@dataclass(init=False, slots=True)
+class HitboxScene:
+    def __init__(self) -> None:
+        self.tree = AabbTree()
+        self.coll_leaves = {}
+
+    @staticmethod
+    def _box_of(aabb: 'PhysAABB') -> list[float]:
+        lo, hi = aabb.points
+        return [float(lo[0]), float(lo[1]), float(lo[2]), float(hi[0]), float(hi[1]), float(hi[2])]
+
+    # == registration ==
+
+    def add_coll(self, aabb: 'PhysAABB', layer: int) -> None:
+        self.coll_leaves[id(aabb)] = (aabb, layer, self.tree.add_proxy(self._box_of(aabb), layer, aabb))
+
+    def update_coll(self, aabb: 'PhysAABB') -> None:
+        # cheap unless the box left its fattened bounds
+        self.tree.move_proxy(self.coll_leaves[id(aabb)][2], self._box_of(aabb))
+
+    def remove_coll(self, aabb: 'PhysAABB') -> None:
+        coll = self.coll_leaves.pop(id(aabb), None)
+
+        if coll is not None:
+            self.tree.remove_proxy(coll[2])
+
+    def reset(self) -> None:
+        self.tree = AabbTree()
+        self.coll_leaves = {}
+
+    # == queries ==
+
+    def _ray_hits(self, origin: Vec3, ray_dir: Vec3, tmax: float, mask: int, box_size: Vec3 | None) -> list[HitboxHit]:
+        o = (origin.x, origin.y, origin.z)
+        inv_dir = tuple(1. / c if c != 0. else INF for c in (ray_dir.x, ray_dir.y, ray_dir.z))
+        pad = (0., 0., 0.) if box_size is None else (box_size.x / 2, box_size.y / 2, box_size.z / 2)
+
+        hits = []
+
+        # the tree only tests the fat bounds, the exact boxes are tested here
+        for aabb in self.tree.query_ray(o, inv_dir, tmax, pad, mask):
+            t = ray_box_entry(self._box_of(aabb), o, inv_dir, pad, tmax)
+
+            if t >= 0.:
+                hits.append(HitboxHit(t, np.array(origin + ray_dir * t, dtype=np.float32), aabb))
+
+        return hits
+
+    def first_hit(self, origin: Vec3, ray_dir: Vec3, tmax: float = INF, mask: int = HITBOX_MASK_ALL, box_size: Vec3 | None = None) -> HitboxHit | None:
+        # the closest box hit by a ray (or a box of box_size swept along it) within tmax, ray_dir is expected normalized
+        return min(self._ray_hits(origin, ray_dir, tmax, mask, box_size), key=lambda hit: hit.tmin, default=None)
+
+    def all_hits(self, origin: Vec3, ray_dir: Vec3, tmax: float = INF, mask: int = HITBOX_MASK_ALL, box_size: Vec3 | None = None) -> list[HitboxHit]:
+        return self._ray_hits(origin, ray_dir, tmax, mask, box_size)
+
+    def gather_boxes(self, mask: int = HITBOX_MASK_ALL, bounds: tuple[np.ndarray, np.ndarray] | None = None) -> list['PhysAABB']:
+        # all boxes of the masked layers, optionally only the ones near the (min, max) bounds
+
+        if bounds is None:
+            return [aabb for aabb, layer, _ in self.coll_leaves.values() if layer & mask]
+
+        lo, hi = bounds
+        return self.tree.query_box([float(lo[0]), float(lo[1]), float(lo[2]), float(hi[0]), float(hi[1]), float(hi[2])], mask)
+
+    tree: AabbTree
+    coll_leaves: dict[int, tuple['PhysAABB', int, int]] # id(aabb) -> (aabb, layer bit, tree leaf)
@@ -8,9 +8,21 @@ from engine.cue.rendering import cue_gizmos as gizmo
 
 from ui import GameUI
 from sps_state import SpsState
+from sps_nav import NavGraph, NavNodeIndex
+from sps_drone_system import DroneSystem
+from sps_phys import StaticCollSnapshot
+from sps_pvs import ShooterPvs
+from sps_ai_scheduler import AiScheduler
+from sps_flow_field import FlowField
+from sps_projectiles import ProjectileSystem
+from sps_triggers import TriggerGrid
+from components.fire_emitter import FireParticleSystem
+from components.beam_trails import BeamTrailSystem
+from components.instanced_renderer import InstancedRenderer
 from mainmenu import MenuUI
 
 import dev_utils
+import prefabs
 
 from pygame.math import Vector3 as Vec3
 import imgui
@@ -37,6 +49,13 @@ def m_tick():
     if SpsState.is_perf_overlay_open:
         cue_utils.show_perf_overlay()
 
+        with dev_utils.utils.begin_dev_overlay("ai_scheduler", 1):
+            sched = SpsState.ai_scheduler
+            imgui.text(f"ai budget: {SpsState.dev_ai_budget_ms} ms")
+            imgui.text(f"ai active: {len(sched.ais) - sched.stat_suspended} / {len(sched.ais)}")
+            imgui.text(f"ai updated: {sched.stat_updated} / {sched.stat_due} due ({sched.stat_deferred} deferred)")
+            imgui.text(f"ai update time: {round(sched.stat_update_ms, 3)} ms")
+
     if SpsState.dev_vis_sub_zones:
         def recursive_subscene_view(scene, i) -> None:
             if SpsState.dev_vis_sub_zone_target is None:
@@ -77,10 +96,38 @@ def m_tick():
 
 def on_map_reset() -> None:
     SpsState.hitbox_scene.reset()
+    SpsState.trigger_grid = TriggerGrid()
     SpsState.active_nav_nodes = []
+    SpsState.nav_node_index = NavNodeIndex()
+    SpsState.nav_graph = NavGraph([], SpsState.nav_node_index)
+    SpsState.ai_scheduler = AiScheduler()
+    SpsState.drone_system = DroneSystem()
+
+    if hasattr(SpsState, "projectile_system"):
+        SpsState.projectile_system.despawn_all()
+
+    SpsState.projectile_system = ProjectileSystem()
+
+    if hasattr(SpsState, "fire_system"):
+        SpsState.fire_system.despawn()
+
+    SpsState.fire_system = FireParticleSystem()
+
+    if hasattr(SpsState, "beam_system"):
+        SpsState.beam_system.despawn()
+
+    SpsState.beam_system = BeamTrailSystem()
+    SpsState.static_colls = StaticCollSnapshot()
+    SpsState.shooter_pvs = ShooterPvs()
+    SpsState.flow_field = FlowField()
     SpsState.active_drone_count = 0
     SpsState.active_enemy_count = 0
 
+    prefabs.clear_pools()
+    prefabs.begin_map_load()
+
+    InstancedRenderer.clear_batches()
+
     GameState.static_sequencer.on_event(cue_map.map_reset_evid, on_map_reset)
 GameState.static_sequencer.on_event(cue_map.map_reset_evid, on_map_reset)
 
@@ -88,6 +135,19 @@ def on_map_load() -> None:
     SpsState.is_dev_con_open = False
     m_setup()
 
+    # all static colliders, shooters and nav nodes are spawned by now, snapshot them and bake the ai pvs, sub-zone links, flow field and nav graph
+    SpsState.static_colls = StaticCollSnapshot(GameState.collider_scene)
+    SpsState.shooter_pvs.bake(SpsState.static_colls)
+    SpsState.ai_scheduler.bake_zones(GameState.collider_scene)
+    SpsState.flow_field.bake(SpsState.static_colls, GameState.current_map)
+    SpsState.nav_graph = NavGraph(SpsState.active_nav_nodes, SpsState.nav_node_index)
+
+    # engine triggers (eg. the map exit) still live in the trigger scene, mirror them into the grid
+    SpsState.trigger_grid.add_scene_triggers(GameState.trigger_scene)
+
+    # compile all prefabs the map can spawn, load their assets and fill their pools now, instead of mid-fight
+    prefabs.preload_map_prefabs(GameState.current_map)
+
     # crunch filled nightmares
     if os.path.basename(GameState.current_map) == "main_menu.json":
         SpsState.p_hud_ui = MenuUI()
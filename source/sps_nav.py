@@ -0,0 +1,272 @@
+import heapq, random
+
+from dataclasses import dataclass
+from sps_state import SpsState
+
+from pygame.math import Vector3 as Vec3
+import numpy as np
+import math
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from entity.sps_nav_node import SpsNavNode
+
+# a static uniform grid over nav node positions, filled as SpsNavNodes spawn, for k-nearest and radius queries
+# note: node ids are the insertion order, which matches SpsState.active_nav_nodes
+
+@dataclass(init=False, slots=True)
+class NavNodeIndex:
+    CELL_SIZE = 4.
+
+    def __init__(self) -> None:
+        self.node_pos = []
+        self.cells = {}
+
+        self.min_cell = (0, 0, 0)
+        self.max_cell = (-1, -1, -1) # empty bounds
+
+    def _cell_of(self, pos: Vec3) -> tuple[int, int, int]:
+        return (math.floor(pos.x / self.CELL_SIZE), math.floor(pos.y / self.CELL_SIZE), math.floor(pos.z / self.CELL_SIZE))
+
+    def insert(self, pos: Vec3) -> int:
+        node_id = len(self.node_pos)
+        self.node_pos.append(Vec3(pos))
+
+        cell = self._cell_of(pos)
+        self.cells.setdefault(cell, []).append(node_id)
+
+        if node_id == 0:
+            self.min_cell = cell
+            self.max_cell = cell
+        else:
+            self.min_cell = tuple(map(min, self.min_cell, cell))
+            self.max_cell = tuple(map(max, self.max_cell, cell))
+
+        return node_id
+
+    # == queries ==
+
+    def query_radius(self, pos: Vec3, radius: float) -> list[int]:
+        # returns all node ids within radius of pos (unordered)
+
+        if not self.node_pos:
+            return []
+
+        lo = self._cell_of(pos - Vec3(radius))
+        hi = self._cell_of(pos + Vec3(radius))
+
+        lo = tuple(map(max, lo, self.min_cell))
+        hi = tuple(map(min, hi, self.max_cell))
+
+        radius_sq = radius * radius
+        node_pos = self.node_pos
+        cells = self.cells
+
+        found = []
+
+        for x in range(lo[0], hi[0] + 1):
+            for y in range(lo[1], hi[1] + 1):
+                for z in range(lo[2], hi[2] + 1):
+                    for node_id in cells.get((x, y, z), ()):
+                        if node_pos[node_id].distance_squared_to(pos) <= radius_sq:
+                            found.append(node_id)
+
+        return found
+
+    def query_k_nearest(self, pos: Vec3, k: int) -> list[int]:
+        # returns up to k node ids sorted by distance to pos, searching in growing cube shells of cells around pos
+
+        if not self.node_pos or k <= 0:
+            return []
+
+        cx, cy, cz = self._cell_of(pos)
+        min_c = self.min_cell
+        max_c = self.max_cell
+
+        max_ring = max(abs(cx - min_c[0]), abs(cx - max_c[0]), abs(cy - min_c[1]), abs(cy - max_c[1]), abs(cz - min_c[2]), abs(cz - max_c[2]))
+
+        node_pos = self.node_pos
+        cells = self.cells
+
+        best = [] # (dist_sq, node_id)
+
+        for r in range(max_ring + 1):
+            for x in range(max(cx - r, min_c[0]), min(cx + r, max_c[0]) + 1):
+                for y in range(max(cy - r, min_c[1]), min(cy + r, max_c[1]) + 1):
+                    if abs(x - cx) == r or abs(y - cy) == r:
+                        z_range = range(max(cz - r, min_c[2]), min(cz + r, max_c[2]) + 1)
+                    else:
+                        z_range = (cz - r, cz + r) # only the shell caps
+
+                    for z in z_range:
+                        for node_id in cells.get((x, y, z), ()):
+                            best.append((node_pos[node_id].distance_squared_to(pos), node_id))
+
+            if len(best) >= k:
+                best.sort()
+                del best[k:]
+
+                # any node in a further shell is at least r cells away
+                if best[-1][0] <= (r * self.CELL_SIZE) ** 2:
+                    break
+
+        best.sort()
+        return [node_id for _, node_id in best[:k]]
+
+    node_pos: list[Vec3]
+    cells: dict[tuple[int, int, int], list[int]]
+
+    min_cell: tuple[int, int, int]
+    max_cell: tuple[int, int, int]
+
+# a static visibility graph over all the SpsNavNodes in a map, baked once on map load and used for ai patrol routing
+
+@dataclass(init=False, slots=True)
+class NavGraph:
+    NAV_MAX_EDGE_LENGTH = 30. # node pairs further apart than this are never raycasted or connected
+
+    def __init__(self, nav_nodes: list['SpsNavNode'], node_index: NavNodeIndex) -> None:
+        self.node_pos = [Vec3(node.node_pos) for node in nav_nodes]
+        self.node_index = node_index
+
+        self.node_edges = [[] for _ in range(len(self.node_pos))]
+        self.node_component = [-1] * len(self.node_pos)
+        self.component_nodes = []
+
+        self.path_cache = {}
+
+        self._bake_edges()
+        self._bake_components()
+
+    # == bake ==
+
+    def _bake_edges(self) -> None:
+        for a in range(len(self.node_pos)):
+            # only test node pairs close enough, each pair once, all pairs of a node in one batched occlusion query
+
+            others = []
+
+            for b in self.node_index.query_radius(self.node_pos[a], self.NAV_MAX_EDGE_LENGTH):
+                if b <= a:
+                    continue
+
+                if self.node_pos[b] == self.node_pos[a]:
+                    continue # two nodes at the same spot, nothing to connect
+
+                others.append(b)
+
+            if not others:
+                continue
+
+            occluded = SpsState.static_colls.segments_occluded(np.array(self.node_pos[a]), np.array([self.node_pos[b] for b in others]))
+
+            for b, is_occluded in zip(others, occluded):
+                if not is_occluded:
+                    node_dist = self.node_pos[a].distance_to(self.node_pos[b])
+
+                    self.node_edges[a].append((b, node_dist))
+                    self.node_edges[b].append((a, node_dist))
+
+    def _bake_components(self) -> None:
+        # flood fill connected node groups so patrol goals are always picked reachable
+
+        for start in range(len(self.node_pos)):
+            if self.node_component[start] != -1:
+                continue
+
+            comp_id = len(self.component_nodes)
+            comp = [start]
+            self.node_component[start] = comp_id
+
+            i = 0
+            while i < len(comp):
+                for n, _ in self.node_edges[comp[i]]:
+                    if self.node_component[n] == -1:
+                        self.node_component[n] = comp_id
+                        comp.append(n)
+                i += 1
+
+            self.component_nodes.append(comp)
+
+    # == queries ==
+
+    def nearest_visible_node(self, pos: Vec3, max_attempts: int) -> int:
+        # used to (re-)enter the graph from an arbitrary pos, returns -1 if none of the closest nodes are visible
+
+        for node_id in self.node_index.query_k_nearest(pos, max_attempts):
+            if not SpsState.static_colls.occluded(pos, self.node_pos[node_id]):
+                return node_id
+
+        return -1
+
+    def find_path(self, start: int, goal: int) -> list[int]:
+        # A* over the baked edges, returns the nodes to travel to (excluding start) or [] if goal is not reachable
+
+        cache_key = (start, goal)
+        path = self.path_cache.get(cache_key, None)
+
+        if path is not None:
+            return list(path)
+
+        if start == goal or self.node_component[start] != self.node_component[goal]:
+            return []
+
+        goal_pos = self.node_pos[goal]
+
+        came_from = {start: -1}
+        cost_so_far = {start: 0.}
+        open_heap = [(self.node_pos[start].distance_to(goal_pos), start)]
+
+        while open_heap:
+            _, current = heapq.heappop(open_heap)
+
+            if current == goal:
+                break
+
+            current_cost = cost_so_far[current]
+
+            for n, edge_dist in self.node_edges[current]:
+                new_cost = current_cost + edge_dist
+
+                if new_cost < cost_so_far.get(n, float('inf')):
+                    cost_so_far[n] = new_cost
+                    came_from[n] = current
+
+                    heapq.heappush(open_heap, (new_cost + self.node_pos[n].distance_to(goal_pos), n))
+
+        if goal not in came_from:
+            return [] # should be unreachable thanks to the component check
+
+        path = []
+        current = goal
+
+        while current != start:
+            path.append(current)
+            current = came_from[current]
+
+        path.reverse()
+
+        self.path_cache[cache_key] = tuple(path)
+        return path
+
+    def random_patrol_path(self, start: int) -> list[int]:
+        comp = self.component_nodes[self.node_component[start]]
+
+        if len(comp) < 2:
+            return []
+
+        goal = start
+        while goal == start:
+            goal = random.choice(comp)
+
+        return self.find_path(start, goal)
+
+    node_pos: list[Vec3]
+    node_index: NavNodeIndex
+
+    node_edges: list[list[tuple[int, float]]] # per-node list of (visible node id, distance)
+    node_component: list[int]
+    component_nodes: list[list[int]]
+
+    path_cache: dict[tuple[int, int], tuple[int, ...]]
@@ -0,0 +1,367 @@
+from dataclasses import dataclass
+from engine.cue.phys.cue_phys_types import EPSILON
+
+from sps_aabb_tree import AabbTree, ray_box_entry, INF
+
+from pygame.math import Vector3 as Vec3
+import numpy as np
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from engine.cue.phys.cue_phys_scene import PhysScene, PhysAABB
+
+# a flat np snapshot of all the static colliders in GameState.collider_scene, taken once on map load
+# used for batched game-side queries where going through the engine scene one ray at a time is too slow
+
+@dataclass(init=False, slots=True)
+class StaticCollSnapshot:
+    SWEEP_BROADPHASE_MARGIN = .01
+    SEGMENT_CHUNK_SIZE = 1 << 20 # max segment * collider pairs tested at once, bounds the temp array sizes
+
+    def __init__(self, coll_scene: 'PhysScene | None' = None) -> None:
+        boxes = self.gather_boxes(coll_scene) if coll_scene is not None else []
+
+        if boxes:
+            points = np.array([box.points for box in boxes], dtype=np.float64)
+
+            self.coll_min = points[:, 0, :]
+            self.coll_max = points[:, 1, :]
+        else:
+            self.coll_min = np.zeros((0, 3), dtype=np.float64)
+            self.coll_max = np.zeros((0, 3), dtype=np.float64)
+
+        # a tree over the collider indices, for gathering the colliders of a small region without touching all of them
+        self.coll_tree = AabbTree()
+        self.coll_boxes = [lo + hi for lo, hi in zip(self.coll_min.tolist(), self.coll_max.tolist())]
+
+        for i, box in enumerate(self.coll_boxes):
+            self.coll_tree.add_proxy(box, 1, i)
+
+    @staticmethod
+    def gather_boxes(scene: 'PhysScene') -> list['PhysAABB']:
+        # all boxes of a scene and its sub scenes, boxes straddling sub-zones may be in more than one sub scene so dedup by identity
+
+        boxes = {}
+        scenes = [scene]
+
+        while scenes:
+            sub = scenes.pop()
+
+            for box in sub.scene_aabbs:
+                boxes[id(box)] = box
+
+            scenes.extend(sub.child_subscenes.values())
+
+        return list(boxes.values())
+
+    def gather_local(self, bounds_min: np.ndarray, bounds_max: np.ndarray) -> 'LocalCollSnapshot':
+        # a snapshot of only the colliders overlapping the (min, max) bounds, for running many queries in a small region
+
+        indices = self.coll_tree.query_box([float(bounds_min[0]), float(bounds_min[1]), float(bounds_min[2]), float(bounds_max[0]), float(bounds_max[1]), float(bounds_max[2])], 1)
+        indices = np.array(indices, dtype=np.int64)
+
+        # note: the tree leaves are fattened, recheck the exact boxes
+        coll_min = self.coll_min[indices]
+        coll_max = self.coll_max[indices]
+
+        overlap = np.all((coll_min <= bounds_max) & (coll_max >= bounds_min), axis=1)
+
+        return LocalCollSnapshot(bounds_min, bounds_max, coll_min[overlap], coll_max[overlap])
+
+    # == batched queries ==
+
+    @staticmethod
+    def _slab_test(p: np.ndarray, d: np.ndarray, box_min: np.ndarray, box_max: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # per-axis entry and exit params of the points p moving by d through the boxes, all args broadcast together
+        # note: axes with no movement get a [-inf, inf] or an empty [inf, -inf] range based on if p is inside the slab
+
+        t1 = (box_min - p) / d
+        t2 = (box_max - p) / d
+
+        inside_slab = (p > box_min) & (p < box_max)
+        t_near_axis = np.where(d == 0., np.where(inside_slab, -np.inf, np.inf), np.minimum(t1, t2))
+        t_far_axis = np.where(d == 0., np.where(inside_slab, np.inf, -np.inf), np.maximum(t1, t2))
+
+        return t_near_axis, t_far_axis
+
+    @np.errstate(all='ignore')
+    def segments_occluded(self, origin: np.ndarray, ends: np.ndarray, half_ext: np.ndarray | None = None) -> np.ndarray:
+        # tests K line segments from a single origin to ends ((K, 3) array) for any static collider in the way
+        # with half_ext, a box of that half size is swept along the segments instead of a point
+        # note: colliders containing the origin are ignored, returns a (K,) bool array
+
+        ends = np.asarray(ends, dtype=np.float32)
+        origin = np.asarray(origin, dtype=np.float32)
+
+        seg_count = len(ends)
+        occluded = np.zeros(seg_count, dtype=np.bool_)
+
+        # with a shared origin the box offsets are the same for every segment, only the inverse dirs differ
+
+        coll_min = self.coll_min
+        coll_max = self.coll_max
+
+        if half_ext is not None:
+            coll_min = coll_min - half_ext
+            coll_max = coll_max + half_ext
+
+        outside = np.any((origin <= coll_min) | (origin >= coll_max), axis=1)
+        min_offset = (coll_min[outside] - origin).astype(np.float32)
+        max_offset = (coll_max[outside] - origin).astype(np.float32)
+
+        if len(min_offset) == 0:
+            return occluded
+
+        chunk = max(1, self.SEGMENT_CHUNK_SIZE // len(min_offset))
+
+        for start in range(0, seg_count, chunk):
+            inv_d = (1. / (ends[start:start + chunk] - origin))[:, np.newaxis, :]
+
+            t1 = min_offset * inv_d
+            t2 = max_offset * inv_d
+
+            # note: fmin / fmax skip the nans of 0 * inf (origin on a slab plane with no movement along it)
+            t_near = np.max(np.fmin(t1, t2), axis=2)
+            t_far = np.min(np.fmax(t1, t2), axis=2)
+
+            occluded[start:start + chunk] = np.any((t_near <= t_far) & (t_near >= 0.) & (t_near <= 1.), axis=1)
+
+        return occluded
+
+    def occluded(self, origin: Vec3, end: Vec3, half_ext: Vec3 | None = None) -> bool:
+        # an any-hit test of a single segment (or a box of half_ext swept along it) for line-of-sight checks
+        # walks coll_tree along the segment and returns on the first collider hit, same rules as segments_occluded
+
+        o = (float(origin[0]), float(origin[1]), float(origin[2]))
+        d = (float(end[0]) - o[0], float(end[1]) - o[1], float(end[2]) - o[2])
+
+        inv_dir = tuple(1. / c if c != 0. else INF for c in d)
+        pad = (float(half_ext[0]), float(half_ext[1]), float(half_ext[2])) if half_ext is not None else (0., 0., 0.)
+
+        coll_boxes = self.coll_boxes
+
+        def leaf_hit(index: int) -> bool:
+            box = coll_boxes[index]
+
+            # note: colliders containing the origin are ignored
+            if all(box[a] - pad[a] < o[a] < box[a + 3] + pad[a] for a in range(3)):
+                return False
+
+            return ray_box_entry(box, o, inv_dir, pad, 1.) >= 0.
+
+        return self.coll_tree.any_ray(o, inv_dir, 1., pad, 1, leaf_hit)
+
+    @staticmethod
+    @np.errstate(all='ignore')
+    def _sweep_pairs(starts: np.ndarray, disps: np.ndarray, half_ext: np.ndarray, box_min: np.ndarray, box_max: np.ndarray, pair_sweep: np.ndarray, pair_box: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # the narrow phase of sweep_boxes, slab tests only the broadphase (sweep, box) index pairs and keeps the first hit per sweep
+
+        n = len(starts)
+
+        t_first = np.full(n, np.inf)
+        first = np.full(n, -1, dtype=np.int64)
+
+        if len(pair_sweep) == 0:
+            return t_first, first
+
+        # minkowski expanded boxes, the swept boxes can then be treated as points
+        exp_min = box_min[pair_box] - half_ext[pair_sweep]
+        exp_max = box_max[pair_box] + half_ext[pair_sweep]
+
+        t_near_axis, t_far_axis = StaticCollSnapshot._slab_test(starts[pair_sweep], disps[pair_sweep], exp_min, exp_max)
+
+        t_near = np.max(t_near_axis, axis=1)
+        t_far = np.min(t_far_axis, axis=1)
+
+        hit_pairs = np.nonzero((t_near <= t_far) & (t_near >= 0.) & (t_near <= 1.))[0]
+
+        # pick the closest hit for each sweep
+        hit_pairs = hit_pairs[np.lexsort((t_near[hit_pairs], pair_sweep[hit_pairs]))]
+        hit_sweeps, closest = np.unique(pair_sweep[hit_pairs], return_index=True)
+        hit_pairs = hit_pairs[closest]
+
+        t_first[hit_sweeps] = t_near[hit_pairs]
+        first[hit_sweeps] = pair_box[hit_pairs]
+
+        return t_first, first
+
+    @staticmethod
+    def sweep_boxes(starts: np.ndarray, disps: np.ndarray, half_ext: np.ndarray, box_min: np.ndarray, box_max: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # sweeps N boxes (starts, disps, half_ext as (N, 3) arrays) against M boxes ((M, 3) min and max points) all at once
+        # returns the (N,) fraction of disp traveled to the first hit (inf if none) and the (N,) index of the hit box (-1 if none)
+        # note: boxes we already start inside of are ignored, same as in sweep_movers
+
+        # broadphase, pair up sweeps with boxes overlapping their whole swept bounds (same as in sweep_movers)
+
+        sweep_min = np.minimum(starts, starts + disps) - half_ext - StaticCollSnapshot.SWEEP_BROADPHASE_MARGIN
+        sweep_max = np.maximum(starts, starts + disps) + half_ext + StaticCollSnapshot.SWEEP_BROADPHASE_MARGIN
+
+        overlap = np.all(sweep_min[:, np.newaxis, :] <= box_max[np.newaxis, :, :], axis=2) & np.all(sweep_max[:, np.newaxis, :] >= box_min[np.newaxis, :, :], axis=2)
+        pair_sweep, pair_box = np.nonzero(overlap)
+
+        return StaticCollSnapshot._sweep_pairs(starts, disps, half_ext, box_min, box_max, pair_sweep, pair_box)
+
+    def sweep_first_hits(self, starts: np.ndarray, disps: np.ndarray, half_ext: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # sweep_boxes against all the static colliders, the broadphase pairs come from coll_tree instead of testing every collider
+
+        sweep_min = (np.minimum(starts, starts + disps) - half_ext).tolist()
+        sweep_max = (np.maximum(starts, starts + disps) + half_ext).tolist()
+
+        pair_sweep = []
+        pair_box = []
+
+        for i, (lo, hi) in enumerate(zip(sweep_min, sweep_max)):
+            indices = self.coll_tree.query_box(lo + hi, 1)
+
+            pair_sweep.extend([i] * len(indices))
+            pair_box.extend(indices)
+
+        return self._sweep_pairs(starts, disps, half_ext, self.coll_min, self.coll_max, np.array(pair_sweep, dtype=np.int64), np.array(pair_box, dtype=np.int64))
+
+    @np.errstate(all='ignore')
+    def sweep_movers(self, pos: np.ndarray, vel: np.ndarray, half_ext: np.ndarray, dt: float, max_iters: int = 32) -> tuple[np.ndarray, np.ndarray]:
+        # moves N boxes (pos, vel, half_ext as (N, 3) arrays) by vel * dt, sliding along the normal of every hit collider
+        # same as the per-mover first_hit slide loop but with all movers swept at once, returns new (pos, vel)
+
+        pos = np.array(pos, dtype=np.float64)
+        vel = np.array(vel, dtype=np.float64)
+        half_ext = np.asarray(half_ext, dtype=np.float64)
+
+        n = len(pos)
+        dt_rem = np.full(n, dt, dtype=np.float64)
+
+        # broadphase, pair up movers with colliders overlapping their whole swept bounds
+        # note: slides only ever zero a component of the remaining travel, so the pairs stay valid for all iterations
+
+        disp = vel * dt
+        sweep_min = np.minimum(pos, pos + disp) - half_ext - self.SWEEP_BROADPHASE_MARGIN
+        sweep_max = np.maximum(pos, pos + disp) + half_ext + self.SWEEP_BROADPHASE_MARGIN
+
+        overlap = np.all(sweep_min[:, np.newaxis, :] <= self.coll_max[np.newaxis, :, :], axis=2) & np.all(sweep_max[:, np.newaxis, :] >= self.coll_min[np.newaxis, :, :], axis=2)
+        pair_mover, pair_coll = np.nonzero(overlap)
+
+        if len(pair_mover) == 0:
+            return pos + disp, vel
+
+        # minkowski expanded colliders, the movers can then be treated as points
+
+        exp_min = self.coll_min[pair_coll] - half_ext[pair_mover]
+        exp_max = self.coll_max[pair_coll] + half_ext[pair_mover]
+
+        active = np.ones(n, dtype=np.bool_)
+
+        for i in range(max_iters):
+            disp = vel * dt_rem[:, np.newaxis]
+
+            p = pos[pair_mover]
+            d = disp[pair_mover]
+
+            # slab test, parametric in [0, 1] along this iterations displacement
+            t_near_axis, t_far_axis = self._slab_test(p, d, exp_min, exp_max)
+
+            t_near = np.max(t_near_axis, axis=1)
+            t_far = np.min(t_far_axis, axis=1)
+
+            # note: boxes we already start inside of are ignored (same as the stuck case in the scalar version)
+            is_hit = active[pair_mover] & (t_near <= t_far) & (t_near >= 0.) & (t_near <= 1.)
+
+            if not np.any(is_hit):
+                break
+
+            # pick the closest hit for each mover
+
+            hit_pairs = np.nonzero(is_hit)[0]
+            hit_pairs = hit_pairs[np.lexsort((t_near[hit_pairs], pair_mover[hit_pairs]))]
+
+            hit_movers, first = np.unique(pair_mover[hit_pairs], return_index=True)
+            hit_pairs = hit_pairs[first]
+
+            frac_traveled = t_near[hit_pairs]
+
+            hit_axis = np.argmax(t_near_axis[hit_pairs], axis=1)
+            hit_norm = np.zeros((len(hit_pairs), 3), dtype=np.float64)
+            hit_norm[np.arange(len(hit_pairs)), hit_axis] = -np.sign(d[hit_pairs, hit_axis])
+
+            # movers with no hit travel the rest of their way and are done
+
+            done = active.copy()
+            done[hit_movers] = False
+
+            pos[done] += disp[done]
+            dt_rem[done] = 0.
+            active[done] = False
+
+            # conform the rest to the collision
+
+            hit_vel = vel[hit_movers]
+
+            pos[hit_movers] += disp[hit_movers] * frac_traveled[:, np.newaxis] + hit_norm * EPSILON
+            vel[hit_movers] = hit_vel - hit_norm * np.einsum("ij,ij->i", hit_vel, hit_norm)[:, np.newaxis]
+            dt_rem[hit_movers] *= 1. - frac_traveled
+
+        pos[active] += vel[active] * dt_rem[active, np.newaxis]
+
+        return pos, vel
+
+    coll_min: np.ndarray # (M, 3) collider aabb min points
+    coll_max: np.ndarray # (M, 3) collider aabb max points
+    coll_tree: AabbTree # leaves hold the collider index
+    coll_boxes: list[list[float]] # the exact collider boxes in the tree box layout, for the scalar leaf tests
+
+@dataclass(init=False, slots=True)
+class LocalHit:
+    def __init__(self, tmin: float, tout: float, pos: np.ndarray, norm: np.ndarray) -> None:
+        self.tmin = tmin
+        self.tout = tout
+        self.pos = pos
+        self.norm = norm
+
+    tmin: float # distance along the ray dir to the hit
+    tout: float # distance along the ray dir to the exit of the hit collider
+    pos: np.ndarray # ray origin moved to the hit
+    norm: np.ndarray
+
+@dataclass(init=False, slots=True)
+class LocalCollSnapshot:
+    def __init__(self, bounds_min: np.ndarray, bounds_max: np.ndarray, coll_min: np.ndarray, coll_max: np.ndarray) -> None:
+        self.bounds_min = bounds_min
+        self.bounds_max = bounds_max
+        self.coll_min = coll_min
+        self.coll_max = coll_max
+
+    def covers(self, query_min: np.ndarray, query_max: np.ndarray) -> bool:
+        # True if all colliders a query within the (min, max) bounds could hit are in this snapshot
+        return bool(np.all(query_min >= self.bounds_min) and np.all(query_max <= self.bounds_max))
+
+    @np.errstate(all='ignore')
+    def first_hit(self, origin: np.ndarray, ray_dir: np.ndarray, half_ext: np.ndarray, tmax: float) -> LocalHit | None:
+        # the closest collider hit by a box of half_ext swept from origin along the (normalized) ray_dir within tmax
+        # note: colliders we already start inside of are ignored, same as in sweep_movers
+
+        if len(self.coll_min) == 0:
+            return None
+
+        t_near_axis, t_far_axis = StaticCollSnapshot._slab_test(origin, ray_dir, self.coll_min - half_ext, self.coll_max + half_ext)
+
+        t_near = np.max(t_near_axis, axis=1)
+        t_far = np.min(t_far_axis, axis=1)
+
+        t_hit = np.where((t_near <= t_far) & (t_near >= 0.) & (t_near <= tmax), t_near, np.inf)
+        first = int(np.argmin(t_hit))
+
+        if t_hit[first] == np.inf:
+            return None
+
+        tmin = float(t_hit[first])
+        hit_axis = int(np.argmax(t_near_axis[first]))
+
+        norm = np.zeros(3, dtype=np.float64)
+        norm[hit_axis] = -np.sign(ray_dir[hit_axis])
+
+        return LocalHit(tmin, float(t_far[first]), origin + ray_dir * tmin, norm)
+
+    bounds_min: np.ndarray # the gathered region, every collider overlapping it is in the snapshot
+    bounds_max: np.ndarray
+    coll_min: np.ndarray # (K, 3) collider aabb min points
+    coll_max: np.ndarray
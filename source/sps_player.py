@@ -7,6 +7,7 @@ from engine.cue import cue_map
 from engine.cue.phys.cue_phys_types import PhysAABB
 
 from sps_state import SpsState
+from sps_hitbox_scene import HITBOX_LAYER_PLAYER
 from sps_weapons import FdevImpl, GlockImpl, FlameImpl
 
 from pygame.math import Vector3 as Vec3
@@ -87,7 +88,7 @@ def p_setup():
 
     # init hitbox and view model
     SpsState.p_hitbox = PhysAABB.make(SpsState.p_active_controller.p_pos + Vec3(0., SpsState.p_active_controller.PLAYER_SIZE.y / 2, 0.), SpsState.p_active_controller.PLAYER_SIZE, PlayerHitboxShim())
-    SpsState.hitbox_scene.add_coll(SpsState.p_hitbox)
+    SpsState.hitbox_scene.add_coll(SpsState.p_hitbox, HITBOX_LAYER_PLAYER)
 
     # test play support, assume heavy
     if not hasattr(SpsState, "p_selected_char"):
@@ -0,0 +1,207 @@
+from dataclasses import dataclass
+from engine.cue import cue_sequence as seq
+from engine.cue.cue_state import GameState
+
+from engine.cue.components.cue_transform import Transform
+from engine.cue.components.cue_model import ModelRenderer
+from components.instanced_renderer import InstancedRenderer, create_model_renderer
+
+from sps_state import SpsState
+from sps_phys import StaticCollSnapshot
+from sps_hitbox_scene import HITBOX_LAYER_PLAYER
+from sps_triggers import TRIGGER_ACTOR_PROJECTILE
+
+from pygame.math import Vector3 as Vec3
+import numpy as np
+
+# all live projectiles in one structure-of-arrays, advanced and swept against colliders and hitboxes in a single batch per frame
+# note: projectile models are pooled by their model data, so firing doesn't create a new renderer once warmed up
+# projectiles fired with "projectile_trigger_actor" are also swept through SpsState.trigger_grid, with their model transform as the actor
+
+@dataclass(init=False, slots=True)
+class ProjectileSystem:
+    PROJECTILE_MAX_LIFETIME = 10. # projectiles which missed everything are culled after this long
+    PROJECTILE_HIT_MASK = HITBOX_LAYER_PLAYER # all projectiles are fired by enemies
+
+    INITIAL_CAPACITY = 64
+
+    def __init__(self) -> None:
+        self.projectile_count = 0
+
+        self.pr_pos = np.zeros((self.INITIAL_CAPACITY, 3), dtype=np.float64)
+        self.pr_vel = np.zeros((self.INITIAL_CAPACITY, 3), dtype=np.float64)
+        self.pr_half_ext = np.zeros((self.INITIAL_CAPACITY, 3), dtype=np.float64)
+        self.pr_damage = np.zeros(self.INITIAL_CAPACITY, dtype=np.int64)
+        self.pr_spawn_time = np.zeros(self.INITIAL_CAPACITY, dtype=np.float64)
+        self.pr_trigger_actor = np.zeros(self.INITIAL_CAPACITY, dtype=np.bool_)
+
+        self.pr_models = []
+        self.model_pool = {}
+
+        self.is_ticking = False
+
+    # == projectile slots ==
+
+    def _grow(self) -> None:
+        new_cap = len(self.pr_pos) * 2
+
+        for name in ("pr_pos", "pr_vel", "pr_half_ext", "pr_damage", "pr_spawn_time", "pr_trigger_actor"):
+            old_buf = getattr(self, name)
+            new_buf = np.zeros((new_cap, *old_buf.shape[1:]), dtype=old_buf.dtype)
+            new_buf[:len(old_buf)] = old_buf
+
+            setattr(self, name, new_buf)
+
+    @staticmethod
+    def _model_key(en_data: dict) -> tuple:
+        return (
+            en_data["a_model_mesh"], en_data["a_model_vshader"], en_data["a_model_fshader"], en_data.get("a_model_albedo", None),
+            en_data.get("a_model_transparent", False), repr(en_data.get("a_model_uniforms", {})), tuple(en_data["t_scale"]),
+        )
+
+    def fire(self, en_data: dict) -> None:
+        # en_data is the same as for a sps_projectile entity
+
+        if self.projectile_count == len(self.pr_pos):
+            self._grow()
+
+        slot = self.projectile_count
+
+        self.pr_pos[slot] = en_data["t_pos"]
+        self.pr_vel[slot] = Vec3(en_data["projectile_dir"]) * en_data["projectile_velocity"]
+        self.pr_half_ext[slot] = en_data["t_scale"].elementwise() * en_data["hitbox_scale"] / 2
+        self.pr_damage[slot] = en_data["projectile_damage"]
+        self.pr_spawn_time[slot] = GameState.current_time
+        self.pr_trigger_actor[slot] = en_data.get("projectile_trigger_actor", False)
+
+        # reuse a hidden model if there is one
+
+        model_key = self._model_key(en_data)
+        pool = self.model_pool.get(model_key, None)
+
+        if pool:
+            model_trans, model = pool.pop()
+            model_trans.set_pos_rot(en_data["t_pos"], en_data["t_rot"])
+            model.show()
+        else:
+            model_trans = Transform(en_data["t_pos"], en_data["t_rot"], en_data["t_scale"])
+            model = create_model_renderer(en_data, model_trans)
+
+        self.pr_models.append((model_key, model_trans, model))
+        self.projectile_count += 1
+
+        if not self.is_ticking:
+            self.is_ticking = True
+            seq.next(self.tick)
+
+    def _remove(self, slot: int) -> None:
+        # swap the last projectile into the freed slot to keep the arrays packed
+
+        model_key, model_trans, model = self.pr_models[slot]
+
+        model.hide()
+        self.model_pool.setdefault(model_key, []).append((model_trans, model))
+
+        last = self.projectile_count - 1
+
+        if slot != last:
+            for buf in (self.pr_pos, self.pr_vel, self.pr_half_ext, self.pr_damage, self.pr_spawn_time, self.pr_trigger_actor):
+                buf[slot] = buf[last]
+
+            self.pr_models[slot] = self.pr_models[last]
+
+        self.pr_models.pop()
+        self.projectile_count -= 1
+
+    def despawn_all(self) -> None:
+        for _, _, model in self.pr_models:
+            model.despawn()
+
+        for pool in self.model_pool.values():
+            for _, model in pool:
+                model.despawn()
+
+        self.pr_models.clear()
+        self.model_pool.clear()
+        self.projectile_count = 0
+
+    # == simulation ==
+
+    def tick(self) -> None:
+        if SpsState.projectile_system is not self:
+            return # stale system from a previous map
+
+        n = self.projectile_count
+
+        if n == 0:
+            self.is_ticking = False
+            return # restarted on next fire
+
+        pos = self.pr_pos[:n]
+        half_ext = self.pr_half_ext[:n]
+        frame_disp = self.pr_vel[:n] * GameState.delta_time
+
+        # sweep everything at once, hitboxes are gathered every frame as they move
+
+        coll_t, _ = SpsState.static_colls.sweep_first_hits(pos, frame_disp, half_ext)
+
+        # only the hitboxes near this frames sweeps
+        sweep_bounds = (np.minimum(pos, pos + frame_disp).min(axis=0) - half_ext.max(axis=0), np.maximum(pos, pos + frame_disp).max(axis=0) + half_ext.max(axis=0))
+        hitboxes = SpsState.hitbox_scene.gather_boxes(self.PROJECTILE_HIT_MASK, sweep_bounds)
+
+        if hitboxes:
+            hb_points = np.array([hb.points for hb in hitboxes], dtype=np.float64)
+            hb_t, hb_index = StaticCollSnapshot.sweep_boxes(pos, frame_disp, half_ext, hb_points[:, 0, :], hb_points[:, 1, :])
+        else:
+            hb_t, hb_index = np.full(n, np.inf), np.full(n, -1, dtype=np.int64)
+
+        # a hitbox only counts if it is in front of the first collider
+
+        hit_hb = np.isfinite(hb_t) & (hb_t <= coll_t)
+        is_dead = hit_hb | np.isfinite(coll_t) | (GameState.current_time - self.pr_spawn_time[:n] > self.PROJECTILE_MAX_LIFETIME)
+
+        hb_hits = [(hitboxes[hb_index[i]].usr, int(self.pr_damage[i]), Vec3(*(pos[i] + frame_disp[i] * hb_t[i]))) for i in np.nonzero(hit_hb)[0]]
+
+        # trigger sweeps of this frame, dispatched once the arrays are settled
+        trigger_slots = np.nonzero(self.pr_trigger_actor[:n])[0]
+        trigger_actors = [self.pr_models[i][1] for i in trigger_slots]
+        trigger_sweeps = (pos[trigger_slots], frame_disp[trigger_slots], half_ext[trigger_slots], is_dead[trigger_slots])
+
+        pos += frame_disp
+
+        # remove from the back, so swapped in projectiles are always alive ones
+        for slot in np.nonzero(is_dead)[0][::-1]:
+            self._remove(int(slot))
+
+        for slot, (_, model_trans, _) in enumerate(self.pr_models):
+            model_trans.set_pos(Vec3(*self.pr_pos[slot]))
+
+        # trigger and damage callbacks last, these may despawn entities or even fire new projectiles
+
+        if trigger_actors:
+            trigger_start, trigger_disp, trigger_half_ext, trigger_dead = trigger_sweeps
+            SpsState.trigger_grid.update_actors(trigger_actors, TRIGGER_ACTOR_PROJECTILE, trigger_start, trigger_disp, trigger_half_ext)
+
+            # dead projectiles leave all their triggers right after their last sweep
+            for actor, dead in zip(trigger_actors, trigger_dead.tolist()):
+                if dead:
+                    SpsState.trigger_grid.remove_actor(actor, TRIGGER_ACTOR_PROJECTILE)
+
+        for usr, damage, hit_pos in hb_hits:
+            usr.on_damage(damage, hit_pos)
+
+        seq.next(self.tick)
+
+    projectile_count: int
+
+    pr_pos: np.ndarray
+    pr_vel: np.ndarray
+    pr_half_ext: np.ndarray
+    pr_damage: np.ndarray
+    pr_spawn_time: np.ndarray
+    pr_trigger_actor: np.ndarray
+
+    pr_models: list[tuple[tuple, Transform, ModelRenderer | InstancedRenderer]] # (model_key, transform, renderer) in each packed slot
+    model_pool: dict[tuple, list[tuple[Transform, ModelRenderer | InstancedRenderer]]] # hidden models ready for reuse
+
+    is_ticking: bool
@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+import itertools
+import math
+
+from pygame.math import Vector3 as Vec3
+import numpy as np
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sps_phys import StaticCollSnapshot
+
+# a coarse potentially-visible-set for static shooters (turrets, spawners), baked on map load
+# maps player position cells to the shooters which could possibly see into them, the live los raycast then only runs on a "maybe"
+
+@dataclass(init=False, slots=True)
+class ShooterPvs:
+    PVS_CELL_SIZE = 2.
+    PVS_MAX_CELLS = 32768 # cell size is grown for huge maps to keep the bake time sane
+
+    def __init__(self) -> None:
+        self.shooter_eyes = []
+
+        self.cell_vis = None
+        self.grid_min = Vec3()
+        self.grid_dims = (0, 0, 0)
+        self.cell_size = self.PVS_CELL_SIZE
+
+    def add_shooter(self, eye_points: list[Vec3]) -> int:
+        # register all the points a shooter may look from, shooters added after the bake are always a "maybe"
+
+        self.shooter_eyes.append([Vec3(p) for p in eye_points])
+        return len(self.shooter_eyes) - 1
+
+    @classmethod
+    def ring_eye_points(cls, center: Vec3, radius: float, height: float) -> list[Vec3]:
+        # eye points for a shooter looking from anywhere on a horizontal ring (eg. a yawing turret), sampled at a fraction
+        # of the cell size so no in-between yaw sees a cell the samples miss
+
+        count = max(8, math.ceil(2. * math.pi * radius / (cls.PVS_CELL_SIZE * .25)))
+        return [center + Vec3(math.cos(a) * radius, height, math.sin(a) * radius) for a in np.linspace(0., 2. * math.pi, count, endpoint=False)]
+
+    def bake(self, static_colls: 'StaticCollSnapshot') -> None:
+        if not self.shooter_eyes or len(static_colls.coll_min) == 0:
+            return # nothing to bake, everything stays a "maybe"
+
+        # fit the grid to the static colliders, the player can't get outside them anyway
+
+        grid_min = static_colls.coll_min.min(axis=0)
+        grid_size = static_colls.coll_max.max(axis=0) - grid_min
+
+        cell_size = self.PVS_CELL_SIZE
+        dims = np.maximum(np.ceil(grid_size / cell_size), 1).astype(np.int64)
+
+        while np.prod(dims) > self.PVS_MAX_CELLS:
+            cell_size *= 1.5
+            dims = np.maximum(np.ceil(grid_size / cell_size), 1).astype(np.int64)
+
+        # sample visibility at every cell center and grid vertex, a cell is visible if any of its samples is
+
+        cell_centers = grid_min + (np.indices(dims).reshape(3, -1).T + .5) * cell_size
+        grid_verts = grid_min + np.indices(dims + 1).reshape(3, -1).T * cell_size
+
+        x, y, z = dims
+        cell_vis = np.zeros((x, y, z, len(self.shooter_eyes)), dtype=np.bool_)
+
+        for shooter_id, eyes in enumerate(self.shooter_eyes):
+            center_vis = np.zeros(len(cell_centers), dtype=np.bool_)
+            vert_vis = np.zeros(len(grid_verts), dtype=np.bool_)
+
+            for eye in eyes:
+                center_vis |= ~static_colls.segments_occluded(np.array(eye), cell_centers)
+                vert_vis |= ~static_colls.segments_occluded(np.array(eye), grid_verts)
+
+            vis = center_vis.reshape(dims)
+            vert_vis = vert_vis.reshape(dims + 1)
+
+            for dx, dy, dz in itertools.product((0, 1), repeat=3):
+                vis |= vert_vis[dx:dx + x, dy:dy + y, dz:dz + z]
+
+            # dilate by a cell to stay conservative around thin gaps the samples missed
+
+            dilated = vis.copy()
+            dilated[1:, :, :] |= vis[:-1, :, :]
+            dilated[:-1, :, :] |= vis[1:, :, :]
+            dilated[:, 1:, :] |= vis[:, :-1, :]
+            dilated[:, :-1, :] |= vis[:, 1:, :]
+            dilated[:, :, 1:] |= vis[:, :, :-1]
+            dilated[:, :, :-1] |= vis[:, :, 1:]
+
+            cell_vis[:, :, :, shooter_id] = dilated
+
+        self.cell_vis = cell_vis
+        self.grid_min = Vec3(*grid_min)
+        self.grid_dims = tuple(dims.tolist())
+        self.cell_size = cell_size
+
+    def maybe_visible(self, shooter_id: int, pos: Vec3) -> bool:
+        # False only if the shooter can't see pos from any of its eye points (up to the bake sampling, dilated by a cell), a True still needs a real raycast
+
+        if self.cell_vis is None or shooter_id >= self.cell_vis.shape[3]:
+            return True
+
+        x = int((pos.x - self.grid_min.x) // self.cell_size)
+        y = int((pos.y - self.grid_min.y) // self.cell_size)
+        z = int((pos.z - self.grid_min.z) // self.cell_size)
+
+        if not (0 <= x < self.grid_dims[0] and 0 <= y < self.grid_dims[1] and 0 <= z < self.grid_dims[2]):
+            return True # outside of the baked grid, don't know
+
+        return bool(self.cell_vis[x, y, z, shooter_id])
+
+    shooter_eyes: list[list[Vec3]]
+
+    cell_vis: np.ndarray | None # a (X, Y, Z, shooter_count) bool grid, None when not baked
+    grid_min: Vec3
+    grid_dims: tuple[int, int, int]
+    cell_size: float
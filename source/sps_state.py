@@ -10,6 +10,17 @@ if TYPE_CHECKING:
     from sps_post_pass import BloomPostPass, TonemapPostPass
     from entity.sps_nav_node import SpsNavNode
     from entity.sps_view_mesh import SpsViewMesh
+    from sps_nav import NavGraph, NavNodeIndex
+    from sps_drone_system import DroneSystem
+    from sps_phys import StaticCollSnapshot
+    from sps_pvs import ShooterPvs
+    from sps_ai_scheduler import AiScheduler
+    from sps_flow_field import FlowField
+    from sps_projectiles import ProjectileSystem
+    from sps_hitbox_scene import HitboxScene
+    from sps_triggers import TriggerGrid
+    from components.fire_emitter import FireParticleSystem
+    from components.beam_trails import BeamTrailSystem
 
 # a shared state for the entire game, mostly for player <-> enemy interaction code
 
@@ -37,8 +48,19 @@ class SpsState:
     # == enemy and damage system ==
 
     active_nav_nodes: list['SpsNavNode']
-    hitbox_scene: 'PhysScene'
+    nav_node_index: 'NavNodeIndex'
+    nav_graph: 'NavGraph'
+    hitbox_scene: 'HitboxScene'
+    trigger_grid: 'TriggerGrid'
+    static_colls: 'StaticCollSnapshot'
+    shooter_pvs: 'ShooterPvs'
+    flow_field: 'FlowField'
 
+    ai_scheduler: 'AiScheduler'
+    drone_system: 'DroneSystem'
+    projectile_system: 'ProjectileSystem'
+    fire_system: 'FireParticleSystem'
+    beam_system: 'BeamTrailSystem'
     active_drone_count: int
     active_enemy_count: int
 
@@ -51,6 +73,7 @@ class SpsState:
     dev_vis_sub_zone_target: None | str = None
 
     cheat_deltascale: float = 1.
+    dev_ai_budget_ms: float = 1.
 
     cheat_ai_debug: bool = False
     cheat_nodmg: bool = False
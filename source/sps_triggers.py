@@ -0,0 +1,212 @@
+from dataclasses import dataclass
+from engine.cue.cue_state import GameState
+
+from sps_aabb_tree import ray_box_entry, INF
+
+import numpy as np
+import math
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from engine.cue.phys.cue_phys_types import PhysAABB
+
+# trigger boxes in a uniform grid, with overlap state kept per (actor, trigger) pair
+# actors (the player, opted-in drones and projectiles) are swept through the grid once per frame, triggers then get
+# on_enter(actor, actor_layer) / on_exit(actor, actor_layer) and, with a stay_interval, a fixed-rate on_stay(actor, actor_layer)
+# note: handlers may leave any of the callbacks out, actors are only held by identity
+
+TRIGGER_ACTOR_PLAYER = 1 << 0
+TRIGGER_ACTOR_DRONE = 1 << 1
+TRIGGER_ACTOR_PROJECTILE = 1 << 2
+
+@dataclass(init=False, slots=True)
+class TriggerBox:
+    def __init__(self, aabb: 'PhysAABB', handler: object, actor_mask: int, stay_interval: float | None) -> None:
+        lo, hi = aabb.points
+
+        self.aabb = aabb
+        self.box = [float(lo[0]), float(lo[1]), float(lo[2]), float(hi[0]), float(hi[1]), float(hi[2])]
+        self.handler = handler
+        self.actor_mask = actor_mask
+        self.stay_interval = stay_interval
+        self.cells = []
+
+    def dispatch(self, callback: str, actor: object, actor_layer: int) -> None:
+        func = getattr(self.handler, callback, None)
+
+        if func is not None:
+            func(actor, actor_layer)
+
+    aabb: 'PhysAABB'
+    box: list[float] # [min_x, min_y, min_z, max_x, max_y, max_z]
+    handler: object
+    actor_mask: int # TRIGGER_ACTOR_* bits of actors this trigger reacts to
+    stay_interval: float | None # seconds between on_stay calls, 0 for every frame, None for no on_stay
+    cells: list[tuple[int, int, int]]
+
+@dataclass(init=False, slots=True)
+class SceneTrigger:
+    # adapts a legacy engine trigger (a GameState.trigger_scene box with an on_triggered() usr) to the grid
+    # note: legacy triggers were fired every frame the player overlapped them, so both enter and stay fire them
+
+    def __init__(self, usr: object) -> None:
+        self.usr = usr
+
+    def on_enter(self, actor: object, actor_layer: int) -> None:
+        self.usr.on_triggered()
+
+    def on_stay(self, actor: object, actor_layer: int) -> None:
+        self.usr.on_triggered()
+
+    usr: object
+
+@dataclass(init=False, slots=True)
+class TriggerGrid:
+    TRIGGER_CELL_SIZE = 4.
+
+    def __init__(self) -> None:
+        self.cells = {}
+        self.triggers = {}
+        self.actor_overlaps = {}
+
+    # == triggers ==
+
+    def add_trigger(self, aabb: 'PhysAABB', handler: object, actor_mask: int = TRIGGER_ACTOR_PLAYER, stay_interval: float | None = None) -> None:
+        trig = TriggerBox(aabb, handler, actor_mask, stay_interval)
+        lo_cell, hi_cell = self._cell_range(trig.box)
+
+        for x in range(lo_cell[0], hi_cell[0] + 1):
+            for y in range(lo_cell[1], hi_cell[1] + 1):
+                for z in range(lo_cell[2], hi_cell[2] + 1):
+                    self.cells.setdefault((x, y, z), []).append(trig)
+                    trig.cells.append((x, y, z))
+
+        self.triggers[id(aabb)] = trig
+
+    def remove_trigger(self, aabb: 'PhysAABB') -> None:
+        trig = self.triggers.pop(id(aabb), None)
+
+        if trig is None:
+            return # eg. grid was already reset with the map
+
+        for cell in trig.cells:
+            cell_trigs = self.cells[cell]
+            cell_trigs.remove(trig)
+
+            if not cell_trigs:
+                del self.cells[cell]
+
+        # forget the trigger in all overlaps, without firing on_exit on a trigger that's going away
+        for _, overlaps in self.actor_overlaps.values():
+            overlaps.pop(id(trig), None)
+
+    def add_scene_triggers(self, scene: object) -> None:
+        # mirrors all boxes of an engine trigger scene (and its sub scenes), called on map load once all triggers are spawned
+
+        scenes = [scene]
+        seen = set()
+
+        while scenes:
+            sub = scenes.pop()
+
+            for aabb in sub.scene_aabbs:
+                if id(aabb) not in seen and id(aabb) not in self.triggers:
+                    seen.add(id(aabb))
+                    self.add_trigger(aabb, SceneTrigger(aabb.usr), TRIGGER_ACTOR_PLAYER, 0.)
+
+            scenes.extend(sub.child_subscenes.values())
+
+    # == actors ==
+
+    @classmethod
+    def _cell_range(cls, box: list[float]) -> tuple[tuple[int, int, int], tuple[int, int, int]]:
+        s = cls.TRIGGER_CELL_SIZE
+        return (math.floor(box[0] / s), math.floor(box[1] / s), math.floor(box[2] / s)), (math.floor(box[3] / s), math.floor(box[4] / s), math.floor(box[5] / s))
+
+    def update_actor(self, actor: object, actor_layer: int, start: tuple[float, float, float], disp: tuple[float, float, float], half_ext: tuple[float, float, float]) -> None:
+        # sweeps an actor box of half_ext from start by disp (this frames movement) and fires the enter, stay and exit events
+
+        sweep_box = [
+            min(start[0], start[0] + disp[0]) - half_ext[0], min(start[1], start[1] + disp[1]) - half_ext[1], min(start[2], start[2] + disp[2]) - half_ext[2],
+            max(start[0], start[0] + disp[0]) + half_ext[0], max(start[1], start[1] + disp[1]) + half_ext[1], max(start[2], start[2] + disp[2]) + half_ext[2],
+        ]
+
+        lo_cell, hi_cell = self._cell_range(sweep_box)
+        state = self.actor_overlaps.get(id(actor), None)
+
+        # gather the triggers of all touched cells, usually just one or two lookups
+
+        candidates = {}
+
+        for x in range(lo_cell[0], hi_cell[0] + 1):
+            for y in range(lo_cell[1], hi_cell[1] + 1):
+                for z in range(lo_cell[2], hi_cell[2] + 1):
+                    for trig in self.cells.get((x, y, z), ()):
+                        if trig.actor_mask & actor_layer:
+                            candidates[id(trig)] = trig
+
+        if not candidates and state is None:
+            return # idle, nothing near and nothing to exit
+
+        # narrow phase, a box sweep in [0, 1] along disp
+
+        inv_disp = tuple(1. / d if d != 0. else INF for d in disp)
+        overlapping = {}
+
+        for trig_id, trig in candidates.items():
+            if ray_box_entry(trig.box, start, inv_disp, half_ext, 1.) >= 0.:
+                overlapping[trig_id] = trig
+
+        prev_overlaps = state[1] if state is not None else {}
+        new_overlaps = {}
+        now = GameState.current_time
+
+        events = []
+
+        for trig_id, trig in overlapping.items():
+            prev = prev_overlaps.get(trig_id, None)
+
+            if prev is None:
+                events.append(("on_enter", trig))
+                new_overlaps[trig_id] = (trig, now + trig.stay_interval if trig.stay_interval is not None else INF)
+
+            elif now >= prev[1]:
+                events.append(("on_stay", trig))
+                new_overlaps[trig_id] = (trig, max(prev[1] + trig.stay_interval, now))
+
+            else:
+                new_overlaps[trig_id] = prev
+
+        for trig_id in prev_overlaps.keys() - overlapping.keys():
+            events.append(("on_exit", prev_overlaps[trig_id][0]))
+
+        if new_overlaps:
+            self.actor_overlaps[id(actor)] = (actor, new_overlaps)
+        else:
+            self.actor_overlaps.pop(id(actor), None)
+
+        # callbacks last, these may add or remove triggers and actors
+        for callback, trig in events:
+            trig.dispatch(callback, actor, actor_layer)
+
+    def update_actors(self, actors: list, actor_layer: int, starts: np.ndarray, disps: np.ndarray, half_ext: np.ndarray) -> None:
+        # update_actor for a batch of actors (starts, disps, half_ext as (N, 3) arrays), eg. from the drone or projectile systems
+
+        for actor, start, disp, ext in zip(actors, starts.tolist(), disps.tolist(), half_ext.tolist()):
+            self.update_actor(actor, actor_layer, start, disp, ext)
+
+    def remove_actor(self, actor: object, actor_layer: int) -> None:
+        # fires on_exit for all triggers the actor was in, call when the actor despawns (or stops being an actor)
+
+        state = self.actor_overlaps.pop(id(actor), None)
+
+        if state is None:
+            return
+
+        for trig, _ in state[1].values():
+            trig.dispatch("on_exit", actor, actor_layer)
+
+    cells: dict[tuple[int, int, int], list[TriggerBox]]
+    triggers: dict[int, TriggerBox] # id(aabb) -> trigger
+    actor_overlaps: dict[int, tuple[object, dict[int, tuple[TriggerBox, float]]]] # id(actor) -> (actor, id(trigger) -> (trigger, next on_stay time))
@@ -4,19 +4,14 @@ import random
 from engine.cue.cue_state import GameState
 from engine.cue.phys.cue_phys_types import PhysAABB, PhysRay
 from engine.cue.rendering import cue_gizmos as gizmo
-from engine.cue import cue_sequence as seq
-from engine.cue.rendering.cue_resources import GPUMesh
-from engine.cue.components.cue_transform import Transform
 
-from components.line_renderer import LineRenderer
-from components.particle_renderer import ParticleRenderer
 from sps_state import SpsState
+from sps_hitbox_scene import HITBOX_MASK_ENEMIES
 import prefabs
 
 from pygame.math import Vector3 as Vec3
 import pygame as pg
 import numpy as np
-from OpenGL import GL as gl
 
 # == glock 19 ==
 
@@ -32,50 +27,9 @@ class GlockImpl:
 
         SpsState.p_ammo_regen_cooldown = 0
 
-        self.beam_prefab = {
-            "a_model_vshader": "shaders/line_segment.vert",
-            "a_model_fshader": "shaders/emit_surf.frag",
-            "a_model_albedo": "textures/glock_beam.png",
-            "a_model_transparent": True,
-            "a_model_uniforms": {
-                "emit_power": 1.,
-            },
-        }
-
-    @staticmethod
-    def _tick_beam_model(beam) -> None:
-        spawn_time, m = beam
-            
-        lifetime = 1. - (GameState.current_time - spawn_time)
-        m.shader_uniform_data[2].bind_value = lifetime * 5.
-
-        if lifetime <= 0.:
-            m.despawn()
-            return
-
-        seq.next(GlockImpl._tick_beam_model, beam)
-
     def _new_beam(self, origin: Vec3, end: Vec3) -> None:
-        # gen model
-
-        beam_mesh = GPUMesh()
-        beam_dir = (end - origin).normalize()
-
-        vert_buf = np.array([*origin, *origin, *end, *end], dtype=np.float32)
-        norm_buf = np.array([*beam_dir, *beam_dir, *beam_dir, *beam_dir], dtype=np.float32)
-        uv_buf = np.array([0., 0., 0., 1., 1., 0., 1., 1.], dtype=np.float32)
-
-        elem_buf = np.array([0, 1, 2, 2, 1, 3], dtype=np.uint32)
-
-        beam_mesh.write_to(vert_buf, norm_buf, uv_buf, 4, elem_buf, 6, gl.GL_DYNAMIC_DRAW)
-
-        # init renderer
-
-        # beam_model = LineRenderer(self.beam_prefab, beam_mesh, .05, Transform(origin + (end - origin) * .5, Vec3()))
-        # self.active_beam_models.append((GameState.current_time, beam_model))
-
-        beam_model = LineRenderer(self.beam_prefab, beam_mesh, .02, Transform(origin + (end - origin) * .5, Vec3()))
-        seq.next(GlockImpl._tick_beam_model, (GameState.current_time, beam_model))
+        # pooled, uploads one segment into the map beam trail ring
+        SpsState.beam_system.spawn(origin, end)
 
     @np.errstate(all='ignore')
     def tick(self):
@@ -102,7 +56,7 @@ class GlockImpl:
             fire_ray = PhysRay.make(fire_pos, SpsState.p_active_controller.view_forward)
 
             coll_hit = GameState.collider_scene.first_hit(fire_ray)
-            box_hit = SpsState.hitbox_scene.first_hit(fire_ray, float('inf') if coll_hit is None else coll_hit.tmin)
+            box_hit = SpsState.hitbox_scene.first_hit(fire_pos, forward_dir, float('inf') if coll_hit is None else coll_hit.tmin, HITBOX_MASK_ENEMIES)
 
             if box_hit is not None:
                 hit_pos = Vec3(*box_hit.pos)
@@ -134,7 +88,6 @@ class GlockImpl:
     view_knockback: Vec3
     fire_cooldown: float
 
-    beam_prefab: dict
 
 # == flamethrower
 
@@ -148,91 +101,12 @@ class FlameImpl:
         self.view_knockback = Vec3()
         SpsState.p_ammo_regen_cooldown = 0
 
-        self.fire_p_pos = []
-        self.fire_p_vel = []
-        self.fire_p_spawn_time = []
-
-        self.fire_point_mesh = GPUMesh()
-        self.fire_point_trans = Transform(Vec3(), Vec3()) # used for non_opaque sorting
-        self.fire_point_lifetime_buf = gl.glGenBuffers(1)
-
-        fire_data = {
-            "a_model_mesh": self.fire_point_mesh,
-            "a_model_vshader": "shaders/flame.vert",
-            "a_model_fshader": "shaders/flame_quad.frag",
-            "a_model_transparent": True,
-            "a_model_albedo": "textures/fireSheet.png"
-        }
-        self.fire_point_renderer = ParticleRenderer(fire_data, self.fire_point_mesh, self.fire_point_trans)
-        gl.glEnable(gl.GL_PROGRAM_POINT_SIZE)
-
-        seq.next(self._update_point_mesh)
-
-    def _update_point_mesh(self) -> None:
-        # update particle system
-
-        to_remove = []
-        point_data = []
-        lifetime_data = []
-
-        avg_pos = Vec3()
-
-        for i in range(len(self.fire_p_pos)):
-            lf = 5. - (GameState.current_time - self.fire_p_spawn_time[i])
-
-            v = self.fire_p_vel[i]
-            p = self.fire_p_pos[i]
-
-            v /= 1. + (1. * GameState.delta_time)
-            v += Vec3(0., 1.2, 0.) * GameState.delta_time
-            p += v * GameState.delta_time
-
-            if lf <= 0.:
-                to_remove.append(i)
-
-            else:
-                point_data.extend(p)
-                lifetime_data.append(lf)
-
-                avg_pos += p
-
-        for offset, i in enumerate(to_remove):
-            self.fire_p_pos.pop(i - offset)
-            self.fire_p_vel.pop(i - offset)
-            self.fire_p_spawn_time.pop(i - offset)
-
-        # send as a mesh to the gpu
-
-        if lifetime_data:
-            avg_pos /= len(lifetime_data)
-        self.fire_point_trans.set_pos(avg_pos)
-
-        vert_buf = np.array(point_data, dtype=np.float32)
-        lifetime_buf = np.array(lifetime_data, dtype=np.float32)
-        self.fire_point_mesh.write_to(vert_buf, vertex_count=len(lifetime_data), gl_usage=gl.GL_STREAM_DRAW)
-
-        # hack a "out of format" lifetime buffer into the mesh vao
-        gl.glBindVertexArray(self.fire_point_mesh.mesh_vao)
-
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.fire_point_lifetime_buf)
-        gl.glBufferData(gl.GL_ARRAY_BUFFER, lifetime_buf, gl.GL_STREAM_DRAW)
-
-        gl.glVertexAttribPointer(1, 1, gl.GL_FLOAT, False, 4, None)
-        gl.glEnableVertexAttribArray(1)
-
-        gl.glBindVertexArray(0)
-
-        # refresh renderer with new data
-        self.fire_point_renderer.refresh_show()
-        seq.next(self._update_point_mesh)
-
     def _new_fire_particle(self, forward_dir: Vec3) -> None:
         # calc origin from view model space
         origin = Vec3(*(SpsState.p_hud_view_mesh.view_space_trans._trans_matrix @ np.array([0., .5, 4.4, 1.], dtype=np.float32))[0:3])
 
-        self.fire_p_pos.append(origin)
-        self.fire_p_vel.append(forward_dir * 2. + Vec3(random.uniform(-.5, .5), random.uniform(-.5, .5), random.uniform(-.5, .5)) + SpsState.p_active_controller.p_vel)
-        self.fire_p_spawn_time.append(GameState.current_time)
+        base_vel = forward_dir * 2. + SpsState.p_active_controller.p_vel
+        SpsState.fire_system.emit(np.array([origin], dtype=np.float32), np.array([base_vel], dtype=np.float32))
 
     @np.errstate(all='ignore')
     def tick(self):
@@ -257,10 +131,9 @@ class FlameImpl:
             fire_pos += forward_dir * (min(abs((SpsState.p_active_controller.PLAYER_SIZE.x + .5) / np.float32(forward_dir.x)), abs((SpsState.p_active_controller.PLAYER_SIZE.y + .5) / np.float32(forward_dir.y)), abs((SpsState.p_active_controller.PLAYER_SIZE.z + .5) / np.float32(forward_dir.z)))) # converting to np.float32 to make div by zero a "valid" operation
 
             coll_test_ray = PhysRay.make(fire_pos, SpsState.p_active_controller.view_forward, Vec3(.1, .1, .1))
-            fire_ray = PhysRay.make(fire_pos, SpsState.p_active_controller.view_forward, Vec3(1., 1., 1.))
 
             coll_hit = GameState.collider_scene.first_hit(coll_test_ray)
-            box_hits = SpsState.hitbox_scene.all_hits(fire_ray, 2. if coll_hit is None else min(2., coll_hit.tmin))
+            box_hits = SpsState.hitbox_scene.all_hits(fire_pos, forward_dir, 2. if coll_hit is None else min(2., coll_hit.tmin), HITBOX_MASK_ENEMIES, Vec3(1., 1., 1.))
 
             for hit in box_hits:
                 hit_pos = Vec3(*hit.pos)
@@ -285,15 +158,6 @@ class FlameImpl:
     view_initial_pos: Vec3
     view_knockback: Vec3
 
-    fire_p_pos: list[Vec3]
-    fire_p_vel: list[Vec3]
-    fire_p_spawn_time: list[float]
-
-    fire_point_mesh: GPUMesh
-    fire_point_trans: Transform
-    fire_point_lifetime_buf: np.uint32
-    fire_point_renderer: ParticleRenderer
-
 # == fdev ==
 
 @dataclass(init=False, slots=True)
@@ -329,10 +193,9 @@ class FdevImpl:
             fire_pos += forward_dir * (min(abs((SpsState.p_active_controller.PLAYER_SIZE.x + .5) / np.float32(forward_dir.x)), abs((SpsState.p_active_controller.PLAYER_SIZE.y + .5) / np.float32(forward_dir.y)), abs((SpsState.p_active_controller.PLAYER_SIZE.z + .5) / np.float32(forward_dir.z)))) # converting to np.float32 to make div by zero a "valid" operation
 
             coll_test_ray = PhysRay.make(fire_pos, SpsState.p_active_controller.view_forward, Vec3(.2, .2, .2))
-            fire_ray = PhysRay.make(fire_pos, SpsState.p_active_controller.view_forward, Vec3(1., 1., 1.))
 
             coll_hit = GameState.collider_scene.first_hit(coll_test_ray)
-            box_hits = SpsState.hitbox_scene.all_hits(fire_ray, float('inf') if coll_hit is None else coll_hit.tmin)
+            box_hits = SpsState.hitbox_scene.all_hits(fire_pos, forward_dir, float('inf') if coll_hit is None else coll_hit.tmin, HITBOX_MASK_ENEMIES, Vec3(1., 1., 1.))
 
             # apply force to hits
             for hit in box_hits: